@@ -0,0 +1,87 @@
+"""SQL statements and latency per CPA request: role claims in the token vs. a user lookup.
+
+Run from the backend directory:
+
+    python benchmarks/bench_auth_queries.py [requests]
+
+Runs the app against a scratch SQLite database. "db lookup" uses a token
+without claims, which makes every CPA route load the User row to check
+its role, as all of them did before identity.py; "claims" uses the token
+login now issues.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIRECTORY = tempfile.mkdtemp(prefix='bench-auth-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DIRECTORY, 'app.db')}"
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from src.identity import issue_token
+from src.main import app
+from src.models.user import CPAClient, TaxReturn, User, db
+
+def setup():
+    cpa = User(email='cpa@example.com', user_type='cpa')
+    cpa.set_password('-')
+    db.session.add(cpa)
+    for i in range(50):
+        client = User(email=f'client{i}@example.com', user_type='individual', profile={'first_name': f'Client {i}'})
+        client.set_password('-')
+        db.session.add(client)
+    db.session.flush()
+    client = User.query.filter_by(email='client0@example.com').first()
+    tax_return = TaxReturn(user_id=client.id, year=2024, status='draft', return_data={})
+    db.session.add(tax_return)
+    for roster_client in User.query.filter(User.user_type == 'individual').all():
+        db.session.add(CPAClient(cpa_id=cpa.id, client_id=roster_client.id))
+    db.session.commit()
+    return cpa, client.id, tax_return.id
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    client = app.test_client()
+    with app.app_context():
+        cpa, client_id, return_id = setup()
+        tokens = {
+            'db lookup': create_access_token(identity=str(cpa.id)),
+            'claims': issue_token(cpa)
+        }
+        engine = db.engine
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    routes = [
+        ('GET', '/api/cpa/clients?limit=20'),
+        ('GET', f'/api/cpa/clients/{client_id}/returns'),
+        ('GET', f'/api/cpa/clients/{client_id}/documents'),
+        ('GET', f'/api/cpa/clients/{client_id}/receipts'),
+        ('PUT', f'/api/cpa/returns/{return_id}/assign'),
+        ('PUT', f'/api/cpa/returns/{return_id}/file')
+    ]
+    print(f"{'route':<36}{'token':<12}{'queries':>9}{'ms/request':>12}")
+    for method, url in routes:
+        for name, token in tokens.items():
+            headers = {'Authorization': f'Bearer {token}'}
+            statements.clear()
+            response = client.open(url, method=method, headers=headers)
+            assert response.status_code == 200, (url, response.status_code, response.json)
+            queries = len(statements)
+
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.open(url, method=method, headers=headers)
+            elapsed = (time.perf_counter() - started) / requests * 1000
+            print(f"{method + ' ' + url.split('?')[0]:<36}{name:<12}{queries:>9}{elapsed:>12.2f}")
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(DIRECTORY, ignore_errors=True)
@@ -0,0 +1,104 @@
+"""Latency of a CPA's client roster and roster search with many users.
+
+Run from the backend directory:
+
+    python benchmarks/bench_client_search.py [users] [roster size] [requests]
+
+Runs the app against a scratch SQLite database of ``users`` clients
+(default 100000), ``roster size`` of them (default 2000) on one CPA's
+roster, and times GET /api/cpa/clients with and without ?q=. "all
+clients" is the query the route made before rosters: every client user,
+by type and id.
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIRECTORY = tempfile.mkdtemp(prefix='bench-clients-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DIRECTORY, 'app.db')}"
+
+from datetime import datetime
+from src.identity import issue_token
+from src.main import app
+from src.models.user import CLIENT_TYPES, CPAClient, User, db
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez']
+DOMAINS = ['gmail.com', 'yahoo.com', 'acme.com', 'globex.com', 'initech.com']
+
+def setup(users: int, roster: int):
+    cpa = User(email='cpa@example.com', user_type='cpa')
+    cpa.set_password('-')
+    db.session.add(cpa)
+    db.session.commit()
+    now = datetime.utcnow()
+    rows = []
+    for i in range(users):
+        first, last = FIRST_NAMES[i % 10], LAST_NAMES[i // 10 % 10]
+        rows.append({
+            'email': f'{first.lower()}.{last.lower()}{i}@{DOMAINS[i % len(DOMAINS)]}',
+            'password_hash': '-',
+            'phone_number': f'555-{i:07d}',
+            'user_type': CLIENT_TYPES[i % 2],
+            'profile': {'first_name': first, 'last_name': f'{last}{i % 997}'},
+            'created_at': now,
+            'updated_at': now
+        })
+    db.session.execute(User.__table__.insert(), rows)
+    # Spread over every name and domain: multiples of a prime, modulo the user count
+    picked = sorted({i * 7919 % users for i in range(min(roster, users))})
+    db.session.execute(CPAClient.__table__.insert(), [
+        {'cpa_id': cpa.id, 'client_id': cpa.id + 1 + i, 'created_at': now} for i in picked
+    ])
+    db.session.commit()
+    return issue_token(cpa)
+
+def timed(client, url, headers, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    timings.sort()
+    return response, statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    roster = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    client = app.test_client()
+    with app.app_context():
+        started = time.perf_counter()
+        token = setup(users, roster)
+        print(f"{users} users, {roster} on the roster, loaded in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        User.query.filter(User.user_type.in_(CLIENT_TYPES)).order_by(User.user_type, User.id).all()
+        print(f"all clients (before): {(time.perf_counter() - started) * 1000:.0f} ms")
+        db.session.remove()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    print(f"{'request':<34}{'rows':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for url in [
+        '/api/cpa/clients?limit=50',
+        '/api/cpa/clients?limit=50&fields=id,email',
+        '/api/cpa/clients?limit=50&q=smith',
+        '/api/cpa/clients?limit=50&q=mary%20yahoo',
+        '/api/cpa/clients?limit=50&q=555-0001',
+        '/api/cpa/clients?limit=50&q=gm',
+        '/api/cpa/clients?limit=50&q=nobody'
+    ]:
+        response, p50, p95 = timed(client, url, headers, requests)
+        print(f"{url.split('?', 1)[1]:<34}{len(response.json):>8}{p50:>10.1f}{p95:>10.1f}")
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(DIRECTORY, ignore_errors=True)
@@ -0,0 +1,129 @@
+"""Write throughput with N concurrent workers: default SQLite vs. WAL SQLite vs. Postgres.
+
+Run from the backend directory:
+
+    python benchmarks/bench_db_concurrency.py [workers] [seconds]
+
+Each worker is a separate process, like a gunicorn worker or the OCR
+queue, and runs short transactions that insert a tax document and read
+back the user's document count, the way an upload does. "sqlite default"
+is the engine the app used before db_config (rollback journal,
+synchronous=FULL); "sqlite tuned" is what db_config sets up now. Set
+BENCH_POSTGRES_URL to a scratch database to add a Postgres run; its rows
+are deleted afterwards.
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.exc import OperationalError
+from src.db_config import engine_options, init_engine
+from src.models.user import TaxDocument, User, db
+
+BENCH_PREFIX = 'bench-concurrency/'
+
+def make_engine(url, tuned):
+    if not tuned:
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    init_engine(engine)
+    return engine
+
+def setup(url, tuned):
+    engine = make_engine(url, tuned)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        user_id = conn.execute(select(User.id).where(User.email == 'bench@example.com')).scalar()
+        if user_id is None:
+            user_id = conn.execute(insert(User).values(
+                email='bench@example.com', password_hash='-', user_type='individual'
+            )).inserted_primary_key[0]
+    engine.dispose()
+    return user_id
+
+def worker(url, tuned, user_id, seconds, start, results):
+    engine = make_engine(url, tuned)
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    committed = errors = 0
+    latencies = []
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(TaxDocument).values(
+                    user_id=user_id,
+                    document_type='w-2',
+                    file_path=f'{BENCH_PREFIX}{os.getpid()}-{committed}',
+                    extracted_data={'wages': '84512.33', 'federal_tax': '12004.10'}
+                ))
+                conn.execute(select(func.count(TaxDocument.id)).where(TaxDocument.user_id == user_id)).scalar()
+            committed += 1
+            latencies.append(time.perf_counter() - began)
+        except OperationalError:
+            # "database is locked" once the lock wait runs out
+            errors += 1
+    engine.dispose()
+    results.put((committed, errors, latencies))
+
+def run(url, tuned, workers, seconds):
+    user_id = setup(url, tuned)
+    start = multiprocessing.Barrier(workers + 1)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(url, tuned, user_id, seconds, start, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    start.wait()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    committed = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    latencies = sorted(latency for outcome in outcomes for latency in outcome[2])
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    return committed / seconds, errors, p99
+
+def cleanup_postgres(url):
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(delete(TaxDocument).where(TaxDocument.file_path.startswith(BENCH_PREFIX)))
+        conn.execute(delete(User).where(User.email == 'bench@example.com'))
+    engine.dispose()
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    directory = tempfile.mkdtemp(prefix='bench-db-')
+    backends = [
+        ('sqlite default', f"sqlite:///{os.path.join(directory, 'default.db')}", False),
+        ('sqlite tuned', f"sqlite:///{os.path.join(directory, 'tuned.db')}", True)
+    ]
+    postgres_url = os.getenv('BENCH_POSTGRES_URL')
+    if postgres_url:
+        backends.append(('postgres', postgres_url, True))
+
+    print(f"{workers} workers, {seconds:.0f}s each")
+    print(f"{'backend':<16}{'workers':>9}{'commits/s':>12}{'errors':>9}{'p99 ms':>10}")
+    try:
+        for name, url, tuned in backends:
+            for count in sorted({1, workers}):
+                throughput, errors, p99 = run(url, tuned, count, seconds)
+                print(f"{name:<16}{count:>9}{throughput:>12.0f}{errors:>9}{p99:>10.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        if postgres_url:
+            cleanup_postgres(postgres_url)
+
+if __name__ == '__main__':
+    main()
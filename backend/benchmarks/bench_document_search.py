@@ -0,0 +1,115 @@
+"""Document search latency: the FTS5 index vs. scanning the OCR text.
+
+Run from the backend directory:
+
+    python benchmarks/bench_document_search.py [documents] [users] [requests]
+
+Runs the app against a scratch SQLite database of ``documents`` OCR'd
+documents (default 50000) spread over ``users`` users (default 500), one
+CPA with a tenth of them on their roster. "scan" is the LIKE query a
+search would need without the index. Every document contains the common
+words ("wages"), the worst case for ranking; payer names are rare.
+"""
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIRECTORY = tempfile.mkdtemp(prefix='bench-search-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DIRECTORY, 'app.db')}"
+
+from datetime import datetime
+from src.identity import issue_token
+from src.main import app
+from src.models.user import CPAClient, DocumentText, TaxDocument, User, db
+
+WORDS = ('wages tips compensation federal income tax withheld social security medicare employer employee '
+         'interest dividends payer recipient account number statement year total amount box state local').split()
+PAYERS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark', 'Wayne', 'Wonka', 'Tyrell', 'Cyberdyne']
+TYPES = ['w2', '1099', '1098', 'other']
+
+def setup(documents: int, users: int):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'email': f'user{i}@example.com', 'password_hash': '-', 'user_type': 'individual',
+         'created_at': now, 'updated_at': now} for i in range(users)
+    ])
+    cpa = User(email='cpa@example.com', user_type='cpa')
+    cpa.set_password('-')
+    db.session.add(cpa)
+    db.session.flush()
+    db.session.execute(CPAClient.__table__.insert(), [
+        {'cpa_id': cpa.id, 'client_id': user_id, 'created_at': now} for user_id in range(1, users + 1, 10)
+    ])
+    # Payer names such as 'Acme417' are rare words, like most of what a search looks for
+    payers = [f'{rng.choice(PAYERS)}{rng.randrange(1000)}' for _ in range(documents)]
+    for start in range(0, documents, 5000):
+        batch = range(start, min(start + 5000, documents))
+        db.session.execute(TaxDocument.__table__.insert(), [{
+            'id': i + 1, 'user_id': i % users + 1, 'document_type': TYPES[i % len(TYPES)],
+            'file_path': '-', 'filename': f'scan{i}.pdf', 'ocr_status': 'completed', 'uploaded_at': now,
+            'extracted_data': {'extracted_data': {'payer_name': f'{payers[i]} Corp'}}
+        } for i in batch])
+        db.session.execute(DocumentText.__table__.insert(), [{
+            'document_id': i + 1, 'created_at': now, 'updated_at': now,
+            'raw_text': f"{payers[i]} Corp " + ' '.join(rng.choice(WORDS) for _ in range(300))
+        } for i in batch])
+    db.session.commit()
+    return issue_token(db.session.get(User, 1)), issue_token(cpa), payers[0].lower(), payers[10].lower()
+
+def timed(run, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return result, statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    client = app.test_client()
+    with app.app_context():
+        started = time.perf_counter()
+        user_token, cpa_token, user_payer, client_payer = setup(documents, users)
+        print(f"{documents} documents, {users} users, indexed in {time.perf_counter() - started:.1f}s")
+        print(f"{'query':<40}{'p50 ms':>10}{'p95 ms':>10}{'rows':>6}")
+
+        scan = lambda: TaxDocument.query.join(DocumentText).filter(
+            TaxDocument.user_id == 1, DocumentText.raw_text.ilike(f'%{user_payer}%')
+        ).limit(20).all()
+        rows, p50, p95 = timed(scan, requests)
+        print(f"{'scan: one user, ' + user_payer:<40}{p50:>10.1f}{p95:>10.1f}{len(rows):>6}")
+        cpa_scan = lambda: TaxDocument.query.join(DocumentText).join(
+            CPAClient, CPAClient.client_id == TaxDocument.user_id
+        ).filter(CPAClient.cpa_id == users + 1, DocumentText.raw_text.ilike(f'%{client_payer}%')).limit(20).all()
+        rows, p50, p95 = timed(cpa_scan, requests)
+        print(f"{'scan: CPA clients, ' + client_payer:<40}{p50:>10.1f}{p95:>10.1f}{len(rows):>6}")
+        db.session.remove()
+
+    for url, token in [
+        (f'/api/documents/search?q={user_payer}&limit=20', user_token),
+        (f'/api/documents/search?q={user_payer}%20medicare&limit=20', user_token),
+        ('/api/documents/search?q=wages&limit=20', user_token),
+        (f'/api/cpa/documents/search?q={client_payer}&limit=20', cpa_token),
+        ('/api/cpa/documents/search?q=acme&limit=20', cpa_token),
+        ('/api/cpa/documents/search?q=wages&limit=20', cpa_token)
+    ]:
+        headers = {'Authorization': f'Bearer {token}'}
+        response, p50, p95 = timed(lambda: client.get(url, headers=headers), requests)
+        assert response.status_code == 200, (url, response.status_code)
+        print(f"{url.split('?', 1)[1].split('&')[0]:<40}{p50:>10.1f}{p95:>10.1f}{len(response.json):>6}")
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(DIRECTORY, ignore_errors=True)
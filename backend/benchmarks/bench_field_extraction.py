@@ -0,0 +1,132 @@
+"""Micro-benchmark: compiled single-pass field extraction vs. per-field re.search.
+
+Run from the backend directory:
+
+    python benchmarks/bench_field_extraction.py
+
+The corpus mimics tesseract output for W-2s, 1099s, receipts and a long
+brokerage statement, plus a pathological line that makes unbounded
+``federal.*tax`` style patterns backtrack.
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.field_extraction import extract_fields
+
+W2_TEXT = """a Employee's social security number
+123-45-6789
+OMB No. 1545-0008
+b Employer identification number (EIN)
+12-3456789
+c Employer's name, address, and ZIP code
+ACME WIDGETS & CO.
+1200 Industrial Pkwy
+Springfield IL 62704
+e Employee's first name and initial Last name
+JANE Q TAXPAYER
+1 Wages, tips, other compensation 2 Federal income tax withheld
+Wages: 84,512.33
+Federal income tax withheld: 12,004.10
+3 Social security wages 4 Social security tax withheld
+Social security wages: 84,512.33
+5 Medicare wages and tips 6 Medicare tax withheld
+Medicare wages: 84,512.33
+Form W-2 Wage and Tax Statement 2025 Department of the Treasury-Internal Revenue Service
+"""
+
+NEC_TEXT = """PAYER'S name, street address, city or town, state or province
+Payer: BRIGHTLINE CONSULTING LLC
+PAYER'S TIN 98-7654321
+RECIPIENT'S TIN 123-45-6789
+Recipient: JOHN SMITH
+1 Nonemployee compensation $ 18,250.00
+4 Federal income tax withheld $ 0.00
+Form 1099-NEC (Rev. January 2024)
+"""
+
+RECEIPT_TEXT = """CORNER OFFICE SUPPLY
+123 Main St
+03/14/2025 10:42 AM
+PAPER A4 x2 19.98
+TONER 64.50
+SUBTOTAL 84.48
+TAX 6.97
+TOTAL $91.45
+THANK YOU
+"""
+
+BROKERAGE_LINE = "{date} BUY 100 SHS XYZ CORP @ 41.22 COMMISSION 0.00 NET AMOUNT 4,122.00 ACCT 5512-2291\n"
+BROKERAGE_TEXT = ''.join(
+    BROKERAGE_LINE.format(date=f"{(i % 12) + 1:02d}/{(i % 28) + 1:02d}/2025") for i in range(2500)
+) + W2_TEXT
+
+PATHOLOGICAL_TEXT = ('federal ' * 4000) + '\n' + W2_TEXT
+
+CORPUS = [
+    ('w-2', W2_TEXT),
+    ('1099', NEC_TEXT),
+    ('receipt', RECEIPT_TEXT),
+    ('w-2', BROKERAGE_TEXT),
+    ('w-2', PATHOLOGICAL_TEXT)
+]
+
+# The patterns extract_w2_data/extract_1099_data/extract_receipt_data used
+# before the field registry, rebuilt and searched field by field per call.
+LEGACY_PATTERNS = {
+    'w-2': {
+        'employer_name': r'(?:employer|company)[:\s]*([A-Za-z\s&,.-]+?)(?:\n|$)',
+        'employee_name': r'(?:employee|name)[:\s]*([A-Za-z\s,.-]+?)(?:\n|$)',
+        'wages': r'(?:wages|box\s*1)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'federal_tax': r'(?:federal.*tax|box\s*2)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'social_security_wages': r'(?:social.*security.*wages|box\s*3)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'medicare_wages': r'(?:medicare.*wages|box\s*5)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'ein': r'(?:ein|employer.*id)[:\s]*([0-9-]+)',
+        'ssn': r'(?:ssn|social.*security)[:\s]*([0-9-]+)'
+    },
+    '1099': {
+        'payer_name': r'(?:payer|company)[:\s]*([A-Za-z\s&,.-]+?)(?:\n|$)',
+        'recipient_name': r'(?:recipient|payee)[:\s]*([A-Za-z\s,.-]+?)(?:\n|$)',
+        'nonemployee_compensation': r'(?:nonemployee.*compensation|box\s*1)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'federal_tax': r'(?:federal.*tax|box\s*4)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'payer_tin': r'(?:payer.*tin|ein)[:\s]*([0-9-]+)',
+        'recipient_tin': r'(?:recipient.*tin|ssn)[:\s]*([0-9-]+)'
+    },
+    'receipt': {
+        'merchant_name': r'^([A-Za-z\s&,.-]+?)(?:\n|$)',
+        'total_amount': r'(?:total|amount)[:\s]*\$?([0-9,]+\.?[0-9]*)',
+        'date': r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        'tax_amount': r'(?:tax)[:\s]*\$?([0-9,]+\.?[0-9]*)'
+    }
+}
+
+def legacy_extract(document_type, text):
+    data = {}
+    for field, pattern in dict(LEGACY_PATTERNS[document_type]).items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            data[field] = match.group(1).strip()
+    return data
+
+def bench(label, func, document_type, text, number):
+    seconds = min(timeit.repeat(lambda: func(document_type, text), number=number, repeat=3))
+    return seconds / number * 1e6
+
+def main():
+    print(f"{'document':<14}{'chars':>9}{'legacy us':>14}{'compiled us':>14}{'speedup':>10}")
+    names = ['w-2', '1099-nec', 'receipt', 'brokerage', 'pathological']
+    for name, (document_type, text) in zip(names, CORPUS):
+        number = 5 if len(text) > 20000 else 500
+        legacy = bench('legacy', legacy_extract, document_type, text, number)
+        compiled = bench('compiled', extract_fields, document_type, text, number)
+        print(f"{name:<14}{len(text):>9}{legacy:>14.1f}{compiled:>14.1f}{legacy / compiled:>9.1f}x")
+
+    print()
+    for name, (document_type, text) in zip(names[:3], CORPUS[:3]):
+        print(f"{name}: {extract_fields(document_type, text)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Template (box by box) OCR vs. full page OCR on standard IRS forms.
+
+Run from the backend directory:
+
+    python benchmarks/bench_form_templates.py
+
+Synthetic W-2 and 1099-NEC pages are drawn from the layouts in
+form_templates.py at 300 DPI. For each form the script reports the
+tesseract time and the fields recovered by OCR'ing the whole page and
+running the regex extractors, and by detecting the template and OCR'ing
+only its title strip and boxes. Uploads run both: the boxes give the
+fields and the full page gives the stored text. Needs tesseract installed.
+"""
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.services.field_extraction import extract_fields
+from src.services.form_templates import NEC, W2, read_form
+from src.services.ocr_engine import create_engine
+
+PAGE_SIZE = (2550, 3300)
+
+W2_BOXES = {
+    'ssn': ("a Employee's social security number", '123-45-6789'),
+    'ein': ('b Employer identification number (EIN)', '12-3456789'),
+    'employer_name': ("c Employer's name, address, and ZIP code", 'ACME WIDGETS & CO'),
+    'employee_name': ("e Employee's first name and initial   Last name", 'JANE Q TAXPAYER'),
+    'wages': ('1 Wages, tips, other compensation', '84,512.33'),
+    'federal_tax': ('2 Federal income tax withheld', '12,004.10'),
+    'social_security_wages': ('3 Social security wages', '84,512.33'),
+    'medicare_wages': ('5 Medicare wages and tips', '84,512.33')
+}
+
+NEC_BOXES = {
+    'payer_name': ("PAYER'S name, street address, city or town, ZIP", 'BRIGHTLINE CONSULTING LLC'),
+    'payer_tin': ("PAYER'S TIN", '98-7654321'),
+    'recipient_tin': ("RECIPIENT'S TIN", '123-45-6789'),
+    'recipient_name': ("RECIPIENT'S name", 'JOHN SMITH'),
+    'nonemployee_compensation': ('1 Nonemployee compensation', '18,250.00'),
+    'federal_tax': ('4 Federal income tax withheld', '0.00')
+}
+
+def _font(size):
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+def draw_form(template, boxes, title):
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    label_font, value_font = _font(26), _font(36)
+    width, height = PAGE_SIZE
+
+    for box in template.boxes:
+        label, value = boxes[box.field]
+        left, top, right, bottom = box.region
+        draw.rectangle((left * width, top * height, right * width, bottom * height), outline=0, width=2)
+        draw.text((left * width + 10, top * height + 6), label, font=label_font, fill=0)
+        draw.text((left * width + 20, top * height + 40), value, font=value_font, fill=0)
+
+    left, top, _, _ = template.title_region
+    draw.text((left * width + 10, top * height + 20), title, font=value_font, fill=0)
+    return page
+
+def score(expected, actual):
+    return sum(actual.get(field) == value for field, value in expected.items())
+
+def main():
+    if not shutil.which('tesseract'):
+        print('tesseract is not installed; nothing to measure')
+        return
+    engine = create_engine()
+
+    forms = [
+        ('w-2', W2, draw_form(W2, W2_BOXES, 'Form W-2 Wage and Tax Statement'), W2_BOXES),
+        ('1099', NEC, draw_form(NEC, NEC_BOXES, 'Form 1099-NEC Nonemployee Compensation'), NEC_BOXES)
+    ]
+
+    print(f"{'form':<8}{'method':<12}{'ocr ms':>10}{'fields':>10}")
+    for document_type, template, page, boxes in forms:
+        expected = {box.field: box.parse(boxes[box.field][1]) for box in template.boxes}
+
+        started = time.perf_counter()
+        data = extract_fields(document_type, engine.image_to_string(page))
+        full_ms = (time.perf_counter() - started) * 1000
+        print(f"{document_type:<8}{'full page':<12}{full_ms:>10.1f}{score(expected, data):>7}/{len(expected)}")
+
+        started = time.perf_counter()
+        form = read_form(page, document_type, engine) or {'fields': {}}
+        template_ms = (time.perf_counter() - started) * 1000
+        print(f"{document_type:<8}{'template':<12}{template_ms:>10.1f}{score(expected, form['fields']):>7}/{len(expected)}")
+
+if __name__ == '__main__':
+    main()
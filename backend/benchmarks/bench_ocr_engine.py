@@ -0,0 +1,71 @@
+"""Per-page OCR latency: one tesseract process per call vs. the warm engine pool.
+
+Run from the backend directory (needs tesseract; install tesserocr to get
+warm engines, otherwise both columns measure the pytesseract path):
+
+    python benchmarks/bench_ocr_engine.py [pages]
+"""
+import os
+import shutil
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from src.services.ocr_engine import OCREnginePool, PytesseractEngine, create_engine
+
+LINES = [
+    'Form W-2 Wage and Tax Statement 2025',
+    'b Employer identification number (EIN) 12-3456789',
+    'c Employer name ACME WIDGETS AND CO',
+    '1 Wages, tips, other compensation 84512.33',
+    '2 Federal income tax withheld 12004.10',
+    '3 Social security wages 84512.33',
+    '5 Medicare wages and tips 84512.33'
+]
+
+def make_page(index: int) -> Image.Image:
+    page = Image.new('L', (1700, 2200), 255)
+    draw = ImageDraw.Draw(page)
+    for line_number, line in enumerate(LINES * 4):
+        draw.text((120, 120 + line_number * 60), f'{line} #{index}', fill=0)
+    return page
+
+def timed(func, pages):
+    latencies = []
+    for page in pages:
+        started = time.perf_counter()
+        func(page)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def report(label, latencies):
+    print(f"{label:<28} mean {statistics.mean(latencies):8.1f} ms   "
+          f"p50 {statistics.median(latencies):8.1f} ms   max {max(latencies):8.1f} ms")
+
+def main():
+    if shutil.which('tesseract') is None:
+        print('tesseract is not installed; nothing to measure')
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    pages = [make_page(i) for i in range(count)]
+
+    spawn = PytesseractEngine()
+    report('pytesseract (spawn per page)', timed(spawn.image_to_string, pages))
+
+    pool = OCREnginePool(size=1)
+    try:
+        print(f"warm engine: {pool.health_check()['engine']}")
+        report('warm pool, 1 worker', timed(pool.image_to_string, pages))
+    finally:
+        pool.shutdown()
+
+    in_process = create_engine()
+    report(f'in-process {in_process.name}', timed(in_process.image_to_string, pages))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Accuracy/latency trade-off of the OCR preprocessing steps.
+
+Run from the backend directory:
+
+    python benchmarks/bench_preprocessing.py [image ...]
+
+Without arguments a set of synthetic samples is generated: a 12 MP "phone
+photo" of a receipt on tinted paper, the same photo skewed by 3 degrees,
+and a clean 300 DPI scan. Each preprocessing configuration reports the
+time spent preprocessing, the time spent in tesseract and the character
+accuracy against the known text. Real samples passed on the command line
+report latency only. Accuracy needs tesseract installed.
+"""
+import difflib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.services.image_preprocessing import ImagePreprocessor
+from src.services.ocr_engine import create_engine
+
+RECEIPT_LINES = [
+    'CORNER OFFICE SUPPLY',
+    '123 MAIN STREET SPRINGFIELD',
+    '03/14/2025 10:42 AM',
+    'PRINTER PAPER 2 X 9.99 19.98',
+    'BLACK TONER CARTRIDGE 64.50',
+    'SUBTOTAL 84.48',
+    'SALES TAX 6.97',
+    'TOTAL 91.45'
+]
+
+CONFIGS = [
+    ('raw', None),
+    ('downscale', dict(grayscale=False, binarize=False, deskew=False)),
+    ('downscale+gray', dict(grayscale=True, binarize=False, deskew=False)),
+    ('downscale+gray+binarize', dict(grayscale=True, binarize=True, deskew=False)),
+    ('all steps', dict(grayscale=True, binarize=True, deskew=True))
+]
+
+def _font(size):
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+def make_samples(directory):
+    photo = Image.new('RGB', (3000, 4000), (228, 222, 205))
+    draw = ImageDraw.Draw(photo)
+    font = _font(90)
+    for line_number, line in enumerate(RECEIPT_LINES):
+        draw.text((250, 400 + line_number * 300), line, font=font, fill=(35, 30, 30))
+
+    scan = photo.resize((2550, 3400)).convert('L')
+    skewed = photo.rotate(3, resample=Image.Resampling.BICUBIC, fillcolor=(228, 222, 205))
+
+    samples = []
+    for name, image, dpi in (('photo.jpg', photo, 72), ('skewed.jpg', skewed, 72), ('scan.png', scan, 300)):
+        path = os.path.join(directory, name)
+        image.save(path, dpi=(dpi, dpi), quality=92)
+        samples.append((path, '\n'.join(RECEIPT_LINES)))
+    return samples
+
+def accuracy(expected, actual):
+    normalize = lambda text: ' '.join(text.split()).upper()
+    return difflib.SequenceMatcher(None, normalize(expected), normalize(actual)).ratio()
+
+def main():
+    engine = create_engine() if shutil.which('tesseract') else None
+    if engine is None:
+        print('tesseract is not installed; reporting preprocessing latency only\n')
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples = [(path, None) for path in sys.argv[1:]] or make_samples(directory)
+
+        print(f"{'sample':<12}{'config':<26}{'size':>12}{'prep ms':>10}{'ocr ms':>10}{'accuracy':>10}")
+        for path, expected in samples:
+            for label, options in CONFIGS:
+                started = time.perf_counter()
+                if options is None:
+                    image = Image.open(path)
+                    image.load()
+                else:
+                    preprocessor = ImagePreprocessor(**options)
+                    image = preprocessor.process(preprocessor.open(path))
+                prep_ms = (time.perf_counter() - started) * 1000
+
+                ocr_ms, score = float('nan'), float('nan')
+                if engine is not None:
+                    started = time.perf_counter()
+                    text = engine.image_to_string(image)
+                    ocr_ms = (time.perf_counter() - started) * 1000
+                    if expected is not None:
+                        score = accuracy(expected, text)
+
+                size = f'{image.width}x{image.height}'
+                print(f"{os.path.basename(path):<12}{label:<26}{size:>12}{prep_ms:>10.1f}{ocr_ms:>10.1f}{score:>10.3f}")
+
+if __name__ == '__main__':
+    main()
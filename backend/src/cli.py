@@ -0,0 +1,101 @@
+import sys
+import click
+from src.migrations import migrate, migration_status
+from src.migrations.query_plans import check_query_plans
+from src.models.user import User, db
+from src.services.compression import CODEC_EXTENSIONS
+from src.services.extraction_backfill import BACKFILL_CHUNK_SIZE, backfill_extraction
+from src.services.receipt_summaries import rebuild_summaries
+from src.services.storage_tiering import TIERING_CHUNK_SIZE, filing_season_start, storage_stats, tier_storage
+from src.services.upload_service import UPLOAD_SESSION_TTL_HOURS, upload_service
+
+def register_commands(app):
+    """Attach the maintenance commands to ``flask`` (``flask --app src.main <command>``)."""
+
+    @app.cli.command('grant-admin')
+    @click.argument('email')
+    @click.option('--revoke', is_flag=True, help='Take admin access away instead.')
+    def grant_admin(email, revoke):
+        """Make an existing user an admin, for the operational endpoints. They must sign in again.
+
+        Admin access is a flag next to the user's role, so a CPA stays a CPA.
+        """
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'No user with email {email}')
+        user.is_admin = not revoke
+        db.session.commit()
+        click.echo(f"{email} is {'no longer' if revoke else 'now'} an admin")
+
+    @app.cli.command('migrate')
+    @click.option('--target', default=None, help='Stop after this version (default: apply all).')
+    @click.option('--status', is_flag=True, help='List migrations and when they were applied.')
+    def migrate_command(target, status):
+        """Apply pending schema migrations."""
+        if status:
+            for migration in migration_status(db.engine):
+                applied = migration['applied_at'] or 'pending'
+                click.echo(f"{migration['version']}  {applied}  {migration['description']}")
+            return
+        applied = migrate(db.engine, target, progress=click.echo)
+        click.echo(f"Applied {len(applied)} migrations" if applied else 'Schema is up to date')
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', is_flag=True, help='Print every plan, not only the failing ones.')
+    def check_query_plans_command(verbose):
+        """Fail if a route's query scans a whole table (SQLite EXPLAIN QUERY PLAN)."""
+        results = check_query_plans()
+        failures = [result for result in results if result['scans']]
+        for result in results:
+            if verbose or result['scans'] or result['sorts']:
+                status = 'SCAN' if result['scans'] else ('sort' if result['sorts'] else 'ok')
+                click.echo(f"[{status}] {result['name']}")
+                for step in result['plan']:
+                    click.echo(f"    {step}")
+        click.echo(f"{len(results) - len(failures)}/{len(results)} queries use an index")
+        if failures:
+            sys.exit(1)
+
+    @app.cli.command('reextract')
+    @click.option('--chunk-size', default=BACKFILL_CHUNK_SIZE, show_default=True,
+                  help='Documents read and committed per batch.')
+    @click.option('--workers', type=int, default=None, help='Extraction processes (default: CPU count).')
+    @click.option('--dry-run', is_flag=True, help='Report what would change without writing.')
+    def reextract(chunk_size, workers, dry_run):
+        """Rerun field extraction on stored OCR text after the extractors change."""
+        stats = backfill_extraction(chunk_size, workers, dry_run, progress=click.echo)
+        click.echo(f"Done: {stats}")
+
+    @app.cli.command('rebuild-receipt-summaries')
+    @click.option('--user-id', 'user_ids', type=int, multiple=True,
+                  help='Only this user (repeatable; default: everyone).')
+    def rebuild_receipt_summaries(user_ids):
+        """Recompute the monthly receipt totals from the receipts, e.g. after editing them in SQL."""
+        with db.engine.begin() as conn:
+            rows = rebuild_summaries(conn, list(user_ids) or None)
+        click.echo(f"Wrote {rows} summary rows")
+
+    @app.cli.command('purge-uploads')
+    @click.option('--max-age-hours', default=UPLOAD_SESSION_TTL_HOURS, show_default=True)
+    def purge_uploads(max_age_hours):
+        """Delete chunked uploads that were started but never finished."""
+        click.echo(f"Aborted {upload_service.purge_expired(max_age_hours)} stale uploads")
+
+    @app.cli.command('tier-storage')
+    @click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Compress files only used by uploads older than this (default: start of the filing season).')
+    @click.option('--codec', type=click.Choice(['auto'] + list(CODEC_EXTENSIONS)), default=None,
+                  help='Compression for cold files (default: COLD_STORAGE_CODEC, zstd if installed, else xz).')
+    @click.option('--chunk-size', default=TIERING_CHUNK_SIZE, show_default=True,
+                  help='Files moved and committed per batch.')
+    @click.option('--dry-run', is_flag=True, help='Report what would move without writing.')
+    def tier_storage_command(before, codec, chunk_size, dry_run):
+        """Move files of prior filing seasons to compressed cold storage, and back when reused."""
+        click.echo(f"Cold cutoff: {(before or filing_season_start()).date()}")
+        stats = tier_storage(before, codec, chunk_size, dry_run, progress=click.echo)
+        click.echo(f"Done: {stats}")
+
+    @app.cli.command('storage-stats')
+    def storage_stats_command():
+        """Show stored bytes per tier and the bytes cold storage saves."""
+        click.echo(storage_stats())
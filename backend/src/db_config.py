@@ -0,0 +1,80 @@
+"""Database URL and engine settings.
+
+``DATABASE_URL`` selects the database; without it the app uses the SQLite
+file in src/database. Postgres URLs need a driver installed, e.g.
+``pip install psycopg2-binary`` for ``postgresql://``.
+
+SQLite connections are switched to WAL, so readers never block the single
+writer and a writer waits up to ``busy_timeout`` for another instead of
+failing with "database is locked". Postgres connections come from a
+bounded pool, are checked before use and carry a statement timeout.
+"""
+import os
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
+
+# SQLite
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+# NORMAL is durable in WAL mode except for the last commits on power loss
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+# Postgres (and any other pooled server database)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+DB_LOCK_TIMEOUT_MS = int(os.getenv('DB_LOCK_TIMEOUT_MS', '10000'))
+
+def database_url() -> str:
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        return f"sqlite:///{DEFAULT_SQLITE_PATH}"
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url: str) -> Dict:
+    """create_engine keyword arguments for a database URL."""
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        # pysqlite's own lock wait, in seconds; the busy_timeout pragma matches it
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+    if backend == 'postgresql':
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS} -c lock_timeout={DB_LOCK_TIMEOUT_MS}'
+        }
+    return options
+
+def configure_database(app, url: Optional[str] = None):
+    """Set the SQLAlchemy URL and engine options on a Flask app, before db.init_app."""
+    url = url or database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    cursor.close()
+
+def init_engine(engine: Engine):
+    """Per-connection setup; call before the engine's first connection."""
+    if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
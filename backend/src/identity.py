@@ -0,0 +1,98 @@
+"""Role and plan claims in access tokens, and the signed-in user of a request.
+
+Tokens carry the user's role (``user_type``), admin flag and subscription
+plan as signed claims, so a route that only needs to know what kind of caller it
+has checks the token instead of loading the User row. Routes that do need
+the row call ``current_user()``, which loads it at most once per request.
+
+Claims are as fresh as the token. A route that changes them (a new or
+canceled subscription) sends a replacement token in the ``X-Access-Token``
+header, which the frontend swaps in; ``plan_expires`` ends a plan claim
+when the subscription runs out. Tokens issued before claims existed fall
+back to the database.
+"""
+import time
+from calendar import timegm
+from functools import wraps
+from typing import Dict, Optional
+from flask import g, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required
+from src.models.user import User, db
+from src.services.payment_service import active_subscription
+
+def user_claims(user: User) -> Dict:
+    subscription = active_subscription(user.id)
+    return {
+        'role': user.user_type,
+        'admin': user.is_admin,
+        'plan': subscription.plan_type if subscription else 'free',
+        'plan_expires': timegm(subscription.end_date.utctimetuple()) if subscription else None
+    }
+
+def issue_token(user: User) -> str:
+    """Access token for a user, with role and plan claims."""
+    return create_access_token(identity=str(user.id), additional_claims=user_claims(user))
+
+def current_user_id() -> int:
+    return int(get_jwt_identity())
+
+def current_user() -> Optional[User]:
+    """The signed-in User, loaded once per request and shared by everything that asks."""
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, current_user_id())
+    return g.current_user
+
+def current_role() -> Optional[str]:
+    role = get_jwt().get('role')
+    if role is None:
+        user = current_user()
+        role = user.user_type if user else None
+    return role
+
+def current_is_admin() -> bool:
+    admin = get_jwt().get('admin')
+    if admin is None:
+        user = current_user()
+        admin = bool(user and user.is_admin)
+    return admin
+
+def current_plan() -> str:
+    claims = get_jwt()
+    if 'plan' not in claims:
+        subscription = active_subscription(current_user_id())
+        return subscription.plan_type if subscription else 'free'
+    expires = claims.get('plan_expires')
+    if expires is not None and expires <= time.time():
+        return 'free'
+    return claims['plan']
+
+def role_required(*roles):
+    """Like ``jwt_required()``, and answers 403 unless the caller's role is one of ``roles``."""
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            if current_role() not in roles:
+                return jsonify({'error': 'Access denied'}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def admin_required():
+    """Like ``jwt_required()``, and answers 403 unless the caller is an admin."""
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            if not current_is_admin():
+                return jsonify({'error': 'Access denied'}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def refresh_token(response):
+    """Attach a new token to a response after the signed-in user's claims changed."""
+    user = current_user()
+    if user is not None:
+        response.headers['X-Access-Token'] = issue_token(user)
+    return response
@@ -1,24 +1,38 @@
 import os
 import sys
+import threading
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, jsonify
+from werkzeug.exceptions import NotFound
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from src.models.user import db
+from src.db_config import configure_database, init_engine
+from src.migrations import migrate
+from src.pagination import ListArgsError
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp
 from src.routes.documents import documents_bp
 from src.routes.tax_returns import tax_returns_bp
+from src.routes.ocr import ocr_bp
+from src.routes.uploads import uploads_bp
+from src.routes.dashboard import dashboard_bp
+from src.services.ocr_queue import ocr_queue
+from src.cli import register_commands
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 app.config['JWT_SECRET_KEY'] = 'jwt-secret-string'  # Change this in production
+# Let nginx/Apache send stored files (X-Sendfile) when running behind one
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '0').lower() in ('1', 'true', 'yes', 'on')
 
 # Initialize extensions
 jwt = JWTManager(app)
-CORS(app)
+# List routes put the next page's cursor in headers (see pagination.py), and
+# routes that change a user's claims send a new token (see identity.py)
+CORS(app, expose_headers=['X-Next-Cursor', 'Link', 'X-Access-Token'])
 
 # JWT error handlers
 @jwt.expired_token_loader
@@ -33,22 +47,61 @@ def invalid_token_callback(error):
 def missing_token_callback(error):
     return jsonify({'error': 'Authorization token is required'}), 401
 
+# Bad limit, cursor or filter arguments on list routes
+@app.errorhandler(ListArgsError)
+def list_args_error_callback(error):
+    return jsonify({'error': str(error)}), 400
+
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(documents_bp, url_prefix='/api')
 app.register_blueprint(tax_returns_bp, url_prefix='/api')
+app.register_blueprint(ocr_bp, url_prefix='/api')
+app.register_blueprint(uploads_bp, url_prefix='/api')
+app.register_blueprint(dashboard_bp, url_prefix='/api')
 
 # Import and register payments blueprint
 from src.routes.payments import payments_bp
 app.register_blueprint(payments_bp, url_prefix='/api')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# Database configuration: DATABASE_URL, or the SQLite file in src/database (see db_config.py)
+configure_database(app)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
-    db.create_all()
+    init_engine(db.engine)
+ocr_queue.init_app(app)
+
+# Migrations and the OCR workers start with the server, not on import, so
+# `flask` commands neither migrate nor start workers (run `flask migrate`
+# before using them on a new database). BACKGROUND_WORK=0 turns both off,
+# e.g. for a web-only process next to one that runs OCR.
+app.config.setdefault('BACKGROUND_WORK', os.getenv('BACKGROUND_WORK', '1').lower() in ('1', 'true', 'yes', 'on'))
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background_work():
+    """Bring the schema up to date (see src/migrations) and start the OCR queue, once."""
+    global _background_started
+    if _background_started or not app.config['BACKGROUND_WORK']:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        with app.app_context():
+            migrate(db.engine)
+        ocr_queue.start()
+        _background_started = True
+
+# WSGI servers only import the app; start with the first request they serve
+app.before_request(start_background_work)
+
+# Maintenance commands, e.g. `flask --app src.main reextract`
+register_commands(app)
+
+# Vite puts a content hash in every file name under assets/
+STATIC_ASSET_MAX_AGE = 365 * 24 * 3600
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -57,15 +110,34 @@ def serve(path):
     if static_folder_path is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+    # send_from_directory does the only stat and adds ETag/Last-Modified,
+    # so repeat visits get 304s
+    if path != "":
+        try:
+            response = send_from_directory(static_folder_path, path)
+        except NotFound:
+            pass
         else:
-            return "index.html not found", 404
+            if path.startswith('assets/'):
+                response.cache_control.no_cache = None
+                response.cache_control.max_age = STATIC_ASSET_MAX_AGE
+                response.cache_control.public = True
+                response.cache_control.immutable = True
+            return response
+
+    # Client-side routes fall through to index.html, always revalidated so
+    # a deploy is picked up on the next load
+    try:
+        response = send_from_directory(static_folder_path, 'index.html')
+    except NotFound:
+        return "index.html not found", 404
+    response.cache_control.no_cache = True
+    return response
 
 
 if __name__ == '__main__':
+    # With the reloader the server runs in a child process (WERKZEUG_RUN_MAIN);
+    # the watching parent never serves and starts nothing
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_work()
     app.run(host='0.0.0.0', port=5000, debug=True)
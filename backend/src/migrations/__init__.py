@@ -0,0 +1,73 @@
+"""Versioned schema migrations.
+
+Each ``vNNNN_<name>.py`` module in this package defines ``VERSION``,
+``DESCRIPTION`` and ``upgrade(conn)``. ``migrate`` runs the modules not yet
+recorded in the ``schema_migrations`` table in version order, each in its
+own transaction. Migrations only use the idempotent helpers in
+operations.py, so a database created by ``db.create_all()`` before this
+package existed, or two processes starting at once, end up in the same
+state. A migration that creates a table defines it as it was at that
+version, never through the models, so later model changes need a
+migration of their own.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(20), primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+def load_migrations() -> List:
+    """Migration modules of this package, in version order."""
+    modules = [
+        importlib.import_module(f'{__name__}.{name}')
+        for _, name, _ in pkgutil.iter_modules(__path__)
+        if name.startswith('v') and name[1:5].isdigit()
+    ]
+    return sorted(modules, key=lambda module: module.VERSION)
+
+def applied_versions(engine: Engine) -> Dict[str, datetime]:
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return dict(conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+
+def migrate(engine: Engine, target: Optional[str] = None,
+            progress: Optional[Callable[[str], None]] = None) -> List[str]:
+    """Apply pending migrations up to ``target`` (default: all). Returns the versions applied."""
+    applied = applied_versions(engine)
+    ran = []
+    for module in load_migrations():
+        if module.VERSION in applied:
+            continue
+        if target is not None and module.VERSION > target:
+            break
+        if progress:
+            progress(f"Applying {module.VERSION}: {module.DESCRIPTION}")
+        try:
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=module.VERSION,
+                    description=module.DESCRIPTION,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another process recorded it first; its changes are the same
+            continue
+        ran.append(module.VERSION)
+    return ran
+
+def migration_status(engine: Engine) -> List[Dict]:
+    applied = applied_versions(engine)
+    return [
+        {'version': module.VERSION, 'description': module.DESCRIPTION, 'applied_at': applied.get(module.VERSION)}
+        for module in load_migrations()
+    ]
@@ -0,0 +1,36 @@
+"""Idempotent schema changes for migrations."""
+from typing import List, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.types import TypeEngine
+
+def has_table(conn: Connection, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(info['name'] == column for info in inspect(conn).get_columns(table))
+
+def add_column(conn: Connection, table: str, column: str, type_: TypeEngine, nullable: bool = True,
+               default: Optional[str] = None, references: Optional[str] = None):
+    """ALTER TABLE ... ADD COLUMN unless it exists.
+
+    A NOT NULL column needs a ``default`` to fill the existing rows.
+    """
+    if has_column(conn, table, column):
+        return
+    definition = f'{column} {type_.compile(dialect=conn.dialect)}'
+    if references:
+        definition += f' REFERENCES {references}'
+    if default is not None:
+        definition += f" DEFAULT '{default}'"
+    if not nullable:
+        definition += ' NOT NULL'
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {definition}'))
+
+def create_index(conn: Connection, name: str, table: str, columns: List[str], unique: bool = False):
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+def drop_index(conn: Connection, name: str):
+    conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
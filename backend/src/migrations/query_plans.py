@@ -0,0 +1,121 @@
+"""EXPLAIN QUERY PLAN for the queries behind each route, flagging full table scans.
+
+``flask check-query-plans`` runs this against the configured SQLite
+database and exits non-zero when a query scans a table, so a missing or
+dropped index shows up before it shows up as a slow page. Add a query here
+when adding a route or a job that filters a growing table.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import func, or_, text
+from src.models.user import (Blob, CPAClient, OCRJob, Payment, Receipt, ReceiptSummary, Subscription, TaxDocument,
+                             TaxReturn, UploadSession, User, db)
+from src.pagination import DEFAULT_PAGE_SIZE, keyset_query
+from src.services.cpa_clients import roster_query
+from src.services.document_search import document_search_query
+
+# Sample values; SQLite picks plans from the schema, not from the data
+USER_ID = 1
+NOW = datetime(2025, 1, 1)
+
+# e.g. 'SCAN users_fts VIRTUAL TABLE INDEX 0:M4', an FTS5 MATCH; '0:' alone would read every row
+VIRTUAL_TABLE_LOOKUP = re.compile(r'VIRTUAL TABLE INDEX \d+:\S')
+
+def _page(query, columns, after, descending=True):
+    """A list route's query for a page after the first; see src/pagination.py."""
+    return keyset_query(query, columns, descending, after).limit(DEFAULT_PAGE_SIZE + 1)
+
+def hot_queries() -> List[tuple]:
+    """(name, query, allow_scan) for the queries routes and jobs run."""
+    return [
+        ('POST /auth/login', User.query.filter_by(email='user@example.com'), False),
+        ('GET /users', _page(User.query, [User.id], [USER_ID], descending=False), False),
+        ('GET /cpa/clients', _page(roster_query(USER_ID), [CPAClient.client_id], [USER_ID], descending=False), False),
+        ('GET /cpa/clients?q', _page(roster_query(USER_ID, 'acme smi'), [CPAClient.client_id], [USER_ID], descending=False), False),
+        ('CPA client check', CPAClient.query.filter_by(cpa_id=USER_ID, client_id=2), False),
+        ('GET /documents', _page(
+            TaxDocument.query.filter_by(user_id=USER_ID), [TaxDocument.uploaded_at, TaxDocument.id], [NOW, 1]
+        ), False),
+        ('GET /documents?document_type&date_from', _page(
+            TaxDocument.query.filter(
+                TaxDocument.user_id == USER_ID,
+                TaxDocument.document_type == 'w-2',
+                TaxDocument.uploaded_at >= NOW
+            ), [TaxDocument.uploaded_at, TaxDocument.id], [NOW, 1]
+        ), False),
+        ('GET /documents/search', document_search_query(['acme', '1099'], DEFAULT_PAGE_SIZE, USER_ID, None), False),
+        ('GET /cpa/documents/search', document_search_query(['acme', '1099'], DEFAULT_PAGE_SIZE, None, USER_ID), False),
+        ('GET /documents/<id>', TaxDocument.query.filter_by(id=1, user_id=USER_ID), False),
+        ('GET /receipts', _page(Receipt.query.filter_by(user_id=USER_ID), [Receipt.date, Receipt.id], [NOW.date(), 1]), False),
+        ('GET /receipts/summary', ReceiptSummary.query.filter(
+            ReceiptSummary.user_id == USER_ID, ReceiptSummary.year == 2024, ReceiptSummary.month <= 12
+        ).order_by(ReceiptSummary.month, ReceiptSummary.category), False),
+        ('GET /returns', _page(TaxReturn.query.filter_by(user_id=USER_ID), [TaxReturn.year, TaxReturn.id], [2024, 1]), False),
+        ('POST /returns', TaxReturn.query.filter_by(user_id=USER_ID, year=2024), False),
+        ('GET /subscription', Subscription.query.filter_by(user_id=USER_ID, status='active'), False),
+        ('GET /subscription/history', _page(
+            Subscription.query.filter_by(user_id=USER_ID), [Subscription.start_date, Subscription.id], [NOW, 1]
+        ), False),
+        ('GET /payments/history', _page(
+            Payment.query.filter_by(user_id=USER_ID), [Payment.created_at, Payment.id], [NOW, 1]
+        ), False),
+        ('GET /ocr/jobs/<id>',
+         OCRJob.query.join(TaxDocument).filter(OCRJob.id == 1, TaxDocument.user_id == USER_ID), False),
+        ('GET /documents/<id>/ocr', OCRJob.query.filter_by(document_id=1).order_by(OCRJob.id.desc()), False),
+        ('PUT /uploads/<id>', UploadSession.query.filter_by(id='0' * 32, user_id=USER_ID), False),
+        ('upload size limit', Subscription.query.filter(
+            Subscription.user_id == USER_ID,
+            Subscription.status == 'active',
+            Subscription.end_date > NOW
+        ).order_by(Subscription.end_date.desc()), False),
+        ('OCR queue resume', db.session.query(OCRJob.id).filter_by(status='pending').order_by(OCRJob.id), False),
+        ('OCR queue stale jobs', OCRJob.query.filter(
+            OCRJob.status == 'running',
+            func.coalesce(OCRJob.heartbeat_at, OCRJob.started_at) < NOW
+        ), False),
+        ('OCR queue sweep', db.session.query(OCRJob.id).filter(
+            OCRJob.status == 'pending',
+            func.coalesce(OCRJob.next_attempt_at, OCRJob.created_at) < NOW
+        ).order_by(OCRJob.id), False),
+        ('purge-uploads', UploadSession.query.filter(
+            UploadSession.status == 'uploading',
+            UploadSession.updated_at < NOW
+        ), False),
+        ('blob references', Blob.query.filter(Blob.sha256 == '0' * 64, Blob.refcount > 0), False),
+        ('reextract', TaxDocument.query.filter(
+            TaxDocument.id > 0,
+            TaxDocument.ocr_status == 'completed',
+            or_(TaxDocument.extractor_version.is_(None), TaxDocument.extractor_version != '0')
+        ).order_by(TaxDocument.id).limit(500), False)
+    ]
+
+def explain(query) -> List[str]:
+    """SQLite's plan for a query, one detail line per step."""
+    statement = getattr(query, 'statement', query)  # an ORM Query or a Core select
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return [row[-1] for row in rows]
+
+def table_scans(plan: List[str]) -> List[str]:
+    """The steps of a plan that read every row of a table.
+
+    'SCAN t' and 'SCAN t USING [COVERING] INDEX i' both visit every row;
+    'SEARCH' is an index lookup, as is a virtual table (FTS5) scan with
+    constraints. 'SCAN CONSTANT ROW' reads a VALUES list, not a table.
+    """
+    return [step for step in plan if step.startswith('SCAN ') and step != 'SCAN CONSTANT ROW'
+            and not VIRTUAL_TABLE_LOOKUP.search(step)]
+
+def check_query_plans() -> List[Dict]:
+    """Plan every hot query. A query with 'scans' set reads a whole table."""
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('Query plan checks read SQLite EXPLAIN QUERY PLAN output')
+
+    results = []
+    for name, query, allow_scan in hot_queries():
+        plan = explain(query)
+        scans = [] if allow_scan else table_scans(plan)
+        sorts = [step for step in plan if 'TEMP B-TREE' in step]
+        results.append({'name': name, 'plan': plan, 'scans': scans, 'sorts': sorts})
+    return results
@@ -0,0 +1,83 @@
+"""The tables as they were before versioned migrations, frozen here.
+
+Later columns and tables come from later migrations, never from the
+models, so a new database is built by the same steps an old one was
+upgraded by. A database created by ``db.create_all()`` already has these
+tables and is left alone.
+"""
+from sqlalchemy import JSON, Column, Date, DateTime, ForeignKey, Integer, MetaData, Numeric, String, Table
+
+VERSION = '0001'
+DESCRIPTION = 'Create the baseline tables'
+
+metadata = MetaData()
+
+Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('email', String(255), unique=True, nullable=False),
+    Column('password_hash', String(255), nullable=False),
+    Column('phone_number', String(20), nullable=True),
+    Column('user_type', String(20), nullable=False),
+    Column('profile', JSON, nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False)
+)
+
+Table(
+    'tax_documents', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('document_type', String(50), nullable=False),
+    Column('file_path', String(255), nullable=False),
+    Column('extracted_data', JSON, nullable=True),
+    Column('uploaded_at', DateTime, nullable=False)
+)
+
+Table(
+    'receipts', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('file_path', String(255), nullable=False),
+    Column('category', String(100), nullable=True),
+    Column('amount', Numeric(10, 2), nullable=False),
+    Column('date', Date, nullable=False),
+    Column('uploaded_at', DateTime, nullable=False)
+)
+
+Table(
+    'tax_returns', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('cpa_id', Integer, ForeignKey('users.id'), nullable=True),
+    Column('year', Integer, nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('return_data', JSON, nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False)
+)
+
+Table(
+    'subscriptions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('plan_type', String(50), nullable=False),
+    Column('start_date', DateTime, nullable=False),
+    Column('end_date', DateTime, nullable=False),
+    Column('status', String(20), nullable=False)
+)
+
+Table(
+    'payments', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('amount', Numeric(10, 2), nullable=False),
+    Column('currency', String(3), nullable=False),
+    Column('payment_method', String(20), nullable=False),
+    Column('transaction_id', String(255), nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('created_at', DateTime, nullable=False)
+)
+
+def upgrade(conn):
+    metadata.create_all(conn)
@@ -0,0 +1,84 @@
+"""Tables and columns added while db.create_all() was the only schema step.
+
+create_all creates missing tables but never alters existing ones, so
+databases from before these features lack the columns. The new tables
+are frozen here as they were then; their indexes come in 0003.
+"""
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text
+from src.migrations.operations import add_column, create_index
+
+VERSION = '0002'
+DESCRIPTION = 'Add the blob, OCR text, OCR job and upload session tables and the stored file columns'
+
+metadata = MetaData()
+
+# Referenced only; created by 0001
+Table('users', metadata, Column('id', Integer, primary_key=True))
+Table('tax_documents', metadata, Column('id', Integer, primary_key=True))
+
+# tier, codec, stored_size and tiered_at are added below, as on older databases
+blobs = Table(
+    'blobs', metadata,
+    Column('sha256', String(64), primary_key=True),
+    Column('size', BigInteger, nullable=False),
+    Column('refcount', Integer, nullable=False),
+    Column('created_at', DateTime, nullable=False)
+)
+
+document_texts = Table(
+    'document_texts', metadata,
+    Column('document_id', Integer, ForeignKey('tax_documents.id'), primary_key=True),
+    Column('raw_text', Text, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False)
+)
+
+ocr_jobs = Table(
+    'ocr_jobs', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('document_id', Integer, ForeignKey('tax_documents.id'), nullable=False),
+    Column('file_path', String(512), nullable=False),
+    Column('document_type', String(50), nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('error', Text, nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('started_at', DateTime, nullable=True),
+    Column('finished_at', DateTime, nullable=True)
+)
+
+upload_sessions = Table(
+    'upload_sessions', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('kind', String(20), nullable=False),
+    Column('filename', String(255), nullable=False),
+    Column('file_path', String(512), nullable=False),
+    Column('options', JSON, nullable=True),
+    Column('total_size', BigInteger, nullable=True),
+    Column('received', BigInteger, nullable=False),
+    Column('sha256', String(64), nullable=True),
+    Column('status', String(20), nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False)
+)
+
+def upgrade(conn):
+    for table in (blobs, document_texts, ocr_jobs, upload_sessions):
+        table.create(conn, checkfirst=True)
+
+    # Documents uploaded before the OCR queue were processed during the upload
+    add_column(conn, 'tax_documents', 'ocr_status', String(20), nullable=False, default='completed')
+    add_column(conn, 'tax_documents', 'extractor_version', String(20))
+    add_column(conn, 'tax_documents', 'filename', String(255))
+    add_column(conn, 'tax_documents', 'content_hash', String(64), references='blobs (sha256)')
+    create_index(conn, 'ix_tax_documents_content_hash', 'tax_documents', ['content_hash'])
+
+    add_column(conn, 'receipts', 'filename', String(255))
+    add_column(conn, 'receipts', 'content_hash', String(64), references='blobs (sha256)')
+    create_index(conn, 'ix_receipts_content_hash', 'receipts', ['content_hash'])
+
+    add_column(conn, 'blobs', 'tier', String(10), nullable=False, default='hot')
+    add_column(conn, 'blobs', 'codec', String(10))
+    add_column(conn, 'blobs', 'stored_size', BigInteger())
+    add_column(conn, 'blobs', 'tiered_at', DateTime())
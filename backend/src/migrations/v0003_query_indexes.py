@@ -0,0 +1,20 @@
+"""Indexes for the queries every page makes, checked by ``flask check-query-plans``.
+
+Per-user lists lead with user_id and continue with the column they are
+looked up or sorted by.
+"""
+from src.migrations.operations import create_index
+
+VERSION = '0003'
+DESCRIPTION = 'Add per-user composite indexes and OCR job/upload session indexes'
+
+def upgrade(conn):
+    create_index(conn, 'ix_tax_documents_user_id_uploaded_at', 'tax_documents', ['user_id', 'uploaded_at'])
+    create_index(conn, 'ix_receipts_user_id_date', 'receipts', ['user_id', 'date'])
+    create_index(conn, 'ix_tax_returns_user_id_year', 'tax_returns', ['user_id', 'year'])
+    create_index(conn, 'ix_subscriptions_user_id_status', 'subscriptions', ['user_id', 'status'])
+    create_index(conn, 'ix_payments_user_id_created_at', 'payments', ['user_id', 'created_at'])
+    create_index(conn, 'ix_users_user_type', 'users', ['user_type'])
+    create_index(conn, 'ix_ocr_jobs_document_id', 'ocr_jobs', ['document_id'])
+    create_index(conn, 'ix_ocr_jobs_status', 'ocr_jobs', ['status'])
+    create_index(conn, 'ix_upload_sessions_status_updated_at', 'upload_sessions', ['status', 'updated_at'])
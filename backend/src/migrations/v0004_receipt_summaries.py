@@ -0,0 +1,30 @@
+"""Monthly per-category receipt totals; see services/receipt_summaries.py.
+
+Fills the new table from the receipts already stored. From then on each
+flush that changes receipts keeps it current.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, Numeric, String, Table
+from src.services.receipt_summaries import rebuild_summaries
+
+VERSION = '0004'
+DESCRIPTION = 'Add the receipt_summaries rollup and fill it from existing receipts'
+
+metadata = MetaData()
+
+# Referenced only; created by 0001
+Table('users', metadata, Column('id', Integer, primary_key=True))
+
+receipt_summaries = Table(
+    'receipt_summaries', metadata,
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('year', Integer, primary_key=True),
+    Column('month', Integer, primary_key=True),
+    Column('category', String(100), primary_key=True),
+    Column('receipt_count', Integer, nullable=False),
+    Column('total_amount', Numeric(12, 2), nullable=False),
+    Column('updated_at', DateTime, nullable=False)
+)
+
+def upgrade(conn):
+    receipt_summaries.create(conn, checkfirst=True)
+    rebuild_summaries(conn)
@@ -0,0 +1,68 @@
+"""CPA client rosters and the search index over users; see services/cpa_clients.py.
+
+CPAs already reviewing a client's return start with that client on their
+roster. On SQLite the search index is an FTS5 table that triggers keep in
+step with ``users``; on Postgres it is a trigram index.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, Table, text
+from src.services.cpa_clients import SEARCH_TEXT_SQL
+
+VERSION = '0005'
+DESCRIPTION = 'Add cpa_clients rosters and the users search index'
+
+metadata = MetaData()
+
+# Referenced only; created by 0001
+Table('users', metadata, Column('id', Integer, primary_key=True))
+
+cpa_clients = Table(
+    'cpa_clients', metadata,
+    Column('cpa_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('client_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_cpa_clients_client_id', 'client_id')
+)
+
+# Name fields come out of the profile JSON
+FTS_VALUES = ("{row}.id, {row}.email, {row}.phone_number, "
+              "json_extract({row}.profile, '$.first_name'), json_extract({row}.profile, '$.last_name')")
+FTS_COLUMNS = 'rowid, email, phone_number, first_name, last_name'
+
+def _sqlite_search_index(conn):
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+        "email, phone_number, first_name, last_name, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN "
+        f"INSERT INTO users_fts ({FTS_COLUMNS}) VALUES ({FTS_VALUES.format(row='new')}); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+        "DELETE FROM users_fts WHERE rowid = old.id; END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF email, phone_number, profile ON users BEGIN "
+        f"DELETE FROM users_fts WHERE rowid = old.id; "
+        f"INSERT INTO users_fts ({FTS_COLUMNS}) VALUES ({FTS_VALUES.format(row='new')}); END"
+    ))
+    conn.execute(text('DELETE FROM users_fts'))
+    conn.execute(text(f"INSERT INTO users_fts ({FTS_COLUMNS}) SELECT {FTS_VALUES.format(row='users')} FROM users"))
+
+def _postgres_search_index(conn):
+    conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin (({SEARCH_TEXT_SQL}) gin_trgm_ops)'))
+
+def upgrade(conn):
+    cpa_clients.create(conn, checkfirst=True)
+    conn.execute(text(
+        "INSERT INTO cpa_clients (cpa_id, client_id, created_at) "
+        "SELECT cpa_id, user_id, MIN(updated_at) FROM tax_returns "
+        "WHERE cpa_id IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM cpa_clients WHERE cpa_clients.cpa_id = tax_returns.cpa_id AND cpa_clients.client_id = tax_returns.user_id"
+        ") GROUP BY cpa_id, user_id"
+    ))
+    if conn.dialect.name == 'sqlite':
+        _sqlite_search_index(conn)
+    elif conn.dialect.name == 'postgresql':
+        _postgres_search_index(conn)
@@ -0,0 +1,59 @@
+"""Full-text index over documents; see services/document_search.py.
+
+A document's index row is rebuilt from ``tax_documents`` and its
+``document_texts`` row whenever either changes, so OCR results and
+``flask reextract`` are searchable as soon as they commit.
+"""
+from sqlalchemy import text
+
+VERSION = '0006'
+DESCRIPTION = 'Add the documents full-text search index'
+
+FTS_COLUMNS = 'rowid, owner, document_type, filename, fields, raw_text'
+
+# The values of the fields extracted by OCR, e.g. payer names and amounts
+FIELDS_SQL = ("(SELECT group_concat(atom, ' ') FROM json_tree(d.extracted_data, '$.extracted_data') "
+              "WHERE atom IS NOT NULL)")
+
+def _index(where: str = '') -> str:
+    """INSERT of the index rows of the documents matching ``where``."""
+    return (
+        f"INSERT INTO documents_fts ({FTS_COLUMNS}) "
+        f"SELECT d.id, 'u' || d.user_id, d.document_type, coalesce(d.filename, ''), coalesce({FIELDS_SQL}, ''), "
+        f"coalesce(t.raw_text, '') FROM tax_documents d LEFT JOIN document_texts t ON t.document_id = d.id{where}"
+    )
+
+def _refresh(document_id: str) -> str:
+    """Trigger statements that rewrite one document's index row."""
+    return f"DELETE FROM documents_fts WHERE rowid = {document_id}; {_index(f' WHERE d.id = {document_id}')};"
+
+def _sqlite_search_index(conn):
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+        "owner, document_type, filename, fields, raw_text, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    triggers = {
+        'tax_documents_fts_insert': f"AFTER INSERT ON tax_documents BEGIN {_refresh('new.id')} END",
+        'tax_documents_fts_update': (f"AFTER UPDATE OF user_id, document_type, filename, extracted_data ON tax_documents "
+                                     f"BEGIN {_refresh('new.id')} END"),
+        'tax_documents_fts_delete': "AFTER DELETE ON tax_documents BEGIN DELETE FROM documents_fts WHERE rowid = old.id; END",
+        'document_texts_fts_insert': f"AFTER INSERT ON document_texts BEGIN {_refresh('new.document_id')} END",
+        'document_texts_fts_update': f"AFTER UPDATE OF raw_text ON document_texts BEGIN {_refresh('new.document_id')} END",
+        'document_texts_fts_delete': f"AFTER DELETE ON document_texts BEGIN {_refresh('old.document_id')} END"
+    }
+    for name, body in triggers.items():
+        conn.execute(text(f'CREATE TRIGGER IF NOT EXISTS {name} {body}'))
+    conn.execute(text('DELETE FROM documents_fts'))
+    conn.execute(text(_index()))
+
+def _postgres_search_index(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_document_texts_raw_text_fts ON document_texts "
+        "USING gin (to_tsvector('simple', raw_text))"
+    ))
+
+def upgrade(conn):
+    if conn.dialect.name == 'sqlite':
+        _sqlite_search_index(conn)
+    elif conn.dialect.name == 'postgresql':
+        _postgres_search_index(conn)
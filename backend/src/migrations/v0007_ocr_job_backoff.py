@@ -0,0 +1,9 @@
+"""When a failed OCR job may run again; see OCRJobQueue._fail."""
+from sqlalchemy import DateTime
+from src.migrations.operations import add_column
+
+VERSION = '0007'
+DESCRIPTION = 'Add the OCR job retry time'
+
+def upgrade(conn):
+    add_column(conn, 'ocr_jobs', 'next_attempt_at', DateTime())
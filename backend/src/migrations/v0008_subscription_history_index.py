@@ -0,0 +1,8 @@
+"""Index for the subscription history, newest first by (start_date, id)."""
+from src.migrations.operations import create_index
+
+VERSION = '0008'
+DESCRIPTION = 'Add the subscription history index'
+
+def upgrade(conn):
+    create_index(conn, 'ix_subscriptions_user_id_start_date', 'subscriptions', ['user_id', 'start_date'])
@@ -0,0 +1,22 @@
+"""JSON columns as JSONB on Postgres, as the models declare them (see JSONType).
+
+0001 and 0002 create them as plain JSON, the type they had before
+Postgres was supported. SQLite stores both the same way and is left alone.
+"""
+from sqlalchemy import text
+
+VERSION = '0009'
+DESCRIPTION = 'Store JSON columns as JSONB on Postgres'
+
+JSON_COLUMNS = [
+    ('users', 'profile'),
+    ('tax_documents', 'extracted_data'),
+    ('tax_returns', 'return_data'),
+    ('upload_sessions', 'options')
+]
+
+def upgrade(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    for table, column in JSON_COLUMNS:
+        conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb'))
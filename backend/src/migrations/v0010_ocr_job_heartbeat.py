@@ -0,0 +1,9 @@
+"""When a running OCR job's process last reported it alive; see OCRJobQueue.sweep."""
+from sqlalchemy import DateTime
+from src.migrations.operations import add_column
+
+VERSION = '0010'
+DESCRIPTION = 'Add the OCR job heartbeat'
+
+def upgrade(conn):
+    add_column(conn, 'ocr_jobs', 'heartbeat_at', DateTime())
@@ -0,0 +1,8 @@
+"""Index for the returns assigned to a CPA, loaded when the CPA's user row is deleted."""
+from src.migrations.operations import create_index
+
+VERSION = '0011'
+DESCRIPTION = 'Add the tax return CPA index'
+
+def upgrade(conn):
+    create_index(conn, 'ix_tax_returns_cpa_id', 'tax_returns', ['cpa_id'])
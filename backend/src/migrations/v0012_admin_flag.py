@@ -0,0 +1,15 @@
+"""Admin access as a flag next to the role instead of an 'admin' user_type.
+
+``flask grant-admin`` used to replace the user_type; those users keep
+admin access and become individuals, since their earlier role was not
+kept.
+"""
+from sqlalchemy import Boolean, text
+from src.migrations.operations import add_column
+
+VERSION = '0012'
+DESCRIPTION = 'Add the admin flag'
+
+def upgrade(conn):
+    add_column(conn, 'users', 'is_admin', Boolean(), nullable=False, default='0')
+    conn.execute(text("UPDATE users SET is_admin = TRUE, user_type = 'individual' WHERE user_type = 'admin'"))
@@ -0,0 +1,72 @@
+"""Postgres search over the same sources as SQLite's documents_fts.
+
+0006 indexed only the OCR text on Postgres. Each document now has a
+``search_vector`` holding its type, extracted field values, file name
+and OCR text, weighted like the FTS5 columns (see RANK_WEIGHTS in
+services/document_search.py). Triggers rebuild it whenever the document
+or its text changes, as the SQLite triggers do, and a GIN index serves
+the @@ match. SQLite is left alone.
+"""
+from sqlalchemy import text
+from src.migrations.operations import drop_index
+
+VERSION = '0013'
+DESCRIPTION = 'Index document type, file name and fields for search on Postgres'
+
+# Weights A-D: the type, then extracted fields, file name and OCR text
+VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION document_search_vector(doc_id integer, doc_type text, doc_filename text, doc_data jsonb)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(doc_type, '')), 'A')
+        || setweight(jsonb_to_tsvector('simple', coalesce(doc_data -> 'extracted_data', '{}'::jsonb),
+                                       '["string", "numeric"]'), 'B')
+        || setweight(to_tsvector('simple', coalesce(doc_filename, '')), 'C')
+        || setweight(to_tsvector('simple', coalesce(
+               (SELECT raw_text FROM document_texts WHERE document_texts.document_id = doc_id), '')), 'D')
+$$
+"""
+
+DOCUMENT_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION tax_documents_search_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := document_search_vector(NEW.id, NEW.document_type, NEW.filename, NEW.extracted_data);
+    RETURN NEW;
+END
+$$
+"""
+
+TEXT_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION document_texts_search_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE tax_documents
+    SET search_vector = document_search_vector(id, document_type, filename, extracted_data)
+    WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.document_id ELSE NEW.document_id END;
+    RETURN NULL;
+END
+$$
+"""
+
+def upgrade(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    conn.execute(text('ALTER TABLE tax_documents ADD COLUMN IF NOT EXISTS search_vector tsvector'))
+    conn.execute(text(VECTOR_FUNCTION))
+    conn.execute(text(DOCUMENT_TRIGGER_FUNCTION))
+    conn.execute(text(TEXT_TRIGGER_FUNCTION))
+    conn.execute(text('DROP TRIGGER IF EXISTS tax_documents_search ON tax_documents'))
+    conn.execute(text(
+        'CREATE TRIGGER tax_documents_search BEFORE INSERT OR UPDATE OF document_type, filename, extracted_data '
+        'ON tax_documents FOR EACH ROW EXECUTE FUNCTION tax_documents_search_refresh()'
+    ))
+    conn.execute(text('DROP TRIGGER IF EXISTS document_texts_search ON document_texts'))
+    conn.execute(text(
+        'CREATE TRIGGER document_texts_search AFTER INSERT OR UPDATE OF raw_text OR DELETE '
+        'ON document_texts FOR EACH ROW EXECUTE FUNCTION document_texts_search_refresh()'
+    ))
+    conn.execute(text(
+        'UPDATE tax_documents SET search_vector = document_search_vector(id, document_type, filename, extracted_data)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_tax_documents_search_vector ON tax_documents USING gin (search_vector)'
+    ))
+    drop_index(conn, 'ix_document_texts_raw_text_fts')
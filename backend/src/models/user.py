@@ -1,18 +1,45 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.dialects.postgresql import JSONB
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+# JSON on SQLite, binary JSONB (indexable, no reparsing on read) on Postgres
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
+
+def _to_dict(record, fields):
+    """Read only the named attributes of a record, dates as ISO strings and Numeric as float.
+
+    Reading only what was asked for keeps columns left out of the query
+    (see ``project`` in src/pagination.py) from being loaded row by row.
+    """
+    data = {}
+    for name in fields:
+        value = getattr(record, name)
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        data[name] = value
+    return data
+
+# user_type values of the people CPAs work for
+CLIENT_TYPES = ('individual', 'business')
+
 class User(db.Model):
     __tablename__ = 'users'
+    FIELDS = ('id', 'email', 'phone_number', 'user_type', 'profile', 'created_at', 'updated_at')
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     phone_number = db.Column(db.String(20), nullable=True)
-    user_type = db.Column(db.String(20), nullable=False)  # individual, business, cpa
-    profile = db.Column(db.JSON, nullable=True)
+    user_type = db.Column(db.String(20), nullable=False, index=True)  # individual, business, cpa
+    # Operator of the portal itself, on top of any user_type; set with ``flask grant-admin``
+    is_admin = db.Column(db.Boolean, nullable=False, default=False)
+    profile = db.deferred(db.Column(JSONType, nullable=True))
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -33,85 +60,205 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'email': self.email,
-            'phone_number': self.phone_number,
-            'user_type': self.user_type,
-            'profile': self.profile,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    def to_dict(self, fields=None):
+        return _to_dict(self, fields or self.FIELDS)
+
+class CPAClient(db.Model):
+    """A client in a CPA's book. CPAs list, search and open the records of these clients only."""
+    __tablename__ = 'cpa_clients'
+    __table_args__ = (
+        db.Index('ix_cpa_clients_client_id', 'client_id'),
+    )
+
+    cpa_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Blob(db.Model):
+    """A stored file, shared by every document and receipt with the same content."""
+    __tablename__ = 'blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    tier = db.Column(db.String(10), nullable=False, default='hot')  # hot, cold (compressed, see storage_tiering.py)
+    codec = db.Column(db.String(10), nullable=True)  # compression of a cold blob
+    stored_size = db.Column(db.BigInteger, nullable=True)  # bytes on disk of a cold blob
+    tiered_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class TaxDocument(db.Model):
     __tablename__ = 'tax_documents'
+    __table_args__ = (
+        db.Index('ix_tax_documents_user_id_uploaded_at', 'user_id', 'uploaded_at'),
+    )
+    FIELDS = ('id', 'user_id', 'document_type', 'file_path', 'filename', 'content_hash', 'extracted_data',
+              'ocr_status', 'extractor_version', 'uploaded_at')
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     document_type = db.Column(db.String(50), nullable=False)
     file_path = db.Column(db.String(255), nullable=False)
-    extracted_data = db.Column(db.JSON, nullable=True)
+    filename = db.Column(db.String(255), nullable=True)  # name as uploaded; the file itself is stored by content
+    content_hash = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=True, index=True)
+    extracted_data = db.deferred(db.Column(JSONType, nullable=True))
+    ocr_status = db.Column(db.String(20), nullable=False, default='pending')  # pending, completed, failed
+    extractor_version = db.Column(db.String(20), nullable=True)  # field_extraction.EXTRACTOR_VERSION that produced extracted_data
     uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    ocr_jobs = db.relationship('OCRJob', backref='document', lazy=True, cascade='all, delete-orphan')
+    document_text = db.relationship('DocumentText', backref='document', uselist=False, lazy=True,
+                                    cascade='all, delete-orphan')
+
+    def to_dict(self, include_text=False, fields=None):
+        fields = fields or self.FIELDS + (('raw_text',) if include_text else ())
+        data = _to_dict(self, [name for name in fields if name != 'raw_text'])
+        if include_text and 'raw_text' in fields:
+            data['raw_text'] = self.document_text.raw_text if self.document_text else None
+        return data
+
+class DocumentText(db.Model):
+    """OCR text of a document, kept apart from the fields extracted from it.
+
+    OCR is the expensive step; storing its output lets field extraction be
+    rerun (see ``flask reextract``) without touching the original files.
+    """
+    __tablename__ = 'document_texts'
+
+    document_id = db.Column(db.Integer, db.ForeignKey('tax_documents.id'), primary_key=True)
+    raw_text = db.Column(db.Text, nullable=False, default='')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OCRJob(db.Model):
+    __tablename__ = 'ocr_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('tax_documents.id'), nullable=False, index=True)
+    file_path = db.Column(db.String(512), nullable=False)
+    document_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, running, completed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # a retried job waits until then
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # refreshed while running; see OCRJobQueue.sweep
+
     def to_dict(self):
         return {
             'id': self.id,
-            'user_id': self.user_id,
-            'document_type': self.document_type,
-            'file_path': self.file_path,
-            'extracted_data': self.extracted_data,
-            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
+            'document_id': self.document_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None
+        }
+
+class UploadSession(db.Model):
+    """A chunked upload in progress; the file grows at file_path until finalized."""
+    __tablename__ = 'upload_sessions'
+    __table_args__ = (
+        db.Index('ix_upload_sessions_status_updated_at', 'status', 'updated_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # document, receipt
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(512), nullable=False)
+    options = db.Column(JSONType, nullable=True)  # document_type, or receipt category/amount/date
+    total_size = db.Column(db.BigInteger, nullable=True)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    sha256 = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, completed, aborted
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'offset': self.received,
+            'sha256': self.sha256,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class Receipt(db.Model):
     __tablename__ = 'receipts'
+    __table_args__ = (
+        db.Index('ix_receipts_user_id_date', 'user_id', 'date'),
+    )
+    FIELDS = ('id', 'user_id', 'file_path', 'filename', 'content_hash', 'category', 'amount', 'date', 'uploaded_at')
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     file_path = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=True)  # name as uploaded; the file itself is stored by content
+    content_hash = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=True, index=True)
     category = db.Column(db.String(100), nullable=True)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     date = db.Column(db.Date, nullable=False)
     uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'file_path': self.file_path,
-            'category': self.category,
-            'amount': float(self.amount),
-            'date': self.date.isoformat() if self.date else None,
-            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
-        }
+    def to_dict(self, fields=None):
+        return _to_dict(self, fields or self.FIELDS)
+
+class ReceiptSummary(db.Model):
+    """Count and total of a user's receipts per month and category.
+
+    Kept in step with ``receipts`` in the flush that writes them (see
+    services/receipt_summaries.py); ``flask rebuild-receipt-summaries``
+    recomputes it from scratch.
+    """
+    __tablename__ = 'receipt_summaries'
+    FIELDS = ('year', 'month', 'category', 'receipt_count', 'total_amount', 'updated_at')
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)  # receipts without one count as 'uncategorized'
+    receipt_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self, fields=None):
+        return _to_dict(self, fields or self.FIELDS)
 
 class TaxReturn(db.Model):
     __tablename__ = 'tax_returns'
+    __table_args__ = (
+        db.Index('ix_tax_returns_user_id_year', 'user_id', 'year'),
+    )
+    FIELDS = ('id', 'user_id', 'cpa_id', 'year', 'status', 'return_data', 'created_at', 'updated_at')
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    cpa_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    cpa_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
     year = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(20), nullable=False)  # draft, in_review, filed
-    return_data = db.Column(db.JSON, nullable=True)
+    return_data = db.deferred(db.Column(JSONType, nullable=True))
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'cpa_id': self.cpa_id,
-            'year': self.year,
-            'status': self.status,
-            'return_data': self.return_data,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    def to_dict(self, fields=None):
+        return _to_dict(self, fields or self.FIELDS)
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        db.Index('ix_subscriptions_user_id_status', 'user_id', 'status'),
+        db.Index('ix_subscriptions_user_id_start_date', 'user_id', 'start_date'),
+    )
+    FIELDS = ('id', 'user_id', 'plan_type', 'start_date', 'end_date', 'status')
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -120,18 +267,15 @@ class Subscription(db.Model):
     end_date = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), nullable=False)  # active, canceled
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'plan_type': self.plan_type,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
-            'status': self.status
-        }
+    def to_dict(self, fields=None):
+        return _to_dict(self, fields or self.FIELDS)
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_user_id_created_at', 'user_id', 'created_at'),
+    )
+    FIELDS = ('id', 'user_id', 'amount', 'currency', 'payment_method', 'transaction_id', 'status', 'created_at')
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -142,14 +286,5 @@ class Payment(db.Model):
     status = db.Column(db.String(20), nullable=False)  # succeeded, failed
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'amount': float(self.amount),
-            'currency': self.currency,
-            'payment_method': self.payment_method,
-            'transaction_id': self.transaction_id,
-            'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    def to_dict(self, fields=None):
+        return _to_dict(self, fields or self.FIELDS)
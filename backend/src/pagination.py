@@ -0,0 +1,185 @@
+"""Keyset pagination, query-string filters and field projection for API routes.
+
+A list route returns at most ``limit`` rows ordered by an indexed key that
+ends in the primary key, e.g. (uploaded_at, id) newest first. The next page
+starts after the last row's key instead of at an OFFSET, so every page
+costs one index range read however much history a user has, and rows
+added meanwhile never shift a page. The body stays a JSON array; when more
+rows follow, the ``X-Next-Cursor`` header carries the cursor to pass back
+as ``?cursor=`` and ``Link`` has the full URL with rel="next".
+
+``?fields=id,document_type,uploaded_at`` on list and detail routes limits
+each object to those keys, and the SELECT to those columns. Large JSON
+columns are deferred on the models: list routes leave them out unless
+``?fields=`` names them (``list_fields``), detail routes return them.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from flask import jsonify, request
+from sqlalchemy import and_, inspect, or_
+from sqlalchemy.orm import load_only, undefer
+
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '200'))
+
+class ListArgsError(ValueError):
+    """A malformed limit, cursor, filter or fields argument; answered with a 400."""
+
+def encode_cursor(values: List) -> str:
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _parse_value(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(value)
+        return value
+    return str(value)
+
+def decode_cursor(cursor: str, columns: List) -> List:
+    """Key values stored in a cursor, typed like the columns they sort on."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_parse_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise ListArgsError('Invalid cursor')
+
+def _after(columns: List, values: List, descending: bool):
+    """Rows strictly past ``values`` in (columns...) order.
+
+    Written as ``a <= x AND (a < x OR <rest past>)`` rather than a plain
+    OR, so the leading column still bounds an index range.
+    """
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    not_before = column <= value if descending else column >= value
+    return and_(not_before, or_(beyond, _after(columns[1:], values[1:], descending)))
+
+def keyset_query(query, columns: List, descending: bool = True, after: Optional[List] = None):
+    """Order a query by ``columns`` (ending in the primary key), starting past ``after``."""
+    if after is not None:
+        query = query.filter(_after(columns, after, descending))
+    return query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+def page_size() -> int:
+    value = request.args.get('limit')
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ListArgsError('limit must be a number')
+    if limit < 1:
+        raise ListArgsError('limit must be at least 1')
+    return min(limit, MAX_PAGE_SIZE)
+
+def paginate(query, columns: List, descending: bool = True) -> Tuple[List, Optional[str]]:
+    """One page of a query for the request's ``limit`` and ``cursor``, and the next page's cursor."""
+    limit = page_size()
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor, columns) if cursor else None
+    # One row more than the page tells whether another page follows
+    rows = keyset_query(query, columns, descending, after).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+def _parse_date(name: str, value: str) -> date:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ListArgsError(f'{name} must be a date (YYYY-MM-DD)')
+
+def filter_query(query, filters: Dict, date_column=None):
+    """Apply the request's filter arguments to a query.
+
+    ``filters`` maps argument names to columns; a comma separated value
+    matches any of its items (``?status=draft,in_review``). ``date_from``
+    and ``date_to`` bound ``date_column``, both days inclusive.
+    """
+    for name, column in filters.items():
+        value = request.args.get(name)
+        if not value:
+            continue
+        values = value.split(',')
+        if column.type.python_type is int:
+            try:
+                values = [int(item) for item in values]
+            except ValueError:
+                raise ListArgsError(f'{name} must be a number')
+        query = query.filter(column == values[0] if len(values) == 1 else column.in_(values))
+
+    if date_column is not None:
+        is_datetime = date_column.type.python_type is datetime
+        date_from = request.args.get('date_from')
+        if date_from:
+            start = _parse_date('date_from', date_from)
+            query = query.filter(date_column >= (datetime.combine(start, datetime.min.time()) if is_datetime else start))
+        date_to = request.args.get('date_to')
+        if date_to:
+            end = _parse_date('date_to', date_to)
+            if is_datetime:
+                query = query.filter(date_column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+            else:
+                query = query.filter(date_column <= end)
+    return query
+
+def requested_fields(model, extra: List[str] = ()) -> Optional[List[str]]:
+    """Field names from ?fields=, out of ``model.FIELDS`` and ``extra``; None for every field."""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    known = set(model.FIELDS) | set(extra)
+    unknown = [name for name in fields if name not in known]
+    if unknown:
+        raise ListArgsError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def list_fields(model, extra: List[str] = ()) -> List[str]:
+    """Field names for a list route: those from ?fields=, else every field but the deferred columns."""
+    fields = requested_fields(model, extra)
+    if fields is not None:
+        return fields
+    deferred = {prop.key for prop in inspect(model).column_attrs if prop.deferred}
+    return [name for name in model.FIELDS if name not in deferred]
+
+def project(query, model, fields: Optional[List[str]], keep: List = ()):
+    """Select only the columns behind ``fields``, plus the primary key and ``keep`` (e.g. sort keys).
+
+    With no projection (a detail route without ?fields=) every column is
+    selected, the deferred ones in the same query rather than one lazy load
+    per row.
+    """
+    mapper = inspect(model)
+    if fields is None:
+        return query.options(*[undefer(prop.class_attribute) for prop in mapper.column_attrs if prop.deferred])
+    columns = [mapper.column_attrs[name].class_attribute for name in fields if name in mapper.column_attrs]
+    primary_key = [mapper.get_property_by_column(column).class_attribute for column in mapper.primary_key]
+    return query.options(load_only(*primary_key, *columns, *keep))
+
+def page_response(items: List, next_cursor: Optional[str]):
+    """JSON array response for one page, with the next page in X-Next-Cursor and Link."""
+    response = jsonify(items)
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response, 200
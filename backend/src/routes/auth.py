@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.identity import current_user, issue_token
 from src.models.user import User, db
+from src.pagination import project, requested_fields
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -36,8 +38,8 @@ def register():
     db.session.add(user)
     db.session.commit()
     
-    # Create access token
-    access_token = create_access_token(identity=str(user.id))
+    # Create access token, with the role and plan claims routes authorize by
+    access_token = issue_token(user)
     
     return jsonify({
         'token': access_token,
@@ -56,7 +58,7 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid credentials'}), 401
     
-    access_token = create_access_token(identity=str(user.id))
+    access_token = issue_token(user)
     
     return jsonify({
         'token': access_token,
@@ -67,18 +69,18 @@ def login():
 @jwt_required()
 def get_current_user():
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    fields = requested_fields(User)
+    user = project(User.query.filter_by(id=user_id), User, fields).first()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(user.to_dict(fields=fields)), 200
 
 @auth_bp.route('/me', methods=['PUT'])
 @jwt_required()
 def update_current_user():
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
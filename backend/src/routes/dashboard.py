@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify, make_response, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.identity import current_role
+from src.services.dashboard import build_dashboard, dashboard_etag, dashboard_sections, section_totals
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+@dashboard_bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+def get_dashboard():
+    """Counts, totals and recent items for the dashboard in one response.
+
+    ``?sections=documents,receipts`` returns only those sections, e.g. to
+    refresh one list after an upload. Answers 304 to If-None-Match while
+    nothing in the requested sections has changed.
+    """
+    user_id = int(get_jwt_identity())
+    available = dashboard_sections(current_role())
+    
+    sections = available
+    if request.args.get('sections'):
+        sections = [name.strip() for name in request.args['sections'].split(',') if name.strip()]
+        unknown = [name for name in sections if name not in available]
+        if unknown:
+            return jsonify({'error': f"Unknown sections: {', '.join(unknown)}"}), 400
+    
+    totals = section_totals(user_id, sections)
+    etag = dashboard_etag(user_id, sections, totals)
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = jsonify(build_dashboard(user_id, sections, totals))
+    
+    response.set_etag(etag)
+    # Cached per user, and always revalidated
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -1,23 +1,51 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import TaxDocument, Receipt, User, db
+from src.identity import admin_required, current_role, current_user_id, role_required
+from src.models.user import TaxDocument, Receipt, db
+from src.pagination import filter_query, list_fields, page_response, page_size, paginate, project, requested_fields
+from src.services.cpa_clients import is_client, search_terms
+from src.services.document_search import search_documents
+from src.services.document_store import document_store, send_stored_file
+from src.services.ocr_queue import ocr_queue
+from src.services.preview_service import DEFAULT_PREVIEW_SIZE, PREVIEW_SIZES, preview_service, send_preview
+from src.services.receipt_summaries import spending_summary, summary_period
+from src.services.storage_tiering import storage_stats
 import os
+from datetime import date, datetime
 from werkzeug.utils import secure_filename
 
 documents_bp = Blueprint('documents', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'txt'}
 
+# Upper bound on files accepted by one batch upload request
+MAX_BATCH_FILES = int(os.getenv('MAX_BATCH_FILES', '50'))
+
+# List order (newest first) and ?filters of the document and receipt lists; see src/pagination.py
+DOCUMENT_ORDER = [TaxDocument.uploaded_at, TaxDocument.id]
+DOCUMENT_FILTERS = {'document_type': TaxDocument.document_type, 'status': TaxDocument.ocr_status}
+RECEIPT_ORDER = [Receipt.date, Receipt.id]
+RECEIPT_FILTERS = {'category': Receipt.category}
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def can_access(user_id, owner_id):
+    """Users can read their own files; CPAs can read their clients'."""
+    if user_id == owner_id:
+        return True
+    return current_role() == 'cpa' and is_client(user_id, owner_id)
+
 @documents_bp.route('/documents', methods=['GET'])
 @jwt_required()
 def get_documents():
+    """List the user's documents, newest first; ?limit, ?cursor, ?fields, ?document_type, ?status, ?date_from, ?date_to."""
     user_id = int(get_jwt_identity())
-    documents = TaxDocument.query.filter_by(user_id=user_id).all()
-    return jsonify([doc.to_dict() for doc in documents]), 200
+    fields = list_fields(TaxDocument)
+    query = filter_query(TaxDocument.query.filter_by(user_id=user_id), DOCUMENT_FILTERS, TaxDocument.uploaded_at)
+    documents, next_cursor = paginate(project(query, TaxDocument, fields, DOCUMENT_ORDER), DOCUMENT_ORDER)
+    return page_response([doc.to_dict(fields=fields) for doc in documents], next_cursor)
 
 @documents_bp.route('/documents', methods=['POST'])
 @jwt_required()
@@ -34,41 +62,166 @@ def upload_document():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
+        # Store the file by content; identical uploads share one copy
+        content_hash, size = document_store.save(file.stream)
+        file_path = document_store.path(content_hash)
         
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
-        
-        # Create document record
+        # Create document record; OCR data is filled in by the background job
         document = TaxDocument(
             user_id=user_id,
             file_path=file_path,
+            filename=filename,
+            content_hash=content_hash,
             document_type=request.form.get('document_type', 'other'),
-            extracted_data={}  # OCR data will be added later
+            extracted_data={}
         )
         
         db.session.add(document)
+        job = ocr_queue.enqueue(document, file_path)
         db.session.commit()
+        ocr_queue.submit(job.id)
         
         return jsonify({
             'message': 'Document uploaded successfully',
-            'document': document.to_dict()
-        }), 201
+            'document': document.to_dict(),
+            'ocr_job': job.to_dict()
+        }), 202
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+@documents_bp.route('/documents/batch', methods=['POST'])
+@jwt_required()
+def upload_batch():
+    """Upload many documents or receipts in one request and one transaction.
+
+    Files go in the repeated ``files`` field. ``kind`` is 'document' (the
+    default) or 'receipt'. Documents take one ``document_type`` for the
+    whole batch or one per file. Receipts share ``category`` (default
+    'general'), ``amount`` (default 0.00) and ``date`` (YYYY-MM-DD, default
+    today) across all files, the same defaults as POST /receipts and a
+    chunked upload. Rejected files are reported per file without failing
+    the batch.
+    """
+    user_id = int(get_jwt_identity())
+    files = request.files.getlist('files')
+    
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    if len(files) > MAX_BATCH_FILES:
+        return jsonify({'error': f'A batch can hold at most {MAX_BATCH_FILES} files'}), 400
+    
+    kind = request.form.get('kind', 'document')
+    if kind not in ('document', 'receipt'):
+        return jsonify({'error': "kind must be 'document' or 'receipt'"}), 400
+    
+    document_types = request.form.getlist('document_type') or ['other']
+    if len(document_types) not in (1, len(files)):
+        return jsonify({'error': 'Give one document_type, or one per file'}), 400
+    if len(document_types) == 1:
+        document_types = document_types * len(files)
+    
+    try:
+        amount = float(request.form.get('amount', '0.00'))
+        date_str = request.form.get('date')
+        receipt_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today()
+    except ValueError:
+        return jsonify({'error': 'Invalid amount or date format'}), 400
+    
+    results = []
+    accepted = []
+    saved_hashes = []
+    for index, file in enumerate(files):
+        result = {'index': index, 'filename': file.filename}
+        results.append(result)
+        
+        filename = secure_filename(file.filename or '')
+        if not filename or not allowed_file(filename):
+            result.update(status='rejected', error='Invalid file type')
+            continue
+        
+        content_hash, size = document_store.save(file.stream)
+        saved_hashes.append(content_hash)
+        file_path = document_store.path(content_hash)
+        
+        if kind == 'document':
+            record = TaxDocument(
+                user_id=user_id,
+                file_path=file_path,
+                filename=filename,
+                content_hash=content_hash,
+                document_type=document_types[index],
+                extracted_data={}
+            )
+            db.session.add(record)
+            job = ocr_queue.enqueue(record, file_path)
+        else:
+            record = Receipt(
+                user_id=user_id,
+                file_path=file_path,
+                filename=filename,
+                content_hash=content_hash,
+                category=request.form.get('category', 'general'),
+                amount=amount,
+                date=receipt_date
+            )
+            db.session.add(record)
+            job = None
+        accepted.append((result, record, job))
+    
+    if not accepted:
+        return jsonify({'error': 'No valid files provided', 'results': results}), 400
+    
+    # One commit for the whole batch; nothing is kept if it fails
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # Drop blobs this batch added that nothing else references
+        for content_hash in set(saved_hashes):
+            document_store.purge(content_hash)
+        print(f"Error saving batch upload: {e}")
+        return jsonify({'error': 'Failed to save uploads'}), 500
+    
+    # Hand every OCR job to the worker pool at once
+    for result, record, job in accepted:
+        result['status'] = 'accepted'
+        result[kind] = record.to_dict()
+        if job is not None:
+            result['ocr_job'] = job.to_dict()
+            ocr_queue.submit(job.id)
+        else:
+            preview_service.submit(record.content_hash, record.file_path)
+    
+    return jsonify({
+        'message': f'{len(accepted)} of {len(files)} files uploaded successfully',
+        'results': results
+    }), 202 if kind == 'document' else 201
+
+@documents_bp.route('/documents/search', methods=['GET'])
+@jwt_required()
+def search_user_documents():
+    """Search the user's documents by OCR text, extracted fields, type and file name.
+
+    ?q is matched word by word as prefixes; the best ?limit matches come
+    first, each with a highlighted snippet of its text.
+    """
+    user_id = int(get_jwt_identity())
+    if not search_terms(request.args.get('q', '')):
+        return jsonify({'error': 'q is required'}), 400
+    return jsonify(search_documents(request.args['q'], page_size(), owner_id=user_id)), 200
+
 @documents_bp.route('/documents/<int:document_id>', methods=['GET'])
 @jwt_required()
 def get_document(document_id):
+    """Get one document with its OCR text; ?fields limits the keys (raw_text included)."""
     user_id = int(get_jwt_identity())
-    document = TaxDocument.query.filter_by(id=document_id, user_id=user_id).first()
+    fields = requested_fields(TaxDocument, extra=['raw_text'])
+    document = project(TaxDocument.query.filter_by(id=document_id, user_id=user_id), TaxDocument, fields).first()
     
     if not document:
         return jsonify({'error': 'Document not found'}), 404
     
-    return jsonify(document.to_dict()), 200
+    return jsonify(document.to_dict(include_text=True, fields=fields)), 200
 
 @documents_bp.route('/documents/<int:document_id>', methods=['DELETE'])
 @jwt_required()
@@ -79,21 +232,183 @@ def delete_document(document_id):
     if not document:
         return jsonify({'error': 'Document not found'}), 404
     
-    # Delete file from filesystem
-    if os.path.exists(document.file_path):
+    content_hash = document.content_hash
+    if content_hash:
+        document_store.release(content_hash)
+    elif os.path.exists(document.file_path):
+        # Uploaded before the content store; the file is this document's alone
         os.remove(document.file_path)
     
     db.session.delete(document)
     db.session.commit()
     
+    # Delete the stored file, and its previews, once no other document or receipt shares it
+    if document_store.purge(content_hash):
+        preview_service.discard(content_hash)
+    
     return jsonify({'message': 'Document deleted successfully'}), 200
 
+@documents_bp.route('/documents/<int:document_id>/file', methods=['GET'])
+@jwt_required()
+def download_document(document_id):
+    """Stream a document's file, with Range and conditional GET support."""
+    user_id = int(get_jwt_identity())
+    document = TaxDocument.query.get(document_id)
+    
+    if not document or not can_access(user_id, document.user_id):
+        return jsonify({'error': 'Document not found'}), 404
+    
+    return send_stored_file(document.file_path, document.filename, document.content_hash)
+
+@documents_bp.route('/receipts/<int:receipt_id>/file', methods=['GET'])
+@jwt_required()
+def download_receipt(receipt_id):
+    """Stream a receipt's file, with Range and conditional GET support."""
+    user_id = int(get_jwt_identity())
+    receipt = Receipt.query.get(receipt_id)
+    
+    if not receipt or not can_access(user_id, receipt.user_id):
+        return jsonify({'error': 'Receipt not found'}), 404
+    
+    return send_stored_file(receipt.file_path, receipt.filename, receipt.content_hash)
+
+@documents_bp.route('/documents/<int:document_id>/preview', methods=['GET'])
+@jwt_required()
+def preview_document(document_id):
+    """First-page JPEG thumbnail of a document; ?size=small (default) or medium."""
+    user_id = int(get_jwt_identity())
+    document = TaxDocument.query.get(document_id)
+    
+    if not document or not can_access(user_id, document.user_id):
+        return jsonify({'error': 'Document not found'}), 404
+    
+    size = request.args.get('size', DEFAULT_PREVIEW_SIZE)
+    if size not in PREVIEW_SIZES:
+        return jsonify({'error': f"size must be one of: {', '.join(PREVIEW_SIZES)}"}), 400
+    
+    response = send_preview(document.file_path, document.content_hash, size)
+    if response is None:
+        return jsonify({'error': 'No preview available for this document'}), 404
+    return response
+
+@documents_bp.route('/receipts/<int:receipt_id>/preview', methods=['GET'])
+@jwt_required()
+def preview_receipt(receipt_id):
+    """First-page JPEG thumbnail of a receipt; ?size=small (default) or medium."""
+    user_id = int(get_jwt_identity())
+    receipt = Receipt.query.get(receipt_id)
+    
+    if not receipt or not can_access(user_id, receipt.user_id):
+        return jsonify({'error': 'Receipt not found'}), 404
+    
+    size = request.args.get('size', DEFAULT_PREVIEW_SIZE)
+    if size not in PREVIEW_SIZES:
+        return jsonify({'error': f"size must be one of: {', '.join(PREVIEW_SIZES)}"}), 400
+    
+    response = send_preview(receipt.file_path, receipt.content_hash, size)
+    if response is None:
+        return jsonify({'error': 'No preview available for this receipt'}), 404
+    return response
+
+@documents_bp.route('/cpa/documents/search', methods=['GET'])
+@role_required('cpa')
+def search_client_documents():
+    """Search the documents of the CPA's clients, or of one with ?client_id; same arguments as GET /documents/search."""
+    cpa_id = current_user_id()
+    if not search_terms(request.args.get('q', '')):
+        return jsonify({'error': 'q is required'}), 400
+    
+    client_id = request.args.get('client_id', type=int)
+    if client_id is not None:
+        if not is_client(cpa_id, client_id):
+            return jsonify({'error': 'Client not found'}), 404
+        results = search_documents(request.args['q'], page_size(), owner_id=client_id)
+    else:
+        results = search_documents(request.args['q'], page_size(), cpa_id=cpa_id)
+    return jsonify(results), 200
+
+@documents_bp.route('/storage/stats', methods=['GET'])
+@admin_required()
+def get_storage_stats():
+    """Get stored bytes per tier, bytes saved by cold storage and cold read latency for this process. Admins only."""
+    return jsonify(storage_stats()), 200
+
 @documents_bp.route('/receipts', methods=['GET'])
 @jwt_required()
 def get_receipts():
+    """List the user's receipts by receipt date, newest first; ?limit, ?cursor, ?fields, ?category, ?date_from, ?date_to."""
     user_id = int(get_jwt_identity())
-    receipts = Receipt.query.filter_by(user_id=user_id).all()
-    return jsonify([receipt.to_dict() for receipt in receipts]), 200
+    fields = list_fields(Receipt)
+    query = filter_query(Receipt.query.filter_by(user_id=user_id), RECEIPT_FILTERS, Receipt.date)
+    receipts, next_cursor = paginate(project(query, Receipt, fields, RECEIPT_ORDER), RECEIPT_ORDER)
+    return page_response([receipt.to_dict(fields=fields) for receipt in receipts], next_cursor)
+
+@documents_bp.route('/cpa/clients/<int:client_id>/documents', methods=['GET'])
+@role_required('cpa')
+def get_client_documents(client_id):
+    """List a client's documents, newest first; same arguments as GET /documents."""
+    if not is_client(current_user_id(), client_id):
+        return jsonify({'error': 'Client not found'}), 404
+    
+    fields = list_fields(TaxDocument)
+    query = filter_query(TaxDocument.query.filter_by(user_id=client_id), DOCUMENT_FILTERS, TaxDocument.uploaded_at)
+    documents, next_cursor = paginate(project(query, TaxDocument, fields, DOCUMENT_ORDER), DOCUMENT_ORDER)
+    return page_response([doc.to_dict(fields=fields) for doc in documents], next_cursor)
+
+@documents_bp.route('/cpa/clients/<int:client_id>/receipts', methods=['GET'])
+@role_required('cpa')
+def get_client_receipts(client_id):
+    """List a client's receipts, newest first; same arguments as GET /receipts."""
+    if not is_client(current_user_id(), client_id):
+        return jsonify({'error': 'Client not found'}), 404
+    
+    fields = list_fields(Receipt)
+    query = filter_query(Receipt.query.filter_by(user_id=client_id), RECEIPT_FILTERS, Receipt.date)
+    receipts, next_cursor = paginate(project(query, Receipt, fields, RECEIPT_ORDER), RECEIPT_ORDER)
+    return page_response([receipt.to_dict(fields=fields) for receipt in receipts], next_cursor)
+
+@documents_bp.route('/receipts/summary', methods=['GET'])
+@jwt_required()
+def get_receipt_summary():
+    """Receipt count and amount by category and by month; ?year (default this year), ?through_month (default to date)."""
+    user_id = int(get_jwt_identity())
+    year, through_month = summary_period(request.args.get('year'), request.args.get('through_month'))
+    return jsonify(spending_summary(user_id, year, through_month)), 200
+
+@documents_bp.route('/cpa/clients/<int:client_id>/receipts/summary', methods=['GET'])
+@role_required('cpa')
+def get_client_receipt_summary(client_id):
+    """A client's receipt totals; same arguments as GET /receipts/summary."""
+    if not is_client(current_user_id(), client_id):
+        return jsonify({'error': 'Client not found'}), 404
+    
+    year, through_month = summary_period(request.args.get('year'), request.args.get('through_month'))
+    return jsonify(spending_summary(client_id, year, through_month)), 200
+
+@documents_bp.route('/receipts/<int:receipt_id>', methods=['DELETE'])
+@jwt_required()
+def delete_receipt(receipt_id):
+    user_id = int(get_jwt_identity())
+    receipt = Receipt.query.filter_by(id=receipt_id, user_id=user_id).first()
+    
+    if not receipt:
+        return jsonify({'error': 'Receipt not found'}), 404
+    
+    content_hash = receipt.content_hash
+    if content_hash:
+        document_store.release(content_hash)
+    elif os.path.exists(receipt.file_path):
+        # Uploaded before the content store; the file is this receipt's alone
+        os.remove(receipt.file_path)
+    
+    # The flush also takes the receipt out of its receipt_summaries row
+    db.session.delete(receipt)
+    db.session.commit()
+    
+    if document_store.purge(content_hash):
+        preview_service.discard(content_hash)
+    
+    return jsonify({'message': 'Receipt deleted successfully'}), 200
 
 @documents_bp.route('/receipts', methods=['POST'])
 @jwt_required()
@@ -110,18 +425,15 @@ def upload_receipt():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
+        # Store the file by content; identical uploads share one copy
+        content_hash, size = document_store.save(file.stream)
         
         # Create receipt record
-        from datetime import date
         receipt = Receipt(
             user_id=user_id,
-            file_path=file_path,
+            file_path=document_store.path(content_hash),
+            filename=filename,
+            content_hash=content_hash,
             category=request.form.get('category', 'general'),
             amount=float(request.form.get('amount', '0.00')),
             date=date.today()
@@ -129,6 +441,7 @@ def upload_receipt():
         
         db.session.add(receipt)
         db.session.commit()
+        preview_service.submit(receipt.content_hash, receipt.file_path)
         
         return jsonify({
             'message': 'Receipt uploaded successfully',
@@ -0,0 +1,53 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.identity import admin_required
+from src.models.user import OCRJob, TaxDocument
+from src.services.ocr_cache import ocr_cache
+from src.services.ocr_engine import engine_pool
+
+ocr_bp = Blueprint('ocr', __name__)
+
+@ocr_bp.route('/ocr/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_ocr_job(job_id):
+    """Get the status of an OCR job for one of the user's documents."""
+    user_id = int(get_jwt_identity())
+    job = OCRJob.query.join(TaxDocument).filter(
+        OCRJob.id == job_id,
+        TaxDocument.user_id == user_id
+    ).first()
+
+    if not job:
+        return jsonify({'error': 'OCR job not found'}), 404
+
+    return jsonify(job.to_dict()), 200
+
+@ocr_bp.route('/documents/<int:document_id>/ocr', methods=['GET'])
+@jwt_required()
+def get_document_ocr_jobs(document_id):
+    """Get the OCR jobs run for one of the user's documents, newest first."""
+    user_id = int(get_jwt_identity())
+    document = TaxDocument.query.filter_by(id=document_id, user_id=user_id).first()
+
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+
+    jobs = OCRJob.query.filter_by(document_id=document_id).order_by(OCRJob.id.desc()).all()
+    return jsonify({
+        'document_id': document_id,
+        'ocr_status': document.ocr_status,
+        'jobs': [job.to_dict() for job in jobs]
+    }), 200
+
+@ocr_bp.route('/ocr/cache/stats', methods=['GET'])
+@admin_required()
+def get_ocr_cache_stats():
+    """Get OCR result cache hit/miss counters and tier sizes for this process. Admins only."""
+    return jsonify(ocr_cache.stats()), 200
+
+@ocr_bp.route('/ocr/engine/health', methods=['GET'])
+@admin_required()
+def get_ocr_engine_health():
+    """Get how many OCR engine workers are alive and busy; 503 if any have died. Admins only."""
+    health = engine_pool.health()
+    return jsonify(health), 200 if health['healthy'] else 503
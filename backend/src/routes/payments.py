@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.identity import refresh_token
 from src.services.payment_service import PaymentService
 from src.models.user import User, Payment, Subscription
+from src.pagination import filter_query, list_fields, page_response, paginate, project
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -113,7 +115,8 @@ def create_subscription():
     )
     
     if result['success']:
-        return jsonify(result['subscription']), 201
+        # The plan claim changed; the frontend swaps in the new token
+        return refresh_token(jsonify(result['subscription'])), 201
     else:
         return jsonify({'error': result['error']}), 400
 
@@ -143,30 +146,40 @@ def cancel_subscription():
     result = payment_service.cancel_subscription(user_id)
     
     if result['success']:
-        return jsonify({'message': result['message']}), 200
+        return refresh_token(jsonify({'message': result['message']})), 200
     else:
         return jsonify({'error': result['error']}), 400
 
 @payments_bp.route('/payments/history', methods=['GET'])
 @jwt_required()
 def get_payment_history():
-    """Get user's payment history."""
+    """Get user's payment history, newest first; ?limit, ?cursor, ?fields, ?status, ?date_from, ?date_to."""
     user_id = int(get_jwt_identity())
+    fields = list_fields(Payment)
     
-    payments = Payment.query.filter_by(user_id=user_id).order_by(
-        Payment.created_at.desc()
-    ).all()
+    query = filter_query(
+        Payment.query.filter_by(user_id=user_id),
+        {'status': Payment.status},
+        Payment.created_at
+    )
+    order = [Payment.created_at, Payment.id]
+    payments, next_cursor = paginate(project(query, Payment, fields, order), order)
     
-    return jsonify([payment.to_dict() for payment in payments]), 200
+    return page_response([payment.to_dict(fields=fields) for payment in payments], next_cursor)
 
 @payments_bp.route('/subscription/history', methods=['GET'])
 @jwt_required()
 def get_subscription_history():
-    """Get user's subscription history."""
+    """Get user's subscription history, newest first; ?limit, ?cursor, ?fields, ?status, ?date_from, ?date_to."""
     user_id = int(get_jwt_identity())
+    fields = list_fields(Subscription)
     
-    subscriptions = Subscription.query.filter_by(user_id=user_id).order_by(
-        Subscription.start_date.desc()
-    ).all()
+    query = filter_query(
+        Subscription.query.filter_by(user_id=user_id),
+        {'status': Subscription.status, 'plan_type': Subscription.plan_type},
+        Subscription.start_date
+    )
+    order = [Subscription.start_date, Subscription.id]
+    subscriptions, next_cursor = paginate(project(query, Subscription, fields, order), order)
     
-    return jsonify([sub.to_dict() for sub in subscriptions]), 200
+    return page_response([sub.to_dict(fields=fields) for sub in subscriptions], next_cursor)
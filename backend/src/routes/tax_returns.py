@@ -1,9 +1,19 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import TaxReturn, User, db
+from src.identity import current_user_id, role_required
+from src.models.user import CLIENT_TYPES, CPAClient, TaxReturn, User, db
+from src.pagination import filter_query, list_fields, page_response, paginate, project, requested_fields
+from src.services.cpa_clients import add_client, is_client, remove_client, roster_query
 
 tax_returns_bp = Blueprint('tax_returns', __name__)
 
+# List order (latest year first) and ?filters of the return lists; see src/pagination.py
+RETURN_ORDER = [TaxReturn.year, TaxReturn.id]
+RETURN_FILTERS = {'year': TaxReturn.year, 'status': TaxReturn.status}
+# A CPA's roster in primary key order (cpa_id, client_id), so a page is one index range
+CLIENT_ORDER = [CPAClient.client_id]
+CLIENT_COUNTS = ('document_count', 'receipt_count', 'return_count', 'open_return_count')
+
 @tax_returns_bp.route('/returns', methods=['POST'])
 @jwt_required()
 def create_tax_return():
@@ -33,20 +43,25 @@ def create_tax_return():
 @tax_returns_bp.route('/returns', methods=['GET'])
 @jwt_required()
 def get_tax_returns():
+    """List the user's tax returns, latest year first; ?limit, ?cursor, ?fields, ?year, ?status."""
     user_id = int(get_jwt_identity())
-    tax_returns = TaxReturn.query.filter_by(user_id=user_id).all()
-    return jsonify([tr.to_dict() for tr in tax_returns]), 200
+    fields = list_fields(TaxReturn)
+    query = filter_query(TaxReturn.query.filter_by(user_id=user_id), RETURN_FILTERS)
+    tax_returns, next_cursor = paginate(project(query, TaxReturn, fields, RETURN_ORDER), RETURN_ORDER)
+    return page_response([tr.to_dict(fields=fields) for tr in tax_returns], next_cursor)
 
 @tax_returns_bp.route('/returns/<int:return_id>', methods=['GET'])
 @jwt_required()
 def get_tax_return(return_id):
+    """Get one tax return; ?fields limits the keys."""
     user_id = int(get_jwt_identity())
-    tax_return = TaxReturn.query.filter_by(id=return_id, user_id=user_id).first()
+    fields = requested_fields(TaxReturn)
+    tax_return = project(TaxReturn.query.filter_by(id=return_id, user_id=user_id), TaxReturn, fields).first()
     
     if not tax_return:
         return jsonify({'error': 'Tax return not found'}), 404
     
-    return jsonify(tax_return.to_dict()), 200
+    return jsonify(tax_return.to_dict(fields=fields)), 200
 
 @tax_returns_bp.route('/returns/<int:return_id>', methods=['PUT'])
 @jwt_required()
@@ -70,44 +85,70 @@ def update_tax_return(return_id):
 
 # CPA routes for managing client tax returns
 @tax_returns_bp.route('/cpa/clients', methods=['GET'])
-@jwt_required()
+@role_required('cpa')
 def get_cpa_clients():
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    """List the CPA's clients with their document, receipt and return counts.
+
+    ?q searches email, phone and name by word prefix; also ?limit, ?cursor,
+    ?fields and ?user_type.
+    """
+    fields = list_fields(User)
+    query = filter_query(roster_query(current_user_id(), request.args.get('q')), {'user_type': User.user_type})
+    rows, next_cursor = paginate(project(query, User, fields), CLIENT_ORDER, descending=False)
+    clients = []
+    for row in rows:
+        client = row.User.to_dict(fields=fields)
+        client.update({name: getattr(row, name) for name in CLIENT_COUNTS})
+        clients.append(client)
+    return page_response(clients, next_cursor)
+
+@tax_returns_bp.route('/cpa/clients', methods=['POST'])
+@role_required('cpa')
+def add_cpa_client():
+    """Add a client to the CPA's roster by email."""
+    data = request.json or {}
+    
+    if not data.get('email'):
+        return jsonify({'error': 'Email is required'}), 400
+    
+    client = User.query.filter_by(email=data['email']).first()
+    if not client or client.user_type not in CLIENT_TYPES:
+        return jsonify({'error': 'Client not found'}), 404
     
-    # Check if current user is a CPA
-    if not user or user.user_type != 'cpa':
-        return jsonify({'error': 'Access denied'}), 403
+    added = add_client(current_user_id(), client.id)
+    db.session.commit()
     
-    # Get all clients (users who are not CPAs)
-    clients = User.query.filter(User.user_type.in_(['individual', 'business'])).all()
-    return jsonify([client.to_dict() for client in clients]), 200
+    return jsonify(client.to_dict()), 201 if added else 200
 
-@tax_returns_bp.route('/cpa/clients/<int:client_id>/returns', methods=['GET'])
-@jwt_required()
-def get_client_tax_returns(client_id):
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+@tax_returns_bp.route('/cpa/clients/<int:client_id>', methods=['DELETE'])
+@role_required('cpa')
+def remove_cpa_client(client_id):
+    if not remove_client(current_user_id(), client_id):
+        return jsonify({'error': 'Client not found'}), 404
     
-    # Check if current user is a CPA
-    if not user or user.user_type != 'cpa':
-        return jsonify({'error': 'Access denied'}), 403
+    db.session.commit()
     
-    tax_returns = TaxReturn.query.filter_by(user_id=client_id).all()
-    return jsonify([tr.to_dict() for tr in tax_returns]), 200
+    return jsonify({'message': 'Client removed successfully'}), 200
+
+@tax_returns_bp.route('/cpa/clients/<int:client_id>/returns', methods=['GET'])
+@role_required('cpa')
+def get_client_tax_returns(client_id):
+    """List a client's tax returns, latest year first; ?limit, ?cursor, ?fields, ?year, ?status."""
+    if not is_client(current_user_id(), client_id):
+        return jsonify({'error': 'Client not found'}), 404
+    
+    fields = list_fields(TaxReturn)
+    query = filter_query(TaxReturn.query.filter_by(user_id=client_id), RETURN_FILTERS)
+    tax_returns, next_cursor = paginate(project(query, TaxReturn, fields, RETURN_ORDER), RETURN_ORDER)
+    return page_response([tr.to_dict(fields=fields) for tr in tax_returns], next_cursor)
 
 @tax_returns_bp.route('/cpa/returns/<int:return_id>/assign', methods=['PUT'])
-@jwt_required()
+@role_required('cpa')
 def assign_cpa_to_return(return_id):
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
-    # Check if current user is a CPA
-    if not user or user.user_type != 'cpa':
-        return jsonify({'error': 'Access denied'}), 403
     
     tax_return = TaxReturn.query.get(return_id)
-    if not tax_return:
+    if not tax_return or not is_client(user_id, tax_return.user_id):
         return jsonify({'error': 'Tax return not found'}), 404
     
     tax_return.cpa_id = user_id
@@ -118,14 +159,9 @@ def assign_cpa_to_return(return_id):
     return jsonify(tax_return.to_dict()), 200
 
 @tax_returns_bp.route('/cpa/returns/<int:return_id>/file', methods=['PUT'])
-@jwt_required()
+@role_required('cpa')
 def file_tax_return(return_id):
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
-    # Check if current user is a CPA
-    if not user or user.user_type != 'cpa':
-        return jsonify({'error': 'Access denied'}), 403
     
     tax_return = TaxReturn.query.get(return_id)
     if not tax_return:
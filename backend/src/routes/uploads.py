@@ -0,0 +1,126 @@
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.utils import secure_filename
+from src.identity import current_plan
+from src.models.user import UploadSession
+from src.routes.documents import allowed_file
+from src.services.upload_service import upload_service
+
+uploads_bp = Blueprint('uploads', __name__)
+
+def _user_session(session_id):
+    return UploadSession.query.filter_by(id=session_id, user_id=int(get_jwt_identity())).first()
+
+def _error(result):
+    body = {'error': result['error']}
+    if 'offset' in result:
+        body['offset'] = result['offset']
+    return jsonify(body), result['code']
+
+@uploads_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def initiate_upload():
+    """Start a chunked upload.
+
+    JSON body: ``filename``, ``kind`` ('document' or 'receipt'), optional
+    ``size`` in bytes, and ``document_type`` for documents or
+    ``category``/``amount``/``date`` for receipts.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    
+    kind = data.get('kind', 'document')
+    if kind == 'document':
+        options = {'document_type': data.get('document_type', 'other')}
+    elif kind == 'receipt':
+        try:
+            options = {
+                'category': data.get('category', 'general'),
+                'amount': float(data.get('amount', 0)),
+                'date': data.get('date')
+            }
+            if options['date']:
+                datetime.strptime(options['date'], '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid amount or date format'}), 400
+    else:
+        return jsonify({'error': "kind must be 'document' or 'receipt'"}), 400
+    
+    total_size = data.get('size')
+    if total_size is not None and (not isinstance(total_size, int) or total_size <= 0):
+        return jsonify({'error': 'size must be a positive number of bytes'}), 400
+    
+    plan = current_plan()
+    result = upload_service.initiate(user_id, kind, data.get('filename'), total_size, options, plan)
+    if not result['success']:
+        return _error(result)
+    
+    session = result['session']
+    response = session.to_dict()
+    response['max_size'] = upload_service.size_limit(user_id, plan)
+    return jsonify(response), 201
+
+@uploads_bp.route('/uploads/<session_id>', methods=['GET'])
+@jwt_required()
+def get_upload(session_id):
+    """Get an upload's status, including the offset to resume from."""
+    session = _user_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    return jsonify(session.to_dict()), 200
+
+@uploads_bp.route('/uploads/<session_id>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(session_id):
+    """Append the raw request body at ``offset`` (query string or Upload-Offset header)."""
+    session = _user_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.args.get('offset', request.headers.get('Upload-Offset'))
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'offset is required'}), 400
+    
+    result = upload_service.append_chunk(session, offset, request.stream, request.content_length, current_plan())
+    if not result['success']:
+        return _error(result)
+    
+    return jsonify(result['session'].to_dict()), 200
+
+@uploads_bp.route('/uploads/<session_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(session_id):
+    """Finish an upload, optionally checking the client's ``sha256``, and create its record."""
+    session = _user_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    result = upload_service.finalize(session, data.get('sha256'))
+    if not result['success']:
+        return _error(result)
+    
+    response = {'upload': result['session'].to_dict(), session.kind: result['record'].to_dict()}
+    if result['job'] is not None:
+        response['ocr_job'] = result['job'].to_dict()
+        return jsonify(response), 202
+    return jsonify(response), 201
+
+@uploads_bp.route('/uploads/<session_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(session_id):
+    """Cancel an unfinished upload and delete what was received."""
+    session = _user_session(session_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    upload_service.abort(session)
+    return jsonify(session.to_dict()), 200
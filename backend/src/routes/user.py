@@ -1,12 +1,15 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.pagination import filter_query, list_fields, page_response, paginate, project, requested_fields
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    fields = list_fields(User)
+    query = filter_query(User.query, {'user_type': User.user_type})
+    users, next_cursor = paginate(project(query, User, fields), [User.id], descending=False)
+    return page_response([user.to_dict(fields=fields) for user in users], next_cursor)
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -19,8 +22,9 @@ def create_user():
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    fields = requested_fields(User)
+    user = project(User.query.filter_by(id=user_id), User, fields).first_or_404()
+    return jsonify(user.to_dict(fields=fields))
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
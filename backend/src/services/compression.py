@@ -0,0 +1,62 @@
+import lzma
+import os
+import shutil
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # optional: without it cold files are xz, about as small but slower to read back
+    zstandard = None
+
+# 'auto' uses zstd when the zstandard package is installed, else xz
+COLD_STORAGE_CODEC = os.getenv('COLD_STORAGE_CODEC', 'auto')
+ZSTD_LEVEL = int(os.getenv('COLD_STORAGE_ZSTD_LEVEL', '19'))
+XZ_PRESET = int(os.getenv('COLD_STORAGE_XZ_PRESET', '6'))
+
+# 'none' stores a file as is, for content that does not compress
+CODEC_EXTENSIONS = {
+    'zstd': '.zst',
+    'xz': '.xz',
+    'none': ''
+}
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def default_codec(kind: Optional[str] = None) -> str:
+    """Codec to compress with for ``kind`` ('auto', 'zstd', 'xz' or 'none')."""
+    kind = kind or COLD_STORAGE_CODEC
+    if kind == 'zstd' or (kind == 'auto' and zstandard is not None):
+        if zstandard is None:
+            raise RuntimeError('COLD_STORAGE_CODEC=zstd but the zstandard package is not installed')
+        return 'zstd'
+    if kind == 'auto':
+        return 'xz'
+    if kind not in CODEC_EXTENSIONS:
+        raise ValueError(f'Unknown codec: {kind}')
+    return kind
+
+def compress_file(source: str, destination: str, codec: str):
+    """Stream ``source`` into ``destination`` compressed with ``codec``."""
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        if codec == 'zstd':
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(
+                src, dst, size=os.fstat(src.fileno()).st_size, read_size=COPY_BUFFER_SIZE
+            )
+        elif codec == 'xz':
+            with lzma.open(dst, 'wb', preset=XZ_PRESET) as compressed:
+                shutil.copyfileobj(src, compressed, COPY_BUFFER_SIZE)
+        else:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+def decompress_file(source: str, destination: str, codec: str):
+    """Stream ``source``, compressed with ``codec``, into ``destination``."""
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError('Reading a zstd file needs the zstandard package')
+            zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=COPY_BUFFER_SIZE)
+        elif codec == 'xz':
+            with lzma.open(src, 'rb') as compressed:
+                shutil.copyfileobj(compressed, dst, COPY_BUFFER_SIZE)
+        else:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
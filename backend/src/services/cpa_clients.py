@@ -0,0 +1,84 @@
+"""CPA client rosters and search within them.
+
+A CPA works with the clients in ``cpa_clients``, added by email: only
+they are listed, searched and opened by that CPA, and only their returns
+can be taken for review. The roster list reads one page of the
+CPA's rows in primary key order and counts each client's documents,
+receipts and returns in the same query, from the per-user indexes.
+
+Search matches email, phone number and first and last name by word
+prefix. On SQLite it reads the FTS5 table ``users_fts``, which triggers
+on ``users`` keep in step (see migration 0005); on Postgres it reads a
+trigram index over the same fields.
+"""
+import re
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import Column, Integer, MetaData, Table, Text, and_, func, literal_column, select
+from src.models.user import CPAClient, Receipt, TaxDocument, TaxReturn, User, db
+
+# Not in db.metadata: created by migration 0005, never by create_all
+users_fts = Table(
+    'users_fts', MetaData(),
+    Column('rowid', Integer, primary_key=True),
+    # FTS5's hidden column named after the table; ``users_fts MATCH ?`` searches every column
+    Column('users_fts', Text)
+)
+
+# The expression the Postgres trigram index is built on; the query must repeat it exactly
+SEARCH_TEXT_SQL = (
+    "lower(coalesce(users.email, '') || ' ' || coalesce(users.phone_number, '') || ' ' || "
+    "coalesce(users.profile ->> 'first_name', '') || ' ' || coalesce(users.profile ->> 'last_name', ''))"
+)
+
+def search_terms(text: str) -> List[str]:
+    """The words of a search, lower-cased; punctuation such as '@' and '-' separates words."""
+    return re.findall(r'\w+', text.lower())
+
+def search_filter(terms: List[str]):
+    """Users matching every term as a word prefix (SQLite) or substring (Postgres)."""
+    if db.engine.dialect.name == 'sqlite':
+        query = ' '.join(f'"{term}"*' for term in terms)
+        return User.id.in_(select(users_fts.c.rowid).where(users_fts.c.users_fts.match(query)))
+    search_text = literal_column(SEARCH_TEXT_SQL)
+    return and_(*[search_text.like(f'%{term}%') for term in terms])
+
+def _count(model, *criteria):
+    return select(func.count()).where(model.user_id == User.id, *criteria).correlate(User).scalar_subquery()
+
+def client_counts():
+    """Per-client counts, as correlated subqueries on the per-user indexes."""
+    return [
+        _count(TaxDocument).label('document_count'),
+        _count(Receipt).label('receipt_count'),
+        _count(TaxReturn).label('return_count'),
+        _count(TaxReturn, TaxReturn.status != 'filed').label('open_return_count')
+    ]
+
+def roster_query(cpa_id: int, search: Optional[str] = None):
+    """Rows of (User, client_id, counts...) for a CPA's clients, optionally only those matching ``search``."""
+    query = db.session.query(User, CPAClient.client_id, *client_counts()) \
+        .join(CPAClient, CPAClient.client_id == User.id) \
+        .filter(CPAClient.cpa_id == cpa_id)
+    terms = search_terms(search or '')
+    if terms:
+        query = query.filter(search_filter(terms))
+    return query
+
+def is_client(cpa_id: int, client_id: int) -> bool:
+    return db.session.get(CPAClient, (cpa_id, client_id)) is not None
+
+def add_client(cpa_id: int, client_id: int) -> bool:
+    """Add a client to a CPA's roster; False if they were already on it. The caller commits."""
+    if is_client(cpa_id, client_id):
+        return False
+    db.session.add(CPAClient(cpa_id=cpa_id, client_id=client_id, created_at=datetime.utcnow()))
+    return True
+
+def remove_client(cpa_id: int, client_id: int) -> bool:
+    """Take a client off a CPA's roster; False if they were not on it. The caller commits."""
+    assignment = db.session.get(CPAClient, (cpa_id, client_id))
+    if assignment is None:
+        return False
+    db.session.delete(assignment)
+    return True
@@ -0,0 +1,134 @@
+"""Everything the dashboard shows, in one request and a handful of queries.
+
+One UNION ALL query reads every count and total the dashboard needs, one
+GROUP BY per section. The same rows, with each group's highest id and
+latest timestamp, fingerprint the data: the ETag is their hash, so a
+dashboard that has not changed costs that single query and a 304. Only on
+a change is each section's short list of recent items read, one indexed
+query per section. Receipt totals come from the monthly rollup in
+receipt_summaries rather than from the receipts.
+"""
+import hashlib
+import os
+from typing import Dict, List, Optional
+from sqlalchemy import DateTime, Integer, Numeric, String, and_, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import load_only
+from src.models.user import CPAClient, Receipt, ReceiptSummary, TaxDocument, TaxReturn, User, db
+
+DASHBOARD_SECTIONS = ('documents', 'receipts', 'returns', 'clients')
+RECENT_ITEMS = int(os.getenv('DASHBOARD_RECENT_ITEMS', '20'))
+
+# Fields of each section's list, as in ?fields= on the list routes
+DOCUMENT_FIELDS = ('id', 'document_type', 'filename', 'ocr_status', 'uploaded_at')
+RECEIPT_FIELDS = ('id', 'filename', 'category', 'amount', 'date')
+RETURN_FIELDS = ('id', 'year', 'status', 'cpa_id', 'created_at', 'updated_at')
+CLIENT_FIELDS = ('id', 'email', 'user_type', 'profile', 'created_at')
+
+def dashboard_sections(role: Optional[str]) -> List[str]:
+    """Sections a user with this role sees; only CPAs have clients (those on their roster)."""
+    return [section for section in DASHBOARD_SECTIONS if section != 'clients' or role == 'cpa']
+
+def _totals_select(section: str, key, user_filter, count=None, amount=None, latest_id=None, updated=None):
+    return select(
+        literal(section).label('section'),
+        cast(key, String).label('key'),
+        (func.sum(count) if count is not None else func.count()).label('count'),
+        (func.sum(amount) if amount is not None else cast(null(), Numeric(12, 2))).label('amount'),
+        (func.max(latest_id) if latest_id is not None else cast(null(), Integer)).label('max_id'),
+        (func.max(updated) if updated is not None else cast(null(), DateTime)).label('updated')
+    ).where(user_filter).group_by(key)
+
+def section_totals(user_id: int, sections: List[str]) -> List[tuple]:
+    """(section, key, count, amount, max_id, updated) per group of each section, in one query."""
+    selects = []
+    if 'documents' in sections:
+        selects.append(_totals_select('documents', TaxDocument.ocr_status, TaxDocument.user_id == user_id,
+                                      latest_id=TaxDocument.id, updated=TaxDocument.uploaded_at))
+    if 'receipts' in sections:
+        # From the monthly rollup, so the cost does not grow with the receipt history
+        selects.append(_totals_select('receipts', ReceiptSummary.category, ReceiptSummary.user_id == user_id,
+                                      count=ReceiptSummary.receipt_count, amount=ReceiptSummary.total_amount,
+                                      updated=ReceiptSummary.updated_at))
+    if 'returns' in sections:
+        selects.append(_totals_select('returns', TaxReturn.status, TaxReturn.user_id == user_id,
+                                      latest_id=TaxReturn.id, updated=TaxReturn.updated_at))
+    if 'clients' in sections:
+        selects.append(_totals_select('clients', User.user_type,
+                                      and_(CPAClient.cpa_id == user_id, CPAClient.client_id == User.id),
+                                      latest_id=User.id, updated=User.updated_at))
+        # Fingerprint only: which users are on the roster, not just how many of each type. Taking
+        # one client off and adding another can leave the counts, ids and times above unchanged;
+        # the sum of client ids and the latest addition cannot both stay the same
+        selects.append(_totals_select('roster', CPAClient.cpa_id, CPAClient.cpa_id == user_id,
+                                      amount=CPAClient.client_id, updated=CPAClient.created_at))
+    if not selects:
+        return []
+    query = union_all(*selects) if len(selects) > 1 else selects[0]
+    return [tuple(row) for row in db.session.execute(query)]
+
+def dashboard_etag(user_id: int, sections: List[str], totals: List[tuple]) -> str:
+    fingerprint = repr((user_id, sorted(sections), sorted(totals, key=lambda row: (row[0], row[1] or ''))))
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+def _summary(totals: List[tuple], section: str, with_amount: bool = False) -> Dict:
+    groups = {}
+    total = 0
+    amount = 0.0
+    for row_section, key, count, row_amount, _, _ in totals:
+        if row_section != section:
+            continue
+        total += count
+        key = key if key is not None else 'uncategorized'
+        if with_amount:
+            amount += float(row_amount or 0)
+            groups[key] = {'count': count, 'amount': round(float(row_amount or 0), 2)}
+        else:
+            groups[key] = count
+    summary = {'total': total, 'by_group': groups}
+    if with_amount:
+        summary['amount'] = round(amount, 2)
+    return summary
+
+def _recent(query, model, fields, order) -> List[Dict]:
+    columns = [getattr(model, name) for name in fields]
+    rows = query.options(load_only(*columns)).order_by(*order).limit(RECENT_ITEMS).all()
+    return [row.to_dict(fields=fields) for row in rows]
+
+def build_dashboard(user_id: int, sections: List[str], totals: List[tuple]) -> Dict:
+    """Dashboard body for the given sections, from their totals plus one list query each."""
+    dashboard = {}
+    if 'documents' in sections:
+        summary = _summary(totals, 'documents')
+        dashboard['documents'] = {
+            'total': summary['total'],
+            'by_status': summary['by_group'],
+            'recent': _recent(TaxDocument.query.filter_by(user_id=user_id), TaxDocument, DOCUMENT_FIELDS,
+                              [TaxDocument.uploaded_at.desc(), TaxDocument.id.desc()])
+        }
+    if 'receipts' in sections:
+        summary = _summary(totals, 'receipts', with_amount=True)
+        dashboard['receipts'] = {
+            'total': summary['total'],
+            'amount': summary['amount'],
+            'by_category': summary['by_group'],
+            'recent': _recent(Receipt.query.filter_by(user_id=user_id), Receipt, RECEIPT_FIELDS,
+                              [Receipt.date.desc(), Receipt.id.desc()])
+        }
+    if 'returns' in sections:
+        summary = _summary(totals, 'returns')
+        dashboard['returns'] = {
+            'total': summary['total'],
+            'by_status': summary['by_group'],
+            'recent': _recent(TaxReturn.query.filter_by(user_id=user_id), TaxReturn, RETURN_FIELDS,
+                              [TaxReturn.year.desc(), TaxReturn.id.desc()])
+        }
+    if 'clients' in sections:
+        summary = _summary(totals, 'clients')
+        dashboard['clients'] = {
+            'total': summary['total'],
+            'by_type': summary['by_group'],
+            'recent': _recent(User.query.join(CPAClient, CPAClient.client_id == User.id)
+                              .filter(CPAClient.cpa_id == user_id), User, CLIENT_FIELDS,
+                              [CPAClient.client_id.desc()])
+        }
+    return dashboard
@@ -0,0 +1,125 @@
+"""Full-text search over documents' OCR text, extracted fields, type and file name.
+
+On SQLite the index is the FTS5 table ``documents_fts``, one row per
+document keyed by its id. Triggers on ``tax_documents`` and
+``document_texts`` (see migration 0006) rewrite a document's row whenever
+OCR stores its text or fields and delete it with the document, so the
+index is current in the same transaction. Each row also carries its
+owner as a token, so a search within one user's documents is a single
+index lookup; a CPA's search across clients joins the matches to their
+roster. Results come best first by BM25, with the matching part of the
+text marked by ``HIGHLIGHT``.
+
+On Postgres the same four sources make up ``tax_documents.search_vector``,
+weighted like the FTS5 columns and kept current by triggers (see
+migration 0013), behind a GIN index. Results are ranked by ``ts_rank``.
+"""
+from typing import Dict, List, Optional
+from sqlalchemy import Column, Float, Integer, MetaData, Table, Text, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, REAL
+from src.models.user import CPAClient, DocumentText, TaxDocument, db
+from src.services.cpa_clients import search_terms
+
+HIGHLIGHT = ('<mark>', '</mark>')
+SNIPPET_TOKENS = 24
+
+# Not in db.metadata: created by migration 0006, never by create_all
+documents_fts = Table(
+    'documents_fts', MetaData(),
+    Column('rowid', Integer, primary_key=True),
+    Column('owner', Text),
+    Column('document_type', Text),
+    Column('filename', Text),
+    Column('fields', Text),
+    Column('raw_text', Text),
+    # FTS5's hidden columns: the one named after the table, for MATCH, and the row's rank
+    Column('documents_fts', Text),
+    Column('rank', Float)
+)
+RAW_TEXT_COLUMN = 4
+
+# Per column BM25 weights, in table order (owner, type, file name, fields, text): a hit in the
+# document type or in an extracted field such as the payer's name counts more than one in the text
+RANK_WEIGHTS = (0.0, 4.0, 1.0, 2.0, 1.0)
+# The same weights for ts_rank, which takes them as {D, C, B, A} scaled to 0-1: the
+# tsvector's weight D is the text, C the file name, B the fields and A the type
+POSTGRES_RANK_WEIGHTS = [weight / max(RANK_WEIGHTS) for weight in
+                         (RANK_WEIGHTS[4], RANK_WEIGHTS[2], RANK_WEIGHTS[3], RANK_WEIGHTS[1])]
+# Given to FTS5 as ``rank MATCH``, so that ``ORDER BY rank`` comes sorted out of the index, not from a temp B-tree
+RANK_FUNCTION = f"bm25({', '.join(str(weight) for weight in RANK_WEIGHTS)})"
+
+def owner_token(user_id: int) -> str:
+    return f'u{user_id}'
+
+def match_query(terms: List[str], owner_id: Optional[int] = None) -> str:
+    """FTS5 query for documents with every term as a word prefix, optionally of one owner only."""
+    query = '{document_type filename fields raw_text} : (' + ' AND '.join(f'"{term}"*' for term in terms) + ')'
+    if owner_id is not None:
+        query += f' AND owner : "{owner_token(owner_id)}"'
+    return query
+
+def document_search_query(terms: List[str], limit: int, owner_id: Optional[int], cpa_id: Optional[int]):
+    """The SQLite search statement; see ``search_documents``.
+
+    Within one owner FTS5 returns the matches already in rank order. Across
+    a CPA's roster the matches are ranked after the join instead, in a
+    sort bounded by ``limit``: FTS5's own ordering would score every
+    tenant's matches before the join drops the other CPAs' clients (nearly 4x
+    slower for a common word at 2,000 users), and naming the roster's
+    owners in the MATCH slows down as the roster grows.
+    """
+    snippet = func.snippet(literal_column('documents_fts'), RAW_TEXT_COLUMN, *HIGHLIGHT, '…', SNIPPET_TOKENS)
+    if cpa_id is None:
+        rank = documents_fts.c.rank
+        match = [documents_fts.c.documents_fts.match(match_query(terms, owner_id)), rank.match(RANK_FUNCTION)]
+        order = [rank]
+    else:
+        rank = func.bm25(literal_column('documents_fts'), *RANK_WEIGHTS)
+        match = [documents_fts.c.documents_fts.match(match_query(terms, owner_id))]
+        order = [rank, TaxDocument.id]
+    query = select(
+        TaxDocument.id, TaxDocument.user_id, TaxDocument.document_type, TaxDocument.filename,
+        TaxDocument.ocr_status, TaxDocument.uploaded_at, snippet.label('snippet'), rank.label('rank')
+    ).select_from(documents_fts).join(TaxDocument, TaxDocument.id == documents_fts.c.rowid).where(*match)
+    if cpa_id is not None:
+        query = query.join(CPAClient, (CPAClient.client_id == TaxDocument.user_id) & (CPAClient.cpa_id == cpa_id))
+    return query.order_by(*order).limit(limit)
+
+def _postgres_search(terms: List[str], limit: int, owner_id: Optional[int], cpa_id: Optional[int]):
+    # Not on the model: only Postgres databases have it (migration 0013)
+    vector = literal_column('tax_documents.search_vector')
+    tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+    rank = func.ts_rank(literal(POSTGRES_RANK_WEIGHTS, ARRAY(REAL)), vector, tsquery)
+    options = f'StartSel={HIGHLIGHT[0]}, StopSel={HIGHLIGHT[1]}, MaxWords={SNIPPET_TOKENS}, MinWords=5'
+    query = select(
+        TaxDocument.id, TaxDocument.user_id, TaxDocument.document_type, TaxDocument.filename,
+        TaxDocument.ocr_status, TaxDocument.uploaded_at,
+        func.ts_headline('simple', DocumentText.raw_text, tsquery, options).label('snippet'),
+        rank.label('rank')
+    ).select_from(TaxDocument).outerjoin(DocumentText, DocumentText.document_id == TaxDocument.id) \
+        .where(vector.op('@@')(tsquery))
+    if owner_id is not None:
+        query = query.where(TaxDocument.user_id == owner_id)
+    if cpa_id is not None:
+        query = query.join(CPAClient, (CPAClient.client_id == TaxDocument.user_id) & (CPAClient.cpa_id == cpa_id))
+    return db.session.execute(query.order_by(rank.desc(), TaxDocument.id).limit(limit)).all()
+
+def search_documents(text: str, limit: int, owner_id: Optional[int] = None, cpa_id: Optional[int] = None) -> List[Dict]:
+    """The ``limit`` best matches for ``text`` among one owner's documents and/or a CPA's clients'."""
+    terms = search_terms(text)
+    if not terms:
+        return []
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(document_search_query(terms, limit, owner_id, cpa_id)).all()
+    else:
+        rows = _postgres_search(terms, limit, owner_id, cpa_id)
+    return [{
+        'id': row.id,
+        'user_id': row.user_id,
+        'document_type': row.document_type,
+        'filename': row.filename,
+        'ocr_status': row.ocr_status,
+        'uploaded_at': row.uploaded_at.isoformat() if row.uploaded_at else None,
+        # None until OCR has stored text
+        'snippet': row.snippet or None
+    } for row in rows]
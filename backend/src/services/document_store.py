@@ -0,0 +1,367 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from flask import send_file
+from sqlalchemy.exc import IntegrityError
+from src.models.user import Blob, db
+from src.services.compression import CODEC_EXTENSIONS, compress_file, decompress_file
+
+# Outside the static folder: stored files are only reachable through routes
+# that check ownership
+DOCUMENT_STORE_ROOT = os.getenv(
+    'DOCUMENT_STORE_ROOT',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'storage')
+)
+
+# Compressed copies of rarely read blobs; may be a cheaper, slower volume
+COLD_STORAGE_ROOT = os.getenv('COLD_STORAGE_ROOT', os.path.join(DOCUMENT_STORE_ROOT, 'cold'))
+
+# A cold blob is kept uncompressed when its codec saves less than this share
+COLD_MIN_SAVINGS = float(os.getenv('COLD_STORAGE_MIN_SAVINGS', '0.03'))
+
+STORE_READ_SIZE = 1024 * 1024
+
+# How long browsers may reuse a downloaded file before revalidating. Stored
+# files never change under the same hash, so this only bounds how long a
+# deleted document stays in a browser cache.
+DOWNLOAD_MAX_AGE = int(os.getenv('DOWNLOAD_MAX_AGE', '3600'))
+
+# Leading bytes of the formats uploads are accepted in, for blobs stored without a name
+_MAGIC_EXTENSIONS = [
+    (b'%PDF', '.pdf'),
+    (b'\x89PNG', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF8', '.gif')
+]
+
+def file_extension(file_path: str) -> str:
+    """Lowercase extension of a file, sniffed from its content when the path has none.
+
+    Blobs in the document store are named by their hash only.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension:
+        return extension
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(8)
+    except OSError:
+        return ''
+    for magic, extension in _MAGIC_EXTENSIONS:
+        if head.startswith(magic):
+            return extension
+    return ''
+
+class DocumentStore:
+    """Service for storing uploaded files by the SHA-256 of their content.
+
+    A blob lives at ``<root>/blobs/ab/cd/<sha256>``, so no directory holds
+    more than a few hundred entries however many files are stored, and
+    user-supplied names never reach the filesystem. Identical files share
+    one blob; the ``blobs`` table counts the documents and receipts using
+    it, and a blob is deleted when the last of them goes.
+
+    Writes land in ``<root>/staging`` first and are renamed into place, so
+    a blob path only ever holds a complete file.
+
+    Blobs nobody has needed for a while are moved to the cold tier, a
+    compressed copy under ``cold_root`` (see storage_tiering.py). Records
+    keep their blob path either way: ``local_path`` turns it into a file
+    that can be read, decompressing a cold blob into ``<root>/thawed`` on
+    its first read and reusing that copy afterwards.
+    """
+
+    def __init__(self, root: str = DOCUMENT_STORE_ROOT, cold_root: str = COLD_STORAGE_ROOT):
+        self.root = os.path.abspath(root)
+        self.cold_root = os.path.abspath(cold_root)
+        self._lock = threading.Lock()
+        self.hot_reads = 0
+        self.cold_reads = 0
+        self.thawed_reuses = 0
+        self.thaw_seconds = 0.0
+        self.max_thaw_seconds = 0.0
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+    def cold_path(self, sha256: str, codec: str) -> str:
+        return os.path.join(self.cold_root, sha256[:2], sha256[2:4], sha256 + CODEC_EXTENSIONS[codec])
+
+    def thawed_path(self, sha256: str) -> str:
+        return os.path.join(self.root, 'thawed', sha256)
+
+    def staging_path(self, name: Optional[str] = None) -> str:
+        """A fresh path in the staging area, on the same filesystem as the blobs."""
+        staging = os.path.join(self.root, 'staging')
+        os.makedirs(staging, exist_ok=True)
+        return os.path.join(staging, name or uuid.uuid4().hex)
+
+    def save(self, stream: BinaryIO) -> Tuple[str, int]:
+        """Write a stream into the store, hashing it on the way, and count a reference to it.
+
+        Returns (sha256, size). The reference is part of the caller's transaction.
+        """
+        staging_path = self.staging_path()
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(staging_path, 'wb') as f:
+                while True:
+                    data = stream.read(STORE_READ_SIZE)
+                    if not data:
+                        break
+                    f.write(data)
+                    hasher.update(data)
+                    size += len(data)
+        except Exception:
+            os.remove(staging_path)
+            raise
+        return self.save_file(staging_path, hasher.hexdigest(), size), size
+
+    def save_file(self, staging_path: str, sha256: str, size: int) -> str:
+        """Move a complete staged file whose hash is already known into the store, and count a reference.
+
+        The reference is taken first: it locks the blob's row until the
+        caller commits, so a concurrent ``purge`` either finished deleting
+        the file before this looks for it, or waits and then finds the blob
+        in use.
+        """
+        self.add_reference(sha256, size)
+        path = self.path(sha256)
+        if os.path.exists(path):
+            # Already stored: keep the existing blob
+            os.remove(staging_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(staging_path, path)
+        return sha256
+
+    def add_reference(self, sha256: str, size: int):
+        """Count one more user of a blob, as part of the caller's transaction."""
+        while True:
+            updated = Blob.query.filter_by(sha256=sha256).update(
+                {'refcount': Blob.refcount + 1}, synchronize_session=False
+            )
+            if updated:
+                return
+            try:
+                with db.session.begin_nested():
+                    db.session.add(Blob(sha256=sha256, size=size, refcount=1))
+                return
+            except IntegrityError:
+                # Another upload of the same content created the row first; count on it
+                continue
+
+    def release(self, sha256: Optional[str]):
+        """Count one less user of a blob, as part of the caller's transaction.
+
+        Call ``purge`` after committing to delete blobs nobody uses anymore.
+        """
+        if sha256:
+            Blob.query.filter(Blob.sha256 == sha256, Blob.refcount > 0).update(
+                {'refcount': Blob.refcount - 1}, synchronize_session=False
+            )
+
+    def purge(self, sha256: Optional[str]) -> bool:
+        """Delete a blob's row and file if nothing references it. Commits.
+
+        The row is deleted before the files and committed after them, so an
+        upload of the same content waits in ``add_reference`` until the files
+        are gone and then stores its own copy.
+        """
+        if not sha256:
+            return False
+        deleted = Blob.query.filter(Blob.sha256 == sha256, Blob.refcount <= 0).delete(synchronize_session=False)
+        if not deleted and not self._claim_unreferenced(sha256):
+            db.session.commit()
+            return False
+
+        for path in [self.path(sha256), self.thawed_path(sha256)] + self._cold_paths(sha256):
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.commit()
+        return True
+
+    def _claim_unreferenced(self, sha256: str) -> bool:
+        """True if a blob has no row, e.g. after a rolled back upload, holding its key until the commit.
+
+        Inserting and deleting a placeholder row makes a concurrent first
+        ``add_reference`` of the same content wait on the key.
+        """
+        if db.session.query(Blob.sha256).filter_by(sha256=sha256).first() is not None:
+            return False
+        try:
+            with db.session.begin_nested():
+                db.session.add(Blob(sha256=sha256, size=0, refcount=0))
+        except IntegrityError:
+            return False
+        Blob.query.filter_by(sha256=sha256).delete(synchronize_session=False)
+        return True
+
+    def local_path(self, file_path: str) -> str:
+        """A readable absolute path for a record's file_path, thawing the blob if it is cold.
+
+        Paths outside the store, and blobs found on neither tier, come back
+        as they are so the caller's open fails as before. Uploads from
+        before the store may hold a path relative to the working directory,
+        which is where ``open`` and ``os.path.exists`` look; it is made
+        absolute here so ``send_file``, which would resolve it against the
+        app's root_path, sends that same file.
+        """
+        file_path = os.path.abspath(file_path)
+        sha256 = os.path.basename(file_path)
+        if os.path.exists(file_path) or file_path != self.path(sha256):
+            with self._lock:
+                self.hot_reads += 1
+            return file_path
+        return self.thaw(sha256) or file_path
+
+    def thaw(self, sha256: str) -> Optional[str]:
+        """Decompressed copy of a cold blob, made on first use. None if there is no cold copy."""
+        thawed = self.thawed_path(sha256)
+        if os.path.exists(thawed):
+            os.utime(thawed)
+            with self._lock:
+                self.cold_reads += 1
+                self.thawed_reuses += 1
+            return thawed
+
+        cold = self.find_cold(sha256)
+        if cold is None:
+            return None
+
+        started = time.perf_counter()
+        self._decompress_to(cold, thawed)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.cold_reads += 1
+            self.thaw_seconds += elapsed
+            self.max_thaw_seconds = max(self.max_thaw_seconds, elapsed)
+        return thawed
+
+    def find_cold(self, sha256: str) -> Optional[Tuple[str, str]]:
+        """(path, codec) of a blob's cold copy, if it has one."""
+        for codec in CODEC_EXTENSIONS:
+            path = self.cold_path(sha256, codec)
+            if os.path.exists(path):
+                return path, codec
+        return None
+
+    def freeze(self, sha256: str, codec: str) -> Tuple[str, int]:
+        """Write the cold copy of a hot blob. Returns (codec used, bytes stored).
+
+        Falls back to 'none' when ``codec`` saves less than COLD_MIN_SAVINGS,
+        as with most JPEGs. The hot file is left alone; remove it with
+        ``drop_hot`` once the blob's row says it is cold.
+        """
+        source = self.path(sha256)
+        size = os.path.getsize(source)
+        staging_path = self.staging_path()
+        try:
+            compress_file(source, staging_path, codec)
+            stored_size = os.path.getsize(staging_path)
+            if codec != 'none' and stored_size > size * (1 - COLD_MIN_SAVINGS):
+                codec = 'none'
+                compress_file(source, staging_path, codec)
+                stored_size = size
+        except Exception:
+            os.remove(staging_path)
+            raise
+
+        destination = self.cold_path(sha256, codec)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(staging_path, destination)
+        return codec, stored_size
+
+    def unfreeze(self, sha256: str):
+        """Restore a cold blob's hot file, unless it is already there."""
+        path = self.path(sha256)
+        if os.path.exists(path):
+            return
+        cold = self.find_cold(sha256)
+        if cold is None:
+            raise FileNotFoundError(f'Blob {sha256} is on neither tier')
+        self._decompress_to(cold, path)
+
+    def drop_hot(self, sha256: str):
+        """Delete the hot file of a blob whose cold copy is committed."""
+        path = self.path(sha256)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def drop_cold(self, sha256: str):
+        """Delete the cold copy, and any thawed copy, of a blob that is hot again."""
+        for path in self._cold_paths(sha256) + [self.thawed_path(sha256)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def trim_thawed(self, max_age_seconds: float) -> int:
+        """Delete thawed copies not read for ``max_age_seconds``. Returns how many."""
+        directory = os.path.join(self.root, 'thawed')
+        if not os.path.isdir(directory):
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for entry in os.scandir(directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def stats(self) -> Dict:
+        """Read counters for this process: how often reads hit the cold tier and what thawing cost."""
+        with self._lock:
+            thaws = self.cold_reads - self.thawed_reuses
+            return {
+                'hot_reads': self.hot_reads,
+                'cold_reads': self.cold_reads,
+                'thawed_reuses': self.thawed_reuses,
+                'thaws': thaws,
+                'mean_thaw_ms': round(self.thaw_seconds / thaws * 1000, 1) if thaws else None,
+                'max_thaw_ms': round(self.max_thaw_seconds * 1000, 1) if thaws else None
+            }
+
+    def _cold_paths(self, sha256: str) -> List[str]:
+        return [self.cold_path(sha256, codec) for codec in CODEC_EXTENSIONS]
+
+    def _decompress_to(self, cold: Tuple[str, str], destination: str):
+        # Staged and renamed, so readers never see a partly written file
+        cold_path, codec = cold
+        staging_path = self.staging_path()
+        try:
+            decompress_file(cold_path, staging_path, codec)
+        except Exception:
+            os.remove(staging_path)
+            raise
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(staging_path, destination)
+
+def send_stored_file(file_path: str, filename: Optional[str] = None, content_hash: Optional[str] = None):
+    """Response for a stored document or receipt file.
+
+    send_file hands the open file to the server's wsgi.file_wrapper (or to
+    the front-end server when USE_X_SENDFILE is on) instead of copying it
+    through Python, answers Range requests with 206, and answers
+    If-None-Match/If-Modified-Since with 304. Blob files get a strong ETag
+    equal to their content hash. Cold blobs are sent from their thawed copy.
+    """
+    response = send_file(
+        document_store.local_path(file_path),
+        download_name=filename or os.path.basename(file_path),
+        conditional=True,
+        etag=content_hash or True,
+        max_age=DOWNLOAD_MAX_AGE
+    )
+    # Authenticated content: browsers may cache it, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+document_store = DocumentStore()
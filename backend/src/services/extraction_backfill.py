@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import or_, update
+from src.models.user import DocumentText, TaxDocument, db
+from src.services.field_extraction import EXTRACTOR_VERSION, extract_fields
+
+BACKFILL_CHUNK_SIZE = 500
+
+def reextract(document_type: str, raw_text: str, previous: Optional[Dict]) -> Dict:
+    """Rebuild a stored OCR result's fields from its text, without OCR.
+
+    Confidences are kept for values that did not change; new or changed
+    values get None since the word confidences are not stored. Values read
+    from a form template's boxes are kept, as they are more reliable than
+    what matches in the text.
+    """
+    previous = previous or {}
+    old_fields = previous.get('extracted_data') or {}
+    old_confidence = previous.get('field_confidence') or {}
+
+    fields = extract_fields(document_type, raw_text)
+    if any(page.get('template') for page in previous.get('pages') or []):
+        fields.update(old_fields)
+
+    data = {key: value for key, value in previous.items() if key != 'raw_text'}
+    data['extracted_data'] = fields
+    data['field_confidence'] = {
+        field: old_confidence.get(field) if old_fields.get(field) == value else None
+        for field, value in fields.items()
+    }
+    return data
+
+def _reextract_row(row: Tuple[int, str, str, Optional[Dict]]) -> Tuple[int, Dict]:
+    document_id, document_type, raw_text, previous = row
+    return document_id, reextract(document_type, raw_text, previous)
+
+def _pending_chunk(after_id: int, chunk_size: int) -> List[tuple]:
+    """Next chunk of completed documents extracted by another version, in id order."""
+    return db.session.query(
+        TaxDocument.id,
+        TaxDocument.document_type,
+        TaxDocument.extracted_data,
+        DocumentText.raw_text
+    ).outerjoin(DocumentText).filter(
+        TaxDocument.id > after_id,
+        TaxDocument.ocr_status == 'completed',
+        or_(TaxDocument.extractor_version.is_(None), TaxDocument.extractor_version != EXTRACTOR_VERSION)
+    ).order_by(TaxDocument.id).limit(chunk_size).all()
+
+def backfill_extraction(chunk_size: int = BACKFILL_CHUNK_SIZE, workers: Optional[int] = None,
+                        dry_run: bool = False, progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """Rerun field extraction over stored OCR text for documents from an older extractor.
+
+    Documents are read in id order, ``chunk_size`` at a time, and extracted
+    on a process pool. Each chunk is written and committed before the next
+    is read: rows whose fields changed get one bulk UPDATE, the rest only
+    have their extractor_version stamped. An interrupted run therefore
+    resumes where it stopped, since finished rows no longer match.
+
+    Documents processed before OCR text had its own table carry it inside
+    extracted_data; it is moved to document_texts on the way.
+    """
+    stats = {'scanned': 0, 'changed': 0, 'unchanged': 0, 'skipped': 0, 'moved_text': 0}
+    after_id = 0
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = _pending_chunk(after_id, chunk_size)
+            if not rows:
+                break
+            after_id = rows[-1].id
+            stats['scanned'] += len(rows)
+
+            tasks, moved_texts = [], []
+            for row in rows:
+                raw_text = row.raw_text
+                if raw_text is None and row.extracted_data and 'raw_text' in row.extracted_data:
+                    raw_text = row.extracted_data['raw_text'] or ''
+                    moved_texts.append({'document_id': row.id, 'raw_text': raw_text})
+                if raw_text is None:
+                    stats['skipped'] += 1
+                    continue
+                tasks.append((row.id, row.document_type, raw_text, row.extracted_data))
+
+            previous = {row.id: row.extracted_data for row in rows}
+            changed, unchanged = [], []
+            batch = max(1, len(tasks) // (4 * workers))
+            for document_id, data in pool.map(_reextract_row, tasks, chunksize=batch):
+                if data != previous[document_id]:
+                    changed.append({'id': document_id, 'extracted_data': data, 'extractor_version': EXTRACTOR_VERSION})
+                else:
+                    unchanged.append(document_id)
+            stats['changed'] += len(changed)
+            stats['unchanged'] += len(unchanged)
+            stats['moved_text'] += len(moved_texts)
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                if moved_texts:
+                    db.session.bulk_insert_mappings(DocumentText, moved_texts)
+                if changed:
+                    db.session.execute(update(TaxDocument), changed)
+                if unchanged:
+                    db.session.execute(
+                        update(TaxDocument).where(TaxDocument.id.in_(unchanged)).values(extractor_version=EXTRACTOR_VERSION)
+                    )
+                db.session.commit()
+
+            if progress:
+                progress(f"Processed documents up to id {after_id}: {stats}")
+
+    return stats
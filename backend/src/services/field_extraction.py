@@ -0,0 +1,205 @@
+import re
+import string
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Optional
+
+# Bump whenever a field spec or form template changes so cached and stored
+# results are refreshed
+EXTRACTOR_VERSION = '6'
+
+# Value patterns. Each names its capture group "value"; FieldSpec renames it
+# after the field so every field of a document type can share one scanner.
+# Values must start with a digit/letter right after the label and never
+# cross a line, so a label with no value costs a few steps instead of
+# backtracking across the rest of the OCR text.
+# A single digit followed by words is the next box's number on a form's
+# label row ("3 Social security wages 4 Social security tax withheld"),
+# not an amount.
+MONEY = r'[:\s]*\$?\s*(?P<value>(?!\d[ \t]+[a-z])\d[\d,]*(?:\.\d{1,2})?)'
+TIN = r'[\s:#().]*(?P<value>\d[\d -]{7,12}\d)'
+NAME = r'[:\s]*(?P<value>[A-Za-z\s&,.-]+?)(?:\n|$)'
+PERSON_NAME = r'[:\s]*(?P<value>[A-Za-z\s,.-]+?)(?:\n|$)'
+DATE = r'(?P<value>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+
+CENT = Decimal('0.01')
+
+def money(value: str) -> Optional[str]:
+    """Normalize an OCR'd amount like '1,234.5' to '1234.50'.
+
+    Amounts are parsed as Decimal and stored as strings so they survive the
+    JSON column without float rounding.
+    """
+    try:
+        return str(Decimal(value.replace(',', '')).quantize(CENT))
+    except InvalidOperation:
+        return None
+
+def _tin(value: str, groups: List[int]) -> Optional[str]:
+    digits = re.sub(r'\D', '', value)
+    if len(digits) != sum(groups):
+        return None
+    parts, start = [], 0
+    for size in groups:
+        parts.append(digits[start:start + size])
+        start += size
+    return '-'.join(parts)
+
+def ein(value: str) -> Optional[str]:
+    """Normalize an employer identification number to XX-XXXXXXX."""
+    return _tin(value, [2, 7])
+
+def ssn(value: str) -> Optional[str]:
+    """Normalize a social security number to XXX-XX-XXXX."""
+    return _tin(value, [3, 2, 4])
+
+def tin(value: str) -> Optional[str]:
+    """Normalize a taxpayer identification number, keeping an EIN's layout if it has one."""
+    if re.match(r'^\d{2}-', value.strip()):
+        return ein(value)
+    return ssn(value)
+
+def clean_text(value: str) -> Optional[str]:
+    """Collapse runs of whitespace left behind by OCR line breaks."""
+    value = ' '.join(value.split()).strip(' ,.-')
+    return value or None
+
+# Lowercases ASCII only, so offsets in the folded text match the original
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+class FieldSpec:
+    """Declarative description of one field.
+
+    ``label`` is the (lowercase) regex that introduces the field, ``value``
+    the pattern for the value itself and ``keywords`` the literal words every
+    label match starts with, used to find candidate positions. Fields without
+    keywords are located with a plain search.
+    """
+
+    def __init__(self, name: str, label: str, value: str, keywords: tuple = (),
+                 postprocess: Optional[Callable[[str], Optional[str]]] = None,
+                 anchored: bool = False):
+        self.name = name
+        self.keywords = keywords
+        self.postprocess = postprocess
+        # Anchored fields only match at the very start of the text
+        self.anchored = anchored
+        self.pattern = re.compile(f'(?:{label})' + value.replace('(?P<value>', f'(?P<{name}>'))
+
+    def convert(self, text: str, match) -> Optional[str]:
+        start, end = match.span(self.name)
+        value = text[start:end].strip()
+        if self.postprocess:
+            value = self.postprocess(value)
+        return value or None
+
+class DocumentSpec:
+    """Compiled set of field specs for one document type.
+
+    The text is case-folded once and scanned once for the keywords of all
+    fields. At each keyword hit only the fields that can start there are
+    tried, and the scan stops as soon as every field is filled. The first
+    match of each field in reading order wins, as with one re.search per
+    field.
+    """
+
+    def __init__(self, fields: List[FieldSpec]):
+        self.fields = fields
+        self.by_keyword = {}
+        for spec in fields:
+            for keyword in spec.keywords:
+                self.by_keyword.setdefault(keyword, []).append(spec)
+        # Longest first so 'employee' is not shadowed by a shorter prefix
+        keywords = sorted(self.by_keyword, key=len, reverse=True)
+        self.scanner = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+    def extract(self, text: str, spans: Optional[Dict] = None) -> Dict:
+        """Extract every field; when ``spans`` is given it receives each value's (start, end) in ``text``."""
+        # str.lower is an order of magnitude faster and folds ASCII text the same way
+        folded = text.lower() if text.isascii() else text.translate(_ASCII_LOWER)
+        data = {}
+        pending = set()
+
+        for spec in self.fields:
+            if spec.anchored:
+                self._store(spec, text, spec.pattern.match(folded), data, spans)
+            elif not spec.keywords:
+                self._store(spec, text, spec.pattern.search(folded), data, spans)
+            else:
+                pending.add(spec.name)
+
+        if pending:
+            for hit in self.scanner.finditer(folded):
+                position = hit.start()
+                for spec in self.by_keyword[hit.group()]:
+                    if spec.name in pending and self._store(spec, text, spec.pattern.match(folded, position), data, spans):
+                        pending.discard(spec.name)
+                if not pending:
+                    break
+
+        return {spec.name: data[spec.name] for spec in self.fields if spec.name in data}
+
+    @staticmethod
+    def _store(spec: FieldSpec, text: str, match, data: Dict, spans: Optional[Dict] = None) -> bool:
+        if not match:
+            return False
+        value = spec.convert(text, match)
+        if not value:
+            # A label followed by junk; keep looking further down the text
+            return False
+        data[spec.name] = value
+        if spans is not None:
+            spans[spec.name] = match.span(spec.name)
+        return True
+
+FIELD_SPECS = {
+    'w-2': DocumentSpec([
+        # The form's box labels ("Employer's name, address, and ZIP code", "Employee's first name and
+        # initial Last name") are read whole, so the value is the line below them, not the rest of the label
+        FieldSpec('employer_name', r"employer(?:'s)?\s+name(?:,\s*address,\s*and\s+zip\s+code)?|employer\b|company",
+                  NAME, ('employer', 'company'), clean_text),
+        FieldSpec('employee_name', r"employee(?:'s)?(?:\s+first)?\s+name(?:\s+and\s+initial)?(?:\s+last\s+name)?"
+                  r'|employee\b|name(?=\s*:)', PERSON_NAME, ('employee', 'name'), clean_text),
+        FieldSpec('wages', r'wages|box\s*1\b', MONEY, ('wages', 'box'), money),
+        FieldSpec('federal_tax', r'federal[^\n]{0,40}?tax(?:\s+withheld)?|box\s*2\b', MONEY,
+                  ('federal', 'box'), money),
+        FieldSpec('social_security_wages', r'social[^\n]{0,20}?security[^\n]{0,20}?wages|box\s*3\b', MONEY,
+                  ('social', 'box'), money),
+        FieldSpec('medicare_wages', r'medicare[^\n]{0,20}?wages|box\s*5\b', MONEY, ('medicare', 'box'), money),
+        FieldSpec('ein', r'ein\b|employer[^\n]{0,30}?id', TIN, ('ein', 'employer'), ein),
+        FieldSpec('ssn', r'ssn\b|social[^\n]{0,20}?security(?:\s+(?:number|no\.?))?', TIN, ('ssn', 'social'), ssn)
+    ]),
+    '1099': DocumentSpec([
+        FieldSpec('payer_name', r'payer|company', NAME, ('payer', 'company'), clean_text),
+        FieldSpec('recipient_name', r'recipient|payee', PERSON_NAME, ('recipient', 'payee'), clean_text),
+        FieldSpec('nonemployee_compensation', r'nonemployee[^\n]{0,20}?compensation|box\s*1\b', MONEY,
+                  ('nonemployee', 'box'), money),
+        FieldSpec('federal_tax', r'federal[^\n]{0,40}?tax(?:\s+withheld)?|box\s*4\b', MONEY,
+                  ('federal', 'box'), money),
+        FieldSpec('payer_tin', r'payer[^\n]{0,30}?tin|ein\b', TIN, ('payer', 'ein'), tin),
+        FieldSpec('recipient_tin', r'recipient[^\n]{0,30}?tin|ssn\b', TIN, ('recipient', 'ssn'), tin)
+    ]),
+    'receipt': DocumentSpec([
+        FieldSpec('merchant_name', r'', r'(?P<value>[A-Za-z\s&,.-]+?)(?:\n|$)', postprocess=clean_text,
+                  anchored=True),
+        # Not the subtotal, which comes first on most receipts
+        FieldSpec('total_amount', r'(?<!sub)total|amount', MONEY, ('total', 'amount'), money),
+        FieldSpec('date', r'', DATE),
+        FieldSpec('tax_amount', r'tax\b', MONEY, ('tax',), money)
+    ])
+}
+
+def extract_fields(document_type: str, text: str, spans: Optional[Dict] = None) -> Dict:
+    """Extract the structured fields for a document type from OCR text.
+
+    Pass a dict as ``spans`` to also get the character span each value was
+    read from, e.g. to look up the OCR confidence of those characters.
+    """
+    spec = FIELD_SPECS.get(document_type.lower())
+    if spec is None or not text:
+        return {}
+    return spec.extract(text, spans)
+
+def field_names(document_type: str) -> List[str]:
+    """Names of the fields extracted for a document type, in spec order."""
+    spec = FIELD_SPECS.get(document_type.lower())
+    return [field.name for field in spec.fields] if spec else []
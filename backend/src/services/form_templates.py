@@ -0,0 +1,174 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from PIL import Image
+from src.services.field_extraction import clean_text, ein, money, ssn, tin
+
+# (left, top, right, bottom) as fractions of the page width/height
+Region = Tuple[float, float, float, float]
+
+# US letter, portrait
+LETTER_ASPECT = 8.5 / 11
+
+# Boxes hold a printed label line and the typed value under it
+BOX_CONFIG = '--psm 6'
+TITLE_CONFIG = '--psm 6'
+
+# Padding added around every box, as a fraction of the page, to survive a
+# slightly off-center scan
+BOX_PADDING = 0.004
+
+_AMOUNT = re.compile(r'\d[\d,]*\.\d{2}\b')
+_WHOLE_AMOUNT = re.compile(r'\d[\d,]*')
+_TIN_VALUE = re.compile(r'\d[\d -]{7,12}\d')
+
+def parse_amount(text: str) -> Optional[str]:
+    """Last dollar amount in a box, preferring one with cents over bare numbers."""
+    matches = _AMOUNT.findall(text) or _WHOLE_AMOUNT.findall(text)
+    return money(matches[-1]) if matches else None
+
+def tin_parser(normalize: Callable[[str], Optional[str]]) -> Callable[[str], Optional[str]]:
+    def parse(text: str) -> Optional[str]:
+        for match in _TIN_VALUE.findall(text):
+            value = normalize(match)
+            if value:
+                return value
+        return None
+    return parse
+
+def parse_first_line(text: str) -> Optional[str]:
+    """The first line of a name/address block is the name."""
+    for line in text.splitlines():
+        value = clean_text(line)
+        if value:
+            return value
+    return None
+
+class FormBox:
+    """One box of a form layout and the field it fills.
+
+    ``label`` matches (lowercased) the printed caption lines inside the box,
+    which are dropped before ``parse`` sees the rest of the box text.
+    """
+
+    def __init__(self, field: str, region: Region, label: str, parse: Callable[[str], Optional[str]]):
+        self.field = field
+        self.region = region
+        self.label = re.compile(label)
+        self.parse = parse
+
+    def read(self, image: Image.Image, engine) -> Optional[Dict]:
+        result = engine.recognize(image.crop(_pixels(self.region, image.size, BOX_PADDING)), BOX_CONFIG)
+        lines = [line for line in result['text'].splitlines()
+                 if line.strip() and not self.label.search(line.lower())]
+        value = self.parse('\n'.join(lines))
+        if not value:
+            return None
+
+        tokens = set(' '.join(lines).split())
+        confidences = [word['conf'] for word in result['words'] if word['text'] in tokens]
+        return {
+            'value': value,
+            'confidence': round(min(confidences), 1) if confidences else None,
+            'text': result['text'].strip()
+        }
+
+class FormTemplate:
+    """Box layout of one IRS form as printed one form per page.
+
+    A page fits the template when its aspect ratio is close to
+    ``aspect_ratio`` and the OCR of the small ``title_region`` matches
+    ``title``. Both checks are far cheaper than OCR'ing the page.
+    """
+
+    def __init__(self, name: str, document_type: str, title_region: Region, title: str,
+                 boxes: List[FormBox], aspect_ratio: float = LETTER_ASPECT, aspect_tolerance: float = 0.06):
+        self.name = name
+        self.document_type = document_type
+        self.title_region = title_region
+        self.title = re.compile(title)
+        self.boxes = boxes
+        self.aspect_ratio = aspect_ratio
+        self.aspect_tolerance = aspect_tolerance
+
+    def fits_page(self, image: Image.Image) -> bool:
+        return abs(image.width / image.height - self.aspect_ratio) <= self.aspect_tolerance
+
+    def read(self, image: Image.Image, engine) -> Dict:
+        fields, confidence, text = {}, {}, []
+        for box in self.boxes:
+            result = box.read(image, engine)
+            if result is None:
+                continue
+            fields[box.field] = result['value']
+            confidence[box.field] = result['confidence']
+            text.append(result['text'])
+        return {'template': self.name, 'fields': fields, 'confidence': confidence, 'text': '\n'.join(text)}
+
+def _pixels(region: Region, size: Tuple[int, int], padding: float = 0.0) -> Tuple[int, int, int, int]:
+    width, height = size
+    left, top, right, bottom = region
+    return (
+        max(0, int((left - padding) * width)),
+        max(0, int((top - padding) * height)),
+        min(width, int((right + padding) * width)),
+        min(height, int((bottom + padding) * height))
+    )
+
+# Layouts follow the 2024 revisions of Copy B as printed from the IRS PDFs,
+# with the form in the top part of a letter page. Field names match the
+# extractors in field_extraction.py. Adjust a region here, and bump
+# EXTRACTOR_VERSION, if a new revision moves a box.
+W2 = FormTemplate('w-2', 'w-2', (0.04, 0.42, 0.60, 0.48), r'w-?2\b|wage and tax statement', [
+    FormBox('ssn', (0.27, 0.03, 0.50, 0.065), r"social security|employee'?s", tin_parser(ssn)),
+    FormBox('ein', (0.04, 0.065, 0.50, 0.095), r'identification|\bein\b', tin_parser(ein)),
+    FormBox('employer_name', (0.04, 0.095, 0.50, 0.19), r"employer'?s name|zip code", parse_first_line),
+    FormBox('employee_name', (0.04, 0.22, 0.50, 0.26), r"employee'?s|first name|last name", parse_first_line),
+    FormBox('wages', (0.50, 0.065, 0.73, 0.095), r'wages|compensation', parse_amount),
+    FormBox('federal_tax', (0.73, 0.065, 0.96, 0.095), r'federal|withheld', parse_amount),
+    FormBox('social_security_wages', (0.50, 0.095, 0.73, 0.125), r'social security', parse_amount),
+    FormBox('medicare_wages', (0.50, 0.125, 0.73, 0.155), r'medicare', parse_amount)
+])
+
+_1099_TITLE_REGION = (0.62, 0.03, 0.96, 0.12)
+
+def _1099_party_boxes(federal_tax_region: Region) -> List[FormBox]:
+    return [
+        FormBox('payer_name', (0.04, 0.03, 0.40, 0.12), r"payer'?s name|street address|zip|telephone",
+                parse_first_line),
+        FormBox('payer_tin', (0.04, 0.12, 0.22, 0.155), r"payer'?s tin|\btin\b", tin_parser(tin)),
+        FormBox('recipient_tin', (0.22, 0.12, 0.40, 0.155), r"recipient'?s tin|\btin\b", tin_parser(tin)),
+        FormBox('recipient_name', (0.04, 0.155, 0.40, 0.19), r"recipient'?s name", parse_first_line),
+        FormBox('federal_tax', federal_tax_region, r'federal|withheld', parse_amount)
+    ]
+
+NEC = FormTemplate('1099-nec', '1099', _1099_TITLE_REGION, r'1099-?nec|nonemployee compensation', [
+    FormBox('nonemployee_compensation', (0.40, 0.12, 0.62, 0.16), r'nonemployee|compensation', parse_amount)
+] + _1099_party_boxes((0.40, 0.225, 0.62, 0.26)))
+
+MISC = FormTemplate('1099-misc', '1099', _1099_TITLE_REGION, r'1099-?misc|miscellaneous (?:income|information)',
+                    _1099_party_boxes((0.40, 0.155, 0.62, 0.19)))
+
+FORM_TEMPLATES = {
+    'w-2': [W2],
+    '1099': [NEC, MISC]
+}
+
+def detect_template(image: Image.Image, document_type: str, engine) -> Optional[FormTemplate]:
+    """Find the template a page was printed from, OCR'ing each distinct title strip once."""
+    titles = {}
+    for template in FORM_TEMPLATES.get(document_type.lower(), []):
+        if not template.fits_page(image):
+            continue
+        if template.title_region not in titles:
+            crop = image.crop(_pixels(template.title_region, image.size, BOX_PADDING))
+            titles[template.title_region] = engine.recognize(crop, TITLE_CONFIG)['text'].lower()
+        if template.title.search(titles[template.title_region]):
+            return template
+    return None
+
+def read_form(image: Image.Image, document_type: str, engine) -> Optional[Dict]:
+    """Read a page box by box if it matches a known form layout, else return None."""
+    template = detect_template(image, document_type, engine)
+    if template is None:
+        return None
+    return template.read(image, engine)
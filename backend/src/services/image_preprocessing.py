@@ -0,0 +1,145 @@
+import os
+import re
+from typing import Optional, Tuple
+from PIL import Image, ImageOps
+
+# Long side of a US letter page in inches / points, used to size images that
+# carry no trustworthy DPI (phone photos usually claim 72)
+LETTER_LONG_SIDE_INCHES = 11
+LETTER_LONG_SIDE_POINTS = 792
+
+_PAGE_SIZE = re.compile(r'([\d.]+)\s*x\s*([\d.]+)\s*pts')
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+def otsu_threshold(image: Image.Image) -> int:
+    """Pick the gray level that best separates ink from paper (Otsu's method)."""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+
+    best_level, best_variance = 127, -1.0
+    weight_background = 0
+    sum_background = 0
+    for level, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += level * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+def estimate_skew(image: Image.Image, max_degrees: float, step: float, sample_width: int = 800) -> float:
+    """Estimate text skew in degrees with a projection profile.
+
+    Text lines that are level give the sharpest row-by-row ink profile, so
+    the angle whose rotated row sums have the highest variance wins. Work
+    is done on a small binarized copy; row sums come from a 1-pixel-wide
+    box resize rather than per-pixel Python loops.
+    """
+    sample = image.convert('L')
+    if sample.width > sample_width:
+        sample = sample.resize((sample_width, max(1, sample.height * sample_width // sample.width)),
+                               Image.Resampling.BILINEAR)
+    # Ink becomes 255 and paper 0, so the corners exposed by rotation read as paper
+    threshold = otsu_threshold(sample)
+    sample = sample.point([255 if level <= threshold else 0 for level in range(256)])
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(max_degrees / step)
+    # Smallest angles first so a page with no clear lines is left alone
+    for i in sorted(range(-steps, steps + 1), key=abs):
+        angle = i * step
+        rotated = sample.rotate(angle, resample=Image.Resampling.BILINEAR, fillcolor=0)
+        rows = list(rotated.resize((1, rotated.height), Image.Resampling.BOX).getdata())
+        mean = sum(rows) / len(rows)
+        score = sum((row - mean) ** 2 for row in rows)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+class ImagePreprocessor:
+    """Configurable clean-up applied to page images before OCR.
+
+    Steps run in order: downscale to ``target_dpi``, grayscale, deskew,
+    binarize. Any step can be switched off, and defaults come from the
+    OCR_PREPROCESS_* environment variables. Instances are plain data so
+    they can be sent to OCR engine workers.
+    """
+
+    def __init__(self, target_dpi: Optional[int] = None, grayscale: Optional[bool] = None,
+                 binarize: Optional[bool] = None, deskew: Optional[bool] = None,
+                 max_skew_degrees: float = 5.0, skew_step: float = 0.5,
+                 min_pdf_dpi: int = 150, max_pdf_dpi: int = 400):
+        self.target_dpi = target_dpi or int(os.getenv('OCR_PREPROCESS_TARGET_DPI', '300'))
+        self.grayscale = _env_flag('OCR_PREPROCESS_GRAYSCALE', True) if grayscale is None else grayscale
+        self.binarize = _env_flag('OCR_PREPROCESS_BINARIZE', True) if binarize is None else binarize
+        self.deskew = _env_flag('OCR_PREPROCESS_DESKEW', True) if deskew is None else deskew
+        self.max_skew_degrees = max_skew_degrees
+        self.skew_step = skew_step
+        self.min_pdf_dpi = min_pdf_dpi
+        self.max_pdf_dpi = max_pdf_dpi
+
+    def open(self, image_path: str) -> Image.Image:
+        """Open an image file, letting JPEG decode straight to the reduced size."""
+        image = Image.open(image_path)
+        if image.format == 'JPEG':
+            size = self._target_size(image)
+            if size != image.size:
+                image.draft('L' if self.grayscale else image.mode, size)
+        return ImageOps.exif_transpose(image)
+
+    def process(self, image: Image.Image) -> Image.Image:
+        image = self.downscale(image)
+        if self.grayscale or self.binarize:
+            image = image.convert('L')
+        if self.deskew:
+            angle = estimate_skew(image, self.max_skew_degrees, self.skew_step)
+            if angle:
+                fill = 255 if image.mode == 'L' else (255,) * len(image.getbands())
+                image = image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+        if self.binarize:
+            threshold = otsu_threshold(image)
+            image = image.point([0 if level <= threshold else 255 for level in range(256)])
+        return image
+
+    def downscale(self, image: Image.Image) -> Image.Image:
+        size = self._target_size(image)
+        if size == image.size:
+            return image
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    def pdf_dpi(self, page_size: Optional[str]) -> int:
+        """Rasterization DPI for a PDF given pdfinfo's 'Page size' value.
+
+        A letter page renders at ``target_dpi``; larger pages get fewer dots
+        per inch and small pages (receipts, stubs) more, so every page comes
+        out at roughly the same pixel size.
+        """
+        match = _PAGE_SIZE.search(page_size or '')
+        if not match:
+            return self.target_dpi
+        long_side = max(float(match.group(1)), float(match.group(2)))
+        if long_side <= 0:
+            return self.target_dpi
+        dpi = self.target_dpi * LETTER_LONG_SIDE_POINTS / long_side
+        return int(min(self.max_pdf_dpi, max(self.min_pdf_dpi, dpi)))
+
+    def _target_size(self, image: Image.Image) -> Tuple[int, int]:
+        dpi = image.info.get('dpi')
+        source_dpi = float(dpi[0]) if dpi and dpi[0] and float(dpi[0]) > 72 else None
+        if source_dpi:
+            scale = self.target_dpi / source_dpi
+        else:
+            scale = LETTER_LONG_SIDE_INCHES * self.target_dpi / max(image.size)
+        if scale >= 1:
+            return image.size
+        return max(1, round(image.width * scale)), max(1, round(image.height * scale))
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'ocr_cache.db')
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class OCRCache:
+    """Two-tier cache of OCR results keyed on file content.
+
+    The first tier is an in-process LRU of recently used results; the second
+    is a SQLite file shared by every process on the host and trimmed to
+    ``max_disk_bytes`` by evicting the least recently used entries.
+
+    Both tiers hold results as JSON text, so every ``get`` decodes a fresh
+    dict that the caller may change without touching the cached entry.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, memory_entries: Optional[int] = None,
+                 max_disk_bytes: Optional[int] = None):
+        self.db_path = db_path or os.getenv('OCR_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.memory_entries = memory_entries or int(os.getenv('OCR_CACHE_MEMORY_ENTRIES', '256'))
+        self.max_disk_bytes = max_disk_bytes or int(os.getenv('OCR_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content_hash: str, document_type: str, extractor_version: str) -> str:
+        return f"{content_hash}:{document_type.lower()}:{extractor_version}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for ``key`` or None, promoting disk hits to memory."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(self._memory[key])
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE ocr_cache SET last_access = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"Error reading OCR cache: {e}")
+            row = None
+
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, row[0])
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict):
+        """Store a result in both tiers, evicting old disk entries past the size limit."""
+        payload = json.dumps(value)
+        with self._lock:
+            self._remember(key, payload)
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO ocr_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                    (key, payload, len(payload), time.time())
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Error writing OCR cache: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM ocr_cache')
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process plus the current size of each tier."""
+        try:
+            with self._connect() as conn:
+                disk_entries, disk_bytes = conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache'
+                ).fetchone()
+        except sqlite3.Error:
+            disk_entries, disk_bytes = None, None
+
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_capacity': self.memory_entries,
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+                'disk_capacity_bytes': self.max_disk_bytes
+            }
+
+    def _remember(self, key: str, payload: str):
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_cache').fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        excess = total - self.max_disk_bytes
+        doomed = []
+        for key, size in conn.execute('SELECT key, size FROM ocr_cache ORDER BY last_access'):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM ocr_cache WHERE key = ?', doomed)
+
+    @contextmanager
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if not self._schema_ready:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS ocr_cache ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_access ON ocr_cache (last_access)')
+                self._schema_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+ocr_cache = OCRCache()
@@ -0,0 +1,346 @@
+import multiprocessing
+import os
+import pickle
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # in requirements.txt, but needs the system tesseract headers to build
+    tesserocr = None
+
+# 'tesserocr' keeps a warm engine in each worker; 'pytesseract' starts the
+# tesseract CLI for every page; 'auto' uses tesserocr when it is installed
+OCR_ENGINE = os.getenv('OCR_ENGINE', 'tesserocr')
+OCR_ENGINE_LANG = os.getenv('OCR_ENGINE_LANG', 'eng')
+OCR_ENGINE_POOL_SIZE = int(os.getenv('OCR_ENGINE_POOL_SIZE', str(os.cpu_count() or 1)))
+OCR_ENGINE_TIMEOUT = float(os.getenv('OCR_ENGINE_TIMEOUT', '120'))
+# Workers start from a fresh interpreter rather than a fork of the threaded
+# web process, which would copy its locks and database connections mid-use
+OCR_ENGINE_START_METHOD = os.getenv('OCR_ENGINE_START_METHOD', 'spawn')
+
+TESSEROCR_MISSING = ('OCR_ENGINE=tesserocr but the tesserocr package is not installed; install it (see '
+                     'requirements.txt) or set OCR_ENGINE=pytesseract to run the tesseract CLI per page')
+
+_PSM = re.compile(r'--psm\s+(\d+)')
+
+class PytesseractEngine:
+    """Runs the tesseract CLI once per image through pytesseract."""
+
+    name = 'pytesseract'
+
+    def __init__(self, lang: str = OCR_ENGINE_LANG):
+        self.lang = lang
+
+    def image_to_string(self, image: Image.Image, config: str = '') -> str:
+        return pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+    def recognize(self, image: Image.Image, config: str = '') -> Dict:
+        """OCR once and return both the text and each word with its confidence (0-100)."""
+        data = pytesseract.image_to_data(image, lang=self.lang, config=config, output_type=pytesseract.Output.DICT)
+        lines = {}
+        words = []
+        for i, word in enumerate(data['text']):
+            conf = float(data['conf'][i])
+            if conf < 0 or not word.strip():
+                continue
+            words.append({'text': word, 'conf': conf})
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(key, []).append(word)
+        return {'text': '\n'.join(' '.join(line) for line in lines.values()), 'words': words}
+
+    def close(self):
+        pass
+
+class TesserocrEngine:
+    """Keeps one tesseract API instance with its language model loaded.
+
+    Only safe to use from one thread at a time; each pool worker owns one.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang: str = OCR_ENGINE_LANG):
+        self.lang = lang
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def image_to_string(self, image: Image.Image, config: str = '') -> str:
+        psm = _PSM.search(config)
+        self.api.SetPageSegMode(int(psm.group(1)) if psm else tesserocr.PSM.AUTO)
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+    def recognize(self, image: Image.Image, config: str = '') -> Dict:
+        """OCR once and return both the text and each word with its confidence (0-100)."""
+        text = self.image_to_string(image, config)
+        words = [{'text': word, 'conf': float(conf)} for word, conf in self.api.MapWordConfidences()]
+        return {'text': text, 'words': words}
+
+    def close(self):
+        self.api.End()
+
+def check_engine(kind: str = OCR_ENGINE):
+    """Raise RuntimeError if ``kind`` cannot be built here, before any worker tries."""
+    if kind not in ('auto', 'tesserocr', 'pytesseract'):
+        raise RuntimeError(f"OCR_ENGINE must be 'tesserocr', 'pytesseract' or 'auto', not {kind!r}")
+    if kind == 'tesserocr' and tesserocr is None:
+        raise RuntimeError(TESSEROCR_MISSING)
+
+def create_engine(kind: str = OCR_ENGINE, lang: str = OCR_ENGINE_LANG):
+    """Build the engine for ``kind`` ('tesserocr', 'pytesseract' or 'auto')."""
+    check_engine(kind)
+    if kind == 'tesserocr' or (kind == 'auto' and tesserocr is not None):
+        return TesserocrEngine(lang)
+    return PytesseractEngine(lang)
+
+_local_engine = None
+
+def get_local_engine():
+    """Return this process's engine, creating (and warming) it on first use."""
+    global _local_engine
+    if _local_engine is None:
+        _local_engine = create_engine()
+    return _local_engine
+
+class OCREngineError(RuntimeError):
+    """OCR could not run: the engine hung or its worker died. Worth retrying later."""
+
+class OCREngineTimeout(OCREngineError):
+    pass
+
+class OCRWorkerCrashed(OCREngineError):
+    pass
+
+def engine_name(kind: str = OCR_ENGINE) -> str:
+    """The engine ``create_engine(kind)`` builds, without building it."""
+    return 'tesserocr' if kind == 'tesserocr' or (kind == 'auto' and tesserocr is not None) else 'pytesseract'
+
+def _portable_error(error: Exception) -> Exception:
+    """``error``, or a RuntimeError with its message if it would not unpickle in the parent."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f'{type(error).__name__}: {error}')
+
+def _worker_main(conn):
+    """Engine worker process: warm the engine, then run tasks from ``conn`` one at a time."""
+    get_local_engine()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        fn, args = task
+        try:
+            reply = ('result', fn(*args))
+        except Exception as e:
+            reply = ('error', _portable_error(e))
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # An unpicklable result or exception
+            conn.send(('error', RuntimeError(f'{fn.__name__} returned an unpicklable value: {e!r}')))
+
+class _Worker:
+    """One engine process and the parent thread that feeds it tasks and times them."""
+
+    def __init__(self, pool: 'OCREnginePool', index: int):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.busy_since = None
+        self.tasks = 0
+        self.thread = threading.Thread(target=self._serve, name=f'ocr-engine-{index}', daemon=True)
+
+    def start(self):
+        self._spawn()
+        self.thread.start()
+
+    def status(self) -> Dict:
+        busy_since = self.busy_since
+        return {
+            'pid': self.process.pid if self.process else None,
+            'alive': bool(self.process and self.process.is_alive()),
+            'busy_seconds': round(time.monotonic() - busy_since, 1) if busy_since is not None else None,
+            'tasks': self.tasks
+        }
+
+    def _spawn(self):
+        context = self.pool.context
+        parent, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), name=f'ocr-engine-{self.index}',
+                                       daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = parent
+
+    def _replace(self):
+        """Kill this worker's process and start a fresh one; the other workers carry on."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self._spawn()
+
+    def _serve(self):
+        while True:
+            task = self.pool._tasks.get()
+            if task is None:
+                self.conn.send(None)
+                self.process.join()
+                return
+            future, fn, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._run(future, fn, args)
+            except Exception as e:
+                # Never let one task take this worker's thread down with it
+                if not future.done():
+                    future.set_exception(e)
+
+    def _run(self, future: Future, fn: Callable, args: tuple):
+        for attempt in range(2):
+            try:
+                outcome, value = self._execute(fn, args)
+                break
+            except EOFError:
+                # The process died under this task (OOM, a tesseract segfault): retry once on a fresh one
+                self.pool.crashes += 1
+                self._replace()
+                if attempt:
+                    future.set_exception(OCRWorkerCrashed(f'OCR worker died twice running {fn.__name__}'))
+                    return
+        if outcome == 'timeout':
+            self.pool.timeouts += 1
+            self._replace()
+            future.set_exception(OCREngineTimeout(f'{fn.__name__} ran longer than {self.pool.timeout:g}s'))
+        elif outcome == 'error':
+            future.set_exception(value)
+        else:
+            future.set_result(value)
+
+    def _execute(self, fn: Callable, args: tuple):
+        # The clock starts when this worker takes the task, not when it was queued
+        self.busy_since = time.monotonic()
+        try:
+            try:
+                self.conn.send((fn, args))
+            except (BrokenPipeError, ConnectionResetError):
+                raise EOFError
+            if not self.conn.poll(self.pool.timeout):
+                return 'timeout', None
+            try:
+                return self.conn.recv()
+            except ConnectionResetError:
+                raise EOFError
+        finally:
+            self.busy_since = None
+            self.tasks += 1
+
+class OCREnginePool:
+    """Pool of long-lived worker processes that each keep a warm OCR engine.
+
+    Work reaches the workers over pipes: either a small task (a file path,
+    a PDF page window) that the worker loads itself, or a pickled page
+    image. Tasks wait in one queue; a worker takes the next when it is
+    free, and ``OCR_ENGINE_TIMEOUT`` counts from then, so time spent queued
+    behind other documents never times a task out. A worker that runs past
+    the timeout is killed and replaced, failing only its own task with
+    ``OCREngineTimeout``; a worker that dies is replaced and its task
+    retried once on the new one before failing with ``OCRWorkerCrashed``.
+
+    Workers are started with ``OCR_ENGINE_START_METHOD`` ('spawn' by
+    default; 'forkserver' also works when the backend directory is on
+    PYTHONPATH), never by forking the web process.
+    """
+
+    def __init__(self, size: int = OCR_ENGINE_POOL_SIZE, timeout: float = OCR_ENGINE_TIMEOUT,
+                 start_method: str = OCR_ENGINE_START_METHOD):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.context = multiprocessing.get_context(start_method)
+        self.timeouts = 0
+        self.crashes = 0
+        self._tasks = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue ``fn(*args)`` for a worker; ``fn`` must be picklable (module level)."""
+        self._start()
+        future = Future()
+        self._tasks.put((future, fn, args))
+        return future
+
+    def run(self, fn: Callable, *args):
+        """Run ``fn(*args)`` in a worker and wait for the result."""
+        return self.submit(fn, *args).result()
+
+    def map(self, fn: Callable, *iterables) -> List:
+        """Like Executor.map, but waits for all results; on the first failure the rest are canceled."""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def health(self) -> Dict:
+        """How many workers are alive and busy, from the supervising threads' bookkeeping.
+
+        Read-only: it sends nothing to the workers, so it neither waits behind
+        queued OCR nor disturbs it.
+        """
+        with self._lock:
+            workers = [worker.status() for worker in self._workers]
+        busy = [worker['busy_seconds'] for worker in workers if worker['busy_seconds'] is not None]
+        alive = sum(worker['alive'] for worker in workers)
+        engine = engine_name()
+        health = {
+            'healthy': not workers or alive == len(workers),
+            'engine': engine,
+            # tesserocr keeps the language model loaded; pytesseract starts a tesseract process per page
+            'warm': engine == 'tesserocr',
+            'size': self.size,
+            'started': bool(workers),
+            'alive': alive,
+            'busy': len(busy),
+            'queued': self._tasks.qsize(),
+            'longest_task_seconds': max(busy, default=None),
+            'timeout_seconds': self.timeout,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+            'workers': workers
+        }
+        if engine != 'tesserocr':
+            health['note'] = 'pytesseract starts a tesseract process per page; install tesserocr for warm engines'
+        return health
+
+    def shutdown(self):
+        """Stop the workers once they finish the tasks already queued."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._tasks.put(None)
+        for worker in workers:
+            worker.thread.join()
+
+    def _start(self):
+        with self._lock:
+            if not self._workers:
+                check_engine()
+                self._workers = [_Worker(self, index) for index in range(self.size)]
+                for worker in self._workers:
+                    worker.start()
+
+engine_pool = OCREnginePool()
@@ -0,0 +1,289 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, or_
+from src.models.user import DocumentText, OCRJob, TaxDocument, db
+from src.services.document_store import document_store
+from src.services.field_extraction import EXTRACTOR_VERSION
+from src.services.ocr_engine import check_engine
+from src.services.ocr_service import OCRService, is_retryable
+from src.services.preview_service import preview_service
+
+def store_ocr_result(document: TaxDocument, result: Dict):
+    """Save an OCRService result on a document, with the OCR text in its own row."""
+    data = dict(result)
+    raw_text = data.pop('raw_text', '') or ''
+    if document.document_text is None:
+        document.document_text = DocumentText(raw_text=raw_text)
+    else:
+        document.document_text.raw_text = raw_text
+    document.extracted_data = data
+    document.extractor_version = EXTRACTOR_VERSION
+
+class OCRJobQueue:
+    """Bounded background worker pool for OCR jobs persisted in the ocr_jobs table.
+
+    Uploads only insert a pending job; the pool claims it, runs OCR and writes
+    the result back to the document. Because jobs live in the database, work
+    that was pending when the process stopped is picked up again by
+    ``start``. Running jobs carry a heartbeat that the process running them
+    refreshes; a periodic ``sweep`` in every started process requeues jobs
+    whose heartbeat stopped, so a job orphaned by a dead worker process is
+    run again without waiting for a restart.
+
+    A job that fails for a reason that may pass (see ``is_retryable``) goes
+    back to pending with a ``next_attempt_at`` that doubles with each
+    attempt, and is submitted again once that time comes; other failures
+    and the last allowed attempt fail the document.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Submitted but not yet started, and running in this process
+        self._queued = set()
+        self._running = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('OCR_MAX_WORKERS', int(os.getenv('OCR_MAX_WORKERS', '2')))
+        app.config.setdefault('OCR_MAX_ATTEMPTS', 3)
+        # Delay before the first retry, doubled for each one after, up to the maximum
+        app.config.setdefault('OCR_RETRY_BASE_SECONDS', float(os.getenv('OCR_RETRY_BASE_SECONDS', '30')))
+        app.config.setdefault('OCR_RETRY_MAX_SECONDS', float(os.getenv('OCR_RETRY_MAX_SECONDS', '900')))
+        # How often a started queue heartbeats its running jobs and sweeps for orphans
+        app.config.setdefault('OCR_JOB_HEARTBEAT_SECONDS', float(os.getenv('OCR_JOB_HEARTBEAT_SECONDS', '30')))
+        # A running job whose heartbeat is this old belongs to a dead process;
+        # keep it a few heartbeats long
+        app.config.setdefault('OCR_JOB_STALE_SECONDS', float(os.getenv('OCR_JOB_STALE_SECONDS', '120')))
+
+        self.app = app
+        app.extensions['ocr_queue'] = self
+
+    def start(self):
+        """Start the workers and the sweep, and requeue jobs left over from a previous run.
+
+        Only the serving process calls this (see main.py), so importing the
+        app or running a ``flask`` command never starts workers.
+        """
+        # Fail here, at server start, rather than in every OCR job
+        check_engine()
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.app.config['OCR_MAX_WORKERS'],
+                thread_name_prefix='ocr-worker'
+            )
+            self._stopping.clear()
+
+        with self.app.app_context():
+            self.resume_pending()
+        threading.Thread(target=self._sweep_loop, name='ocr-sweep', daemon=True).start()
+
+    def enqueue(self, document: TaxDocument, file_path: str) -> OCRJob:
+        """Add a pending job for a document to the session.
+
+        The caller commits the session and then calls ``submit`` so the worker
+        never sees a job that is not yet visible to other connections.
+        """
+        document.ocr_status = 'pending'
+        job = OCRJob(
+            document=document,
+            file_path=file_path,
+            document_type=document.document_type,
+            status='pending'
+        )
+        db.session.add(job)
+        return job
+
+    def submit(self, job_id: int):
+        """Hand a committed job to the worker pool.
+
+        In a process that has not started the queue the job stays pending
+        until the sweep of one that has picks it up.
+        """
+        executor = self._executor
+        if executor is None:
+            return
+        with self._lock:
+            self._queued.add(job_id)
+        executor.submit(self._run_job, job_id)
+
+    def submit_at(self, job_id: int, when: Optional[datetime]):
+        """Hand a committed job to the worker pool once ``when`` (UTC) has passed."""
+        delay = (when - datetime.utcnow()).total_seconds() if when else 0
+        if delay <= 0:
+            self.submit(job_id)
+            return
+        timer = threading.Timer(delay, self.submit, [job_id])
+        timer.daemon = True
+        timer.start()
+
+    def resume_pending(self) -> List[int]:
+        """Requeue pending jobs and jobs orphaned by a previous process, each when its retry is due."""
+        self._requeue_stale(datetime.utcnow())
+        db.session.commit()
+
+        jobs = db.session.query(OCRJob.id, OCRJob.next_attempt_at).filter_by(status='pending').order_by(OCRJob.id).all()
+        for job_id, next_attempt_at in jobs:
+            self.submit_at(job_id, next_attempt_at)
+        return [job_id for job_id, _ in jobs]
+
+    def sweep(self) -> List[int]:
+        """Heartbeat the jobs running here and submit work no live process owns.
+
+        That is running jobs whose heartbeat went stale, and pending jobs
+        overdue by ``OCR_JOB_STALE_SECONDS`` that were not submitted here,
+        e.g. uploaded through a process that never started the queue.
+        Returns the ids submitted.
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            running = list(self._running)
+            queued = set(self._queued)
+        if running:
+            OCRJob.query.filter(
+                OCRJob.id.in_(running),
+                OCRJob.status == 'running'
+            ).update({'heartbeat_at': now}, synchronize_session=False)
+        self._requeue_stale(now)
+        db.session.commit()
+
+        stale_before = now - timedelta(seconds=self.app.config['OCR_JOB_STALE_SECONDS'])
+        overdue = db.session.query(OCRJob.id).filter(
+            OCRJob.status == 'pending',
+            func.coalesce(OCRJob.next_attempt_at, OCRJob.created_at) < stale_before
+        ).order_by(OCRJob.id).all()
+        job_ids = [job_id for job_id, in overdue if job_id not in queued]
+        for job_id in job_ids:
+            self.submit(job_id)
+        return job_ids
+
+    def shutdown(self, wait: bool = True):
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _requeue_stale(self, now: datetime):
+        # Jobs claimed before heartbeats existed only have started_at
+        stale_before = now - timedelta(seconds=self.app.config['OCR_JOB_STALE_SECONDS'])
+        OCRJob.query.filter(
+            OCRJob.status == 'running',
+            func.coalesce(OCRJob.heartbeat_at, OCRJob.started_at) < stale_before
+        ).update({'status': 'pending'}, synchronize_session=False)
+
+    def _sweep_loop(self):
+        while not self._stopping.wait(self.app.config['OCR_JOB_HEARTBEAT_SECONDS']):
+            with self.app.app_context():
+                try:
+                    self.sweep()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error sweeping OCR jobs: {e}")
+
+    def _claim(self, job_id: int) -> Optional[OCRJob]:
+        # Conditional update so a job is only ever run by one worker, even
+        # across processes sharing the same database, and never before its retry is due
+        now = datetime.utcnow()
+        claimed = OCRJob.query.filter(
+            OCRJob.id == job_id,
+            OCRJob.status == 'pending',
+            or_(OCRJob.next_attempt_at.is_(None), OCRJob.next_attempt_at <= now)
+        ).update({
+            'status': 'running',
+            'started_at': now,
+            'heartbeat_at': now,
+            'attempts': OCRJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return None
+        return db.session.get(OCRJob, job_id)
+
+    def _run_job(self, job_id: int):
+        with self._lock:
+            self._queued.discard(job_id)
+            self._running.add(job_id)
+        try:
+            with self.app.app_context():
+                self._process(job_id)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _process(self, job_id: int):
+        try:
+            job = self._claim(job_id)
+            if job is None:
+                return
+
+            file_path = job.file_path
+            document_type = job.document_type
+            content_hash = job.document.content_hash
+            # Do not hold a transaction open while tesseract runs
+            db.session.commit()
+
+            try:
+                # Cold (compressed) blobs are read from a thawed copy
+                result = OCRService().process_tax_document(document_store.local_path(file_path), document_type)
+            except Exception as e:
+                self._fail(job_id, str(e) or repr(e), retry=is_retryable(e))
+                return
+
+            job = db.session.get(OCRJob, job_id)
+            if job is None:
+                # The document (and its jobs) were deleted while OCR ran
+                return
+            store_ocr_result(job.document, result)
+            job.document.ocr_status = 'completed'
+            job.status = 'completed'
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            # Saved while OCR rasterized page 1 in color; grayscale rasters,
+            # text layer PDFs and OCR cache hits still need one rendered
+            preview_service.submit(preview_service.key(file_path, content_hash), file_path)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error running OCR job {job_id}: {e}")
+            # e.g. the result could not be stored; a job left running would
+            # only come back once its heartbeat went stale
+            try:
+                self._fail(job_id, str(e) or repr(e))
+            except Exception as fail_error:
+                db.session.rollback()
+                print(f"Error failing OCR job {job_id}: {fail_error}")
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds to wait after a job's ``attempts``-th failed attempt."""
+        delay = self.app.config['OCR_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1)
+        return min(delay, self.app.config['OCR_RETRY_MAX_SECONDS'])
+
+    def _fail(self, job_id: int, error: str, retry: bool = True):
+        job = db.session.get(OCRJob, job_id)
+        # Already finished, or never claimed because the error came first
+        if job is None or job.status != 'running':
+            return
+
+        job.error = error
+        if retry and job.attempts < self.app.config['OCR_MAX_ATTEMPTS']:
+            job.status = 'pending'
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(job.attempts))
+            db.session.commit()
+            self.submit_at(job_id, job.next_attempt_at)
+            return
+
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+        job.document.ocr_status = 'failed'
+        db.session.commit()
+
+ocr_queue = OCRJobQueue()
@@ -1,142 +1,499 @@
+import copy
 import os
-import pytesseract
-from PIL import Image
-from pdf2image import convert_from_path
+from PIL import Image, UnidentifiedImageError
+from pdf2image import convert_from_path, pdfinfo_from_path
+import subprocess
 import tempfile
-import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from src.services.document_store import file_extension
+from src.services.field_extraction import EXTRACTOR_VERSION, extract_fields, field_names
+from src.services.form_templates import FORM_TEMPLATES, read_form
+from src.services.image_preprocessing import ImagePreprocessor
+from src.services.ocr_cache import file_sha256, ocr_cache
+from src.services.ocr_engine import OCREngineError, engine_pool, get_local_engine
+from src.services.preview_service import preview_service
+
+# Number of PDF pages rasterized at once by a single worker. Peak memory is
+# roughly workers * window * one rasterized page, independent of page count.
+PDF_PAGE_WINDOW = int(os.getenv('OCR_PDF_PAGE_WINDOW', '2'))
+
+# Pages whose embedded text layer has fewer characters than this are OCR'd
+MIN_TEXT_LAYER_CHARS = int(os.getenv('OCR_MIN_TEXT_LAYER_CHARS', '32'))
+PDF_TEXT_LAYER_TIMEOUT = 60
+
+# pdf2image's default, used when preprocessing is switched off
+DEFAULT_PDF_DPI = 200
+
+# When W-2/1099 fields are missing, OCR pages whose mean word confidence is
+# below this get a second pass at a higher resolution, reading the page as
+# one uniform block of text (tesseract's --psm 6) instead of auto layout.
+REOCR_CONFIDENCE = float(os.getenv('OCR_REOCR_CONFIDENCE', '70'))
+REOCR_DOCUMENT_TYPES = ('w-2', '1099')
+REOCR_DPI_SCALE = 1.5
+REOCR_MAX_DPI = 600
+REOCR_CONFIG = '--psm 6'
+
+# Read scanned W-2/1099s box by box through form_templates.py when a layout matches
+USE_FORM_TEMPLATES = os.getenv('OCR_FORM_TEMPLATES', '1').lower() in ('1', 'true', 'yes', 'on')
+
+def is_retryable(error: Exception) -> bool:
+    """Whether running OCR again later may succeed: the engine hung or died, or the file could not be read.
+
+    OCR raises these instead of returning an empty result, so a passing
+    fault is neither cached nor stored as the document's text.
+    """
+    return isinstance(error, (OCREngineError, OSError)) and not isinstance(error, UnidentifiedImageError)
+
+def _save_preview(preview_key: Optional[str], page: Image.Image, preprocessor: Optional[ImagePreprocessor]):
+    """Keep a page rasterized for OCR as the document's preview, unless it came out in grayscale.
+
+    Previews rendered on demand are in color. A page the preprocessor had
+    decoded or rasterized in grayscale is left for the preview service to
+    render after OCR instead.
+    """
+    if preview_key and not (preprocessor and preprocessor.grayscale and page.mode == 'L'):
+        preview_service.save_page(preview_key, page)
+
+def _ocr_pdf_window(pdf_path: str, first_page: int, last_page: int, dpi: int = DEFAULT_PDF_DPI,
+                    preprocessor: Optional[ImagePreprocessor] = None, config: str = '',
+                    preview_key: Optional[str] = None) -> List[Dict]:
+    """Rasterize and OCR one window of PDF pages, returning text and word confidences per page.
+
+    With a ``preview_key``, page 1 is also saved as the document's preview
+    when it was rasterized in color.
+    """
+    pages = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
+        grayscale=bool(preprocessor and preprocessor.grayscale)
+    )
+    engine = get_local_engine()
+    results = []
+    for page_number, page in enumerate(pages, first_page):
+        if page_number == 1:
+            _save_preview(preview_key, page, preprocessor)
+        image = preprocessor.process(page) if preprocessor else page
+        results.append(engine.recognize(image, config))
+        page.close()
+    return results
+
+def _ocr_image_file(image_path: str, preprocessor: Optional[ImagePreprocessor] = None, config: str = '',
+                    preview_key: Optional[str] = None) -> Dict:
+    """Load, clean up and OCR one image file inside an engine worker."""
+    if preprocessor is None:
+        with Image.open(image_path) as image:
+            _save_preview(preview_key, image, preprocessor)
+            return get_local_engine().recognize(image, config)
+    page = preprocessor.open(image_path)
+    _save_preview(preview_key, page, preprocessor)
+    image = preprocessor.process(page)
+    return get_local_engine().recognize(image, config)
+
+def _read_form_file(file_path: str, document_type: str, dpi: int = DEFAULT_PDF_DPI,
+                    preprocessor: Optional[ImagePreprocessor] = None,
+                    preview_key: Optional[str] = None) -> Optional[Dict]:
+    """Load the first page of a document and read it through a matching form template."""
+    if file_extension(file_path) == '.pdf':
+        page = convert_from_path(file_path, dpi=dpi, first_page=1, last_page=1,
+                                 grayscale=bool(preprocessor and preprocessor.grayscale))[0]
+    elif preprocessor:
+        page = preprocessor.open(file_path)
+    else:
+        page = Image.open(file_path)
+    _save_preview(preview_key, page, preprocessor)
+    image = preprocessor.process(page) if preprocessor else page
+    return read_form(image, document_type, get_local_engine())
+
+def mean_confidence(words: List[Dict]) -> float:
+    """Average word confidence of an OCR result, 0 when nothing was read."""
+    if not words:
+        return 0.0
+    return round(sum(word['conf'] for word in words) / len(words), 1)
+
+def _ocr_page(page_number: int, result: Dict, dpi: Optional[int] = None) -> Dict:
+    return {
+        'page': page_number,
+        'text': result['text'],
+        'source': 'ocr',
+        'confidence': mean_confidence(result['words']),
+        'words': result['words'],
+        'dpi': dpi
+    }
+
+def _join_pages(pages: List[Dict]) -> Tuple[str, List[tuple]]:
+    """Join page texts like the stored raw text and locate each OCR word in it.
+
+    Returns the text and (start, end, confidence) spans. Text layer pages
+    are one span with full confidence.
+    """
+    joined = "\n".join(page['text'] for page in pages)
+    text = joined.strip()
+    shift = len(joined) - len(joined.lstrip())
+    
+    spans = []
+    offset = -shift
+    for page in pages:
+        if page['source'] == 'text_layer':
+            spans.append((offset, offset + len(page['text']), 100.0))
+        else:
+            position = 0
+            for word in page.get('words', []):
+                found = page['text'].find(word['text'], position)
+                if found < 0:
+                    continue
+                position = found + len(word['text'])
+                spans.append((offset + found, offset + position, word['conf']))
+        offset += len(page['text']) + 1
+    return text, spans
+
+def _field_confidence(value_spans: Dict, word_spans: List[tuple]) -> Dict:
+    """Confidence of each field: that of the least certain word its value was read from."""
+    confidence = {}
+    for field, (start, end) in value_spans.items():
+        overlapping = [conf for word_start, word_end, conf in word_spans if word_start < end and word_end > start]
+        confidence[field] = round(min(overlapping), 1) if overlapping else None
+    return confidence
+
+def _mean_field_confidence(confidence: Dict) -> float:
+    values = [value for value in confidence.values() if value is not None]
+    return round(sum(values) / len(values), 1) if values else 0.0
+
+def _page_summaries(pages: List[Dict]) -> List[Dict]:
+    summaries = []
+    for page in pages:
+        summary = {'page': page['page'], 'source': page['source'], 'confidence': page['confidence']}
+        if page.get('reocr'):
+            summary['reocr'] = True
+        summaries.append(summary)
+    return summaries
+
+def _page_windows(page_numbers: List[int], size: int) -> List[tuple]:
+    """Group sorted page numbers into contiguous (first, last) runs of at most ``size`` pages."""
+    windows = []
+    run = []
+    for page_number in page_numbers:
+        if run and (page_number != run[-1] + 1 or len(run) == size):
+            windows.append((run[0], run[-1]))
+            run = []
+        run.append(page_number)
+    if run:
+        windows.append((run[0], run[-1]))
+    return windows
+
+def extract_text_layer(pdf_path: str, page_count: int) -> List[str]:
+    """Return the embedded text of each PDF page using poppler's pdftotext.
+
+    Returns an empty list when pdftotext is unavailable or fails, so callers
+    fall back to OCR for every page.
+    """
+    try:
+        result = subprocess.run(
+            ['pdftotext', '-layout', '-enc', 'UTF-8', pdf_path, '-'],
+            capture_output=True, timeout=PDF_TEXT_LAYER_TIMEOUT, check=True
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Error reading PDF text layer: {e}")
+        return []
+    
+    # pdftotext ends every page with a form feed
+    return result.stdout.decode('utf-8', errors='replace').split('\f')[:page_count]
+
+def has_usable_text(text: str) -> bool:
+    """Whether a page's text layer is worth using instead of OCR.
+
+    Scanned PDFs often carry no text or an invisible layer of junk glyphs,
+    so require a minimum amount of mostly alphanumeric text.
+    """
+    compact = ''.join(text.split())
+    if len(compact) < MIN_TEXT_LAYER_CHARS:
+        return False
+    return sum(c.isalnum() for c in compact) / len(compact) >= 0.5
 
 class OCRService:
     """Service for extracting text and data from tax documents using OCR."""
     
-    def __init__(self):
+    def __init__(self, parallel_pages: bool = True, page_window: int = PDF_PAGE_WINDOW,
+                 preprocess: bool = True, preprocessor: Optional[ImagePreprocessor] = None,
+                 use_templates: bool = USE_FORM_TEMPLATES):
         # Configure tesseract path if needed
         # pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-        pass
+        # OCR itself runs on the warm engine pool, see ocr_engine.py
+        self.parallel_pages = parallel_pages
+        self.page_window = max(1, page_window)
+        self.preprocessor = (preprocessor or ImagePreprocessor()) if preprocess else None
+        self.use_templates = use_templates
     
     def extract_text_from_image(self, image_path: str) -> str:
         """Extract text from an image file."""
-        try:
-            image = Image.open(image_path)
-            text = pytesseract.image_to_string(image)
-            return text.strip()
-        except Exception as e:
-            print(f"Error extracting text from image: {e}")
-            return ""
+        return self.extract_image_pages(image_path)[0]['text'].strip()
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """Extract text from a PDF file."""
         try:
-            # Convert PDF to images
-            pages = convert_from_path(pdf_path)
-            extracted_text = ""
-            
-            for page in pages:
-                # Extract text from each page
-                text = pytesseract.image_to_string(page)
-                extracted_text += text + "\n"
-            
-            return extracted_text.strip()
+            return "\n".join(page['text'] for page in self.extract_pdf_pages(pdf_path)).strip()
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             return ""
     
-    def extract_text_from_document(self, file_path: str) -> str:
-        """Extract text from a document (PDF or image)."""
-        file_extension = os.path.splitext(file_path)[1].lower()
+    def extract_image_pages(self, image_path: str, preprocessor: Optional[ImagePreprocessor] = None,
+                            config: str = '', preview_key: Optional[str] = None) -> List[Dict]:
+        """OCR an image file as a single page with its word confidences."""
+        try:
+            result = engine_pool.run(_ocr_image_file, image_path, preprocessor or self.preprocessor, config,
+                                     preview_key)
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            print(f"Error extracting text from image: {e}")
+            result = {'text': '', 'words': []}
+        return [_ocr_page(1, result)]
+    
+    def extract_pdf_pages(self, pdf_path: str, preview_key: Optional[str] = None) -> List[Dict]:
+        """Extract the text of each PDF page, preferring the embedded text layer.
+
+        Generated PDFs (most 1099s and brokerage statements) already carry
+        their text, which pdftotext returns in milliseconds. Only pages
+        without usable text are rasterized and OCR'd. Each page records the
+        path it took as 'text_layer' or 'ocr' and a 0-100 confidence; OCR
+        pages also keep their words and the DPI they were rendered at.
+        """
+        info = pdfinfo_from_path(pdf_path)
+        page_count = info['Pages']
+        layer_texts = extract_text_layer(pdf_path, page_count)
+        
+        pages = []
+        for page_number in range(1, page_count + 1):
+            text = layer_texts[page_number - 1] if page_number <= len(layer_texts) else ''
+            if has_usable_text(text):
+                pages.append({'page': page_number, 'text': text, 'source': 'text_layer', 'confidence': 100.0})
+            else:
+                pages.append(_ocr_page(page_number, {'text': '', 'words': []}))
         
-        if file_extension == '.pdf':
-            return self.extract_text_from_pdf(file_path)
-        elif file_extension in ['.jpg', '.jpeg', '.png', '.gif']:
-            return self.extract_text_from_image(file_path)
+        ocr_page_numbers = [page['page'] for page in pages if page['source'] == 'ocr']
+        if ocr_page_numbers:
+            dpi = self.preprocessor.pdf_dpi(info.get('Page size')) if self.preprocessor else DEFAULT_PDF_DPI
+            results = self.ocr_pdf_pages(pdf_path, ocr_page_numbers, dpi, preview_key=preview_key)
+            for page_number, result in zip(ocr_page_numbers, results):
+                pages[page_number - 1] = _ocr_page(page_number, result, dpi)
+        
+        return pages
+    
+    def ocr_pdf_pages(self, pdf_path: str, page_numbers: Optional[List[int]] = None,
+                      dpi: int = DEFAULT_PDF_DPI, config: str = '',
+                      preprocessor: Optional[ImagePreprocessor] = None,
+                      preview_key: Optional[str] = None) -> List[Dict]:
+        """OCR PDF pages window by window and return each page's text and words in order.
+
+        Windows are rasterized with first_page/last_page inside the worker that
+        OCRs them, so only a few pages are ever held in memory at once. Page 1,
+        if OCR'd in color, is kept as the preview under ``preview_key``.
+        """
+        if page_numbers is None:
+            page_numbers = list(range(1, pdfinfo_from_path(pdf_path)['Pages'] + 1))
+        preprocessor = preprocessor or self.preprocessor
+        windows = _page_windows(page_numbers, self.page_window)
+        
+        if not self.parallel_pages or len(windows) < 2:
+            results = [_ocr_pdf_window(pdf_path, first, last, dpi, preprocessor, config, preview_key)
+                       for first, last in windows]
         else:
-            return ""
+            results = engine_pool.map(
+                _ocr_pdf_window,
+                [pdf_path] * len(windows),
+                [first for first, _ in windows],
+                [last for _, last in windows],
+                [dpi] * len(windows),
+                [preprocessor] * len(windows),
+                [config] * len(windows),
+                [preview_key] * len(windows)
+            )
+        
+        return [result for window_results in results for result in window_results]
     
-    def extract_w2_data(self, text: str) -> Dict:
-        """Extract structured data from W-2 form text."""
-        data = {}
-        
-        # Common W-2 patterns
-        patterns = {
-            'employer_name': r'(?:employer|company)[:\s]*([A-Za-z\s&,.-]+?)(?:\n|$)',
-            'employee_name': r'(?:employee|name)[:\s]*([A-Za-z\s,.-]+?)(?:\n|$)',
-            'wages': r'(?:wages|box\s*1)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'federal_tax': r'(?:federal.*tax|box\s*2)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'social_security_wages': r'(?:social.*security.*wages|box\s*3)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'medicare_wages': r'(?:medicare.*wages|box\s*5)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'ein': r'(?:ein|employer.*id)[:\s]*([0-9-]+)',
-            'ssn': r'(?:ssn|social.*security)[:\s]*([0-9-]+)'
-        }
+    def extract_document_pages(self, file_path: str, preview_key: Optional[str] = None) -> List[Dict]:
+        """Extract per-page text, source and confidence from a document (PDF or image)."""
+        extension = file_extension(file_path)
+        
+        if extension == '.pdf':
+            try:
+                return self.extract_pdf_pages(file_path, preview_key)
+            except Exception as e:
+                if is_retryable(e):
+                    raise
+                print(f"Error extracting text from PDF: {e}")
+                return []
+        elif extension in ['.jpg', '.jpeg', '.png', '.gif']:
+            return self.extract_image_pages(file_path, preview_key=preview_key)
+        else:
+            return []
+    
+    def reocr_low_confidence_pages(self, file_path: str, pages: List[Dict]) -> Optional[List[Dict]]:
+        """Give OCR pages below REOCR_CONFIDENCE a slower, higher resolution second pass.
+
+        Returns the page list with each retried page replaced by its second
+        pass when that read it more confidently, or None when no page
+        qualified. Text layer pages are never retried.
+        """
+        low = [page for page in pages if page['source'] == 'ocr' and page['confidence'] < REOCR_CONFIDENCE]
+        if not low:
+            return None
+        
+        if file_extension(file_path) == '.pdf':
+            dpi = min(REOCR_MAX_DPI, round(max(page['dpi'] or DEFAULT_PDF_DPI for page in low) * REOCR_DPI_SCALE))
+            page_numbers = [page['page'] for page in low]
+            try:
+                results = self.ocr_pdf_pages(file_path, page_numbers, dpi, REOCR_CONFIG, self._sharper_preprocessor(dpi))
+            except Exception as e:
+                if is_retryable(e):
+                    raise
+                print(f"Error re-running OCR on PDF pages: {e}")
+                return None
+            retried = [_ocr_page(page_number, result, dpi) for page_number, result in zip(page_numbers, results)]
+        else:
+            target_dpi = self.preprocessor.target_dpi if self.preprocessor else DEFAULT_PDF_DPI
+            dpi = min(REOCR_MAX_DPI, round(target_dpi * REOCR_DPI_SCALE))
+            retried = self.extract_image_pages(file_path, self._sharper_preprocessor(dpi), REOCR_CONFIG)
         
-        for field, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                data[field] = match.group(1).strip()
+        by_number = {page['page']: page for page in retried if page['confidence'] > 0}
+        merged = []
+        for page in pages:
+            second = by_number.get(page['page'])
+            if second is not None and page['source'] == 'ocr' and second['confidence'] > page['confidence']:
+                second['reocr'] = True
+                page = second
+            merged.append(page)
+        return merged
+    
+    def read_form_template(self, file_path: str, document_type: str,
+                           preview_key: Optional[str] = None) -> Optional[Dict]:
+        """Read a scanned W-2/1099's fields through its box layout.
+
+        Only a title strip and the needed boxes are OCR'd. Returns None when
+        no template fits, and for PDFs with a usable text layer, which is
+        cheaper still.
+        """
+        if document_type.lower() not in FORM_TEMPLATES:
+            return None
         
-        return data
+        extension = file_extension(file_path)
+        dpi = DEFAULT_PDF_DPI
+        try:
+            if extension == '.pdf':
+                info = pdfinfo_from_path(file_path)
+                layer_texts = extract_text_layer(file_path, 1)
+                if layer_texts and has_usable_text(layer_texts[0]):
+                    return None
+                if self.preprocessor:
+                    dpi = self.preprocessor.pdf_dpi(info.get('Page size'))
+            elif extension not in ['.jpg', '.jpeg', '.png', '.gif']:
+                return None
+            return engine_pool.run(_read_form_file, file_path, document_type, dpi, self.preprocessor, preview_key)
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            print(f"Error reading form template: {e}")
+            return None
+    
+    def extract_text_from_document(self, file_path: str) -> str:
+        """Extract text from a document (PDF or image)."""
+        return "\n".join(page['text'] for page in self.extract_document_pages(file_path)).strip()
+    
+    def extract_w2_data(self, text: str) -> Dict:
+        """Extract structured data from W-2 form text."""
+        return extract_fields('w-2', text)
     
     def extract_1099_data(self, text: str) -> Dict:
         """Extract structured data from 1099 form text."""
-        data = {}
-        
-        # Common 1099 patterns
-        patterns = {
-            'payer_name': r'(?:payer|company)[:\s]*([A-Za-z\s&,.-]+?)(?:\n|$)',
-            'recipient_name': r'(?:recipient|payee)[:\s]*([A-Za-z\s,.-]+?)(?:\n|$)',
-            'nonemployee_compensation': r'(?:nonemployee.*compensation|box\s*1)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'federal_tax': r'(?:federal.*tax|box\s*4)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'payer_tin': r'(?:payer.*tin|ein)[:\s]*([0-9-]+)',
-            'recipient_tin': r'(?:recipient.*tin|ssn)[:\s]*([0-9-]+)'
-        }
-        
-        for field, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                data[field] = match.group(1).strip()
-        
-        return data
+        return extract_fields('1099', text)
     
     def extract_receipt_data(self, text: str) -> Dict:
         """Extract structured data from receipt text."""
-        data = {}
-        
-        # Receipt patterns
-        patterns = {
-            'merchant_name': r'^([A-Za-z\s&,.-]+?)(?:\n|$)',
-            'total_amount': r'(?:total|amount)[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            'date': r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            'tax_amount': r'(?:tax)[:\s]*\$?([0-9,]+\.?[0-9]*)'
-        }
-        
-        for field, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                data[field] = match.group(1).strip()
-        
-        return data
+        return extract_fields('receipt', text)
     
     def process_tax_document(self, file_path: str, document_type: str) -> Dict:
-        """Process a tax document and extract relevant data."""
+        """Process a tax document and extract relevant data.
+
+        Raises the errors ``is_retryable`` accepts (an unreadable file, a
+        hung or crashed engine) rather than returning a partial result.
+        """
+        # Identical uploads (same bytes, type and extractor) reuse the stored result
+        content_hash = file_sha256(file_path)
+        cache_key = ocr_cache.make_key(content_hash, document_type, EXTRACTOR_VERSION)
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Standard IRS layouts have their fields read box by box; the
+        # document is still OCR'd in full for the raw text search reads.
+        # The first page rasterized for OCR doubles as the document's preview when it is in color
+        form = self.read_form_template(file_path, document_type, content_hash) if self.use_templates else None
+        
         # Extract text from document
-        text = self.extract_text_from_document(file_path)
+        pages = self.extract_document_pages(file_path, None if form else content_hash)
+        text, word_spans = _join_pages(pages)
+        
+        if form and not self.validate_extracted_data(form['fields'], document_type):
+            # Page 1 names the template its fields came from (see reextract)
+            summaries = _page_summaries(pages) or [
+                {'page': 1, 'source': 'template', 'confidence': _mean_field_confidence(form['confidence'])}
+            ]
+            summaries[0]['template'] = form['template']
+            result = {
+                'raw_text': text,
+                'extracted_data': form['fields'],
+                'field_confidence': form['confidence'],
+                'pages': summaries
+            }
+            ocr_cache.set(cache_key, result)
+            return result
         
         if not text:
-            return {'raw_text': '', 'extracted_data': {}}
+            return {'raw_text': '', 'extracted_data': {}, 'field_confidence': {}, 'pages': _page_summaries(pages)}
         
         # Extract structured data based on document type
-        extracted_data = {}
+        value_spans = {}
+        extracted_data = extract_fields(document_type, text, value_spans)
+        field_confidence = _field_confidence(value_spans, word_spans)
+        if form:
+            extracted_data.update(form['fields'])
+            field_confidence.update(form['confidence'])
         
-        if document_type.lower() == 'w-2':
-            extracted_data = self.extract_w2_data(text)
-        elif document_type.lower() == '1099':
-            extracted_data = self.extract_1099_data(text)
-        elif document_type.lower() == 'receipt':
-            extracted_data = self.extract_receipt_data(text)
+        # Only hard scans pay for a second pass: W-2/1099 fields the first
+        # pass missed are looked for again in re-OCR'd low confidence pages
+        missing = [field for field in field_names(document_type) if field not in extracted_data]
+        if missing and document_type.lower() in REOCR_DOCUMENT_TYPES:
+            retried = self.reocr_low_confidence_pages(file_path, pages)
+            if retried is not None:
+                pages = retried
+                text, word_spans = _join_pages(pages)
+                value_spans = {}
+                second_pass = extract_fields(document_type, text, value_spans)
+                second_confidence = _field_confidence(value_spans, word_spans)
+                for field in missing:
+                    if field in second_pass:
+                        extracted_data[field] = second_pass[field]
+                        field_confidence[field] = second_confidence[field]
         
-        return {
+        result = {
             'raw_text': text,
-            'extracted_data': extracted_data
+            'extracted_data': extracted_data,
+            'field_confidence': field_confidence,
+            'pages': _page_summaries(pages)
         }
+        
+        ocr_cache.set(cache_key, result)
+        
+        return result
+    
+    def _sharper_preprocessor(self, dpi: int) -> Optional[ImagePreprocessor]:
+        # Same clean-up, but keep pages at the second pass resolution instead of downscaling them
+        if self.preprocessor is None:
+            return None
+        preprocessor = copy.copy(self.preprocessor)
+        preprocessor.target_dpi = dpi
+        return preprocessor
     
     def validate_extracted_data(self, data: Dict, document_type: str) -> List[str]:
         """Validate extracted data and return list of issues."""
@@ -4,6 +4,14 @@ from datetime import datetime, timedelta
 from typing import Dict, Optional
 from src.models.user import Payment, Subscription, db
 
+def active_subscription(user_id: int) -> Optional[Subscription]:
+    """The user's current subscription, or None on the free tier."""
+    return Subscription.query.filter(
+        Subscription.user_id == user_id,
+        Subscription.status == 'active',
+        Subscription.end_date > datetime.utcnow()
+    ).order_by(Subscription.end_date.desc()).first()
+
 class PaymentService:
     """Service for handling payment processing with Stripe."""
     
@@ -0,0 +1,275 @@
+import hashlib
+import io
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from flask import send_file
+from PIL import Image, ImageOps
+from pdf2image import convert_from_path
+from src.services.document_store import DOCUMENT_STORE_ROOT, document_store, file_extension
+
+# Longest edge in pixels of each preview size. 'small' is what listings
+# show; at JPEG quality 70 it is 3-6 KB for a typical W-2 or receipt.
+PREVIEW_SIZES = {
+    'small': 160,
+    'medium': 480
+}
+DEFAULT_PREVIEW_SIZE = 'small'
+PREVIEW_QUALITY = int(os.getenv('PREVIEW_QUALITY', '70'))
+
+PREVIEW_CACHE_ROOT = os.getenv('PREVIEW_CACHE_ROOT', os.path.join(DOCUMENT_STORE_ROOT, 'previews'))
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv('PREVIEW_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+# Eviction removes the least recently used previews down to this share of the limit
+PREVIEW_CACHE_TRIM_RATIO = 0.9
+
+PREVIEW_WORKERS = int(os.getenv('PREVIEW_WORKERS', '1'))
+
+# Previews never change for the same content hash
+PREVIEW_MAX_AGE = int(os.getenv('PREVIEW_MAX_AGE', '86400'))
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif']
+
+def render_first_page(file_path: str) -> Optional[Image.Image]:
+    """First page of a PDF or image file, rendered no larger than the biggest preview."""
+    largest = max(PREVIEW_SIZES.values())
+    extension = file_extension(file_path)
+    if extension == '.pdf':
+        pages = convert_from_path(file_path, size=largest, first_page=1, last_page=1)
+        return pages[0] if pages else None
+    if extension in IMAGE_EXTENSIONS:
+        image = Image.open(file_path)
+        if image.format == 'JPEG':
+            # Decode at 1/2, 1/4 or 1/8 scale instead of full size
+            image.draft('RGB', (largest, largest))
+        return ImageOps.exif_transpose(image)
+    return None
+
+def make_previews(image: Image.Image) -> Dict[str, bytes]:
+    """Encode every preview size of a page, shrinking from the largest down."""
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    previews = {}
+    for size, edge in sorted(PREVIEW_SIZES.items(), key=lambda item: item[1], reverse=True):
+        image = ImageOps.contain(image, (edge, edge), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=PREVIEW_QUALITY, optimize=True)
+        previews[size] = buffer.getvalue()
+    return previews
+
+class PreviewService:
+    """Service for small first-page previews of stored documents and receipts.
+
+    Previews are JPEG files in a bounded on-disk cache, keyed by the content
+    hash of the file they show, so duplicate uploads share them (see ``key``
+    for files from before the content store). Reading a preview refreshes
+    its modification time, and when the cache grows past ``max_bytes`` the
+    least recently used files are deleted; a missing preview is simply
+    rendered again. The cache holds no state outside the
+    filesystem, so OCR workers in other processes can fill it too: they
+    save the first page they rasterize for OCR, and only documents OCR never
+    rasterized are rendered here.
+    """
+
+    def __init__(self, root: str = PREVIEW_CACHE_ROOT, max_bytes: int = PREVIEW_CACHE_MAX_BYTES,
+                 workers: int = PREVIEW_WORKERS):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._bytes = None  # cache size as last scanned, plus what this process wrote since
+        self._pending = set()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    def path(self, key: str, size: str) -> str:
+        return os.path.join(self.root, key[:2], f'{key}-{size}.jpg')
+
+    def key(self, file_path: str, content_hash: Optional[str] = None) -> Optional[str]:
+        """Cache key of a stored file; files saved before the content store are keyed by path, mtime and size."""
+        if content_hash:
+            return content_hash
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            print(f"Error reading file for preview: {e}")
+            return None
+        # A stat per request instead of hashing the whole file; the key changes if the file does
+        return hashlib.sha256(f'{os.path.abspath(file_path)}:{stat.st_mtime_ns}:{stat.st_size}'.encode()).hexdigest()
+
+    def has(self, key: str) -> bool:
+        return all(os.path.exists(self.path(key, size)) for size in PREVIEW_SIZES)
+
+    def get(self, key: str, size: str) -> Optional[bytes]:
+        """Cached preview bytes, or None. Marks the preview as recently used."""
+        path = self.path(key, size)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def get_or_create(self, key: str, file_path: str, size: str) -> Optional[bytes]:
+        """Cached preview bytes, rendering the file first on a miss."""
+        data = self.get(key, size)
+        if data is None and self.generate(key, file_path, force=True):
+            data = self.get(key, size)
+        return data
+
+    def save_page(self, key: str, image: Image.Image) -> bool:
+        """Store the previews of an already rasterized first page, unless cached.
+
+        Errors are printed and swallowed; callers such as OCR must not fail
+        because a preview could not be written.
+        """
+        if self.has(key):
+            return True
+        try:
+            self._write(key, make_previews(image))
+            return True
+        except Exception as e:
+            print(f"Error saving preview: {e}")
+            return False
+
+    def generate(self, key: str, file_path: str, force: bool = False) -> bool:
+        """Render and store the previews of a file unless they are already cached."""
+        if not force and self.has(key):
+            return True
+        try:
+            image = render_first_page(document_store.local_path(file_path))
+            if image is None:
+                return False
+            with image:
+                self._write(key, make_previews(image))
+            return True
+        except Exception as e:
+            print(f"Error generating preview: {e}")
+            return False
+
+    def submit(self, key: Optional[str], file_path: str):
+        """Generate a file's previews in the background; repeated submits are dropped."""
+        if not key:
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='preview-worker')
+            self._executor.submit(self._run, key, file_path)
+
+    def discard(self, key: Optional[str]):
+        """Delete a file's previews, e.g. once the file itself is deleted."""
+        if not key:
+            return
+        for size in PREVIEW_SIZES:
+            try:
+                os.remove(self.path(key, size))
+            except FileNotFoundError:
+                pass
+
+    def trim(self) -> int:
+        """Delete the least recently used previews past the size limit. Returns the bytes kept."""
+        entries = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = int(self.max_bytes * PREVIEW_CACHE_TRIM_RATIO)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+        with self._lock:
+            self._bytes = total
+        return total
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'generated': self.generated,
+                'bytes': self._bytes,
+                'capacity_bytes': self.max_bytes
+            }
+
+    def _run(self, key: str, file_path: str):
+        try:
+            self.generate(key, file_path)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _write(self, key: str, previews: Dict[str, bytes]):
+        written = 0
+        for size, data in previews.items():
+            path = self.path(key, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so a reader never sees half a preview
+            temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            written += len(data)
+
+        with self._lock:
+            self.generated += 1
+            scanned = self._bytes is not None
+            if scanned:
+                self._bytes += written
+            over_limit = not scanned or self._bytes > self.max_bytes
+        if over_limit:
+            self.trim()
+
+def send_preview(file_path: str, content_hash: Optional[str], size: str):
+    """Response with a file's preview, rendering it on a cache miss. None if it cannot be made.
+
+    The bytes are read up front, which for a few kilobytes is cheaper than
+    streaming and cannot race with eviction deleting the file.
+    """
+    key = preview_service.key(file_path, content_hash)
+    data = preview_service.get_or_create(key, file_path, size) if key else None
+    if data is None:
+        return None
+    response = send_file(
+        io.BytesIO(data),
+        mimetype='image/jpeg',
+        conditional=True,
+        etag=f'{key}-{size}',
+        max_age=PREVIEW_MAX_AGE
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+preview_service = PreviewService()
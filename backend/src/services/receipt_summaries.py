@@ -0,0 +1,192 @@
+"""Per-month, per-category receipt totals, maintained as receipts change.
+
+``receipt_summaries`` holds one row per (user, year, month, category) with
+the count and total amount of those receipts. Every flush that inserts,
+deletes or edits receipts adds its differences to the affected rows in the
+same transaction, so the rollup commits or rolls back with the receipts
+themselves, and a year of spending is read from at most 12 rows per
+category however many receipts are behind them.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import delete, event, extract, func, inspect, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from src.models.user import Receipt, ReceiptSummary, db
+from src.pagination import ListArgsError
+
+UNCATEGORIZED = 'uncategorized'
+
+# Receipt attributes that decide which summary row a receipt counts in, or by how much
+SUMMARY_ATTRIBUTES = ('user_id', 'date', 'category', 'amount')
+
+def _key(user_id: int, day, category: Optional[str]) -> Tuple:
+    return user_id, day.year, day.month, category or UNCATEGORIZED
+
+def _amount(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+def _previous_values(receipt: Receipt) -> Optional[Dict]:
+    """A modified receipt's values as last flushed, or None if one was never loaded."""
+    state = inspect(receipt)
+    values = {}
+    for name in SUMMARY_ATTRIBUTES:
+        history = state.attrs[name].history
+        previous = history.deleted or history.unchanged
+        if not previous:
+            return None
+        values[name] = previous[0]
+    return values
+
+def _changes(session) -> Tuple[Dict[Tuple, List], Set[int]]:
+    """Count and amount differences per summary key from this flush, and users to recompute."""
+    changes = defaultdict(lambda: [0, Decimal('0.00')])
+    rebuild = set()
+
+    def add(values, sign):
+        change = changes[_key(values['user_id'], values['date'], values['category'])]
+        change[0] += sign
+        change[1] += sign * _amount(values['amount'])
+
+    def current(receipt):
+        return {name: getattr(receipt, name) for name in SUMMARY_ATTRIBUTES}
+
+    for receipt in session.new:
+        if isinstance(receipt, Receipt):
+            add(current(receipt), 1)
+    for receipt in session.deleted:
+        if isinstance(receipt, Receipt):
+            previous = _previous_values(receipt)
+            if previous is None:
+                rebuild.add(receipt.user_id)
+            else:
+                add(previous, -1)
+    for receipt in session.dirty:
+        if not isinstance(receipt, Receipt) or not session.is_modified(receipt):
+            continue
+        previous = _previous_values(receipt)
+        if previous is None:
+            # The old values were expired before the change; recount this user's receipts
+            rebuild.add(receipt.user_id)
+            continue
+        add(previous, -1)
+        add(current(receipt), 1)
+    return {key: change for key, change in changes.items() if change[0] or change[1]}, rebuild
+
+def apply_changes(connection: Connection, changes: Dict[Tuple, List]):
+    """Add count and amount differences to the summary rows, creating and removing rows as needed."""
+    if not changes:
+        return
+    table = ReceiptSummary.__table__
+    now = datetime.utcnow()
+    insert = postgresql_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+    statement = insert(table).values([
+        {'user_id': user_id, 'year': year, 'month': month, 'category': category,
+         'receipt_count': count, 'total_amount': amount, 'updated_at': now}
+        for (user_id, year, month, category), (count, amount) in changes.items()
+    ])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.year, table.c.month, table.c.category],
+        set_={
+            'receipt_count': table.c.receipt_count + statement.excluded.receipt_count,
+            'total_amount': table.c.total_amount + statement.excluded.total_amount,
+            'updated_at': statement.excluded.updated_at
+        }
+    ))
+    connection.execute(delete(table).where(
+        tuple_(table.c.user_id, table.c.year, table.c.month, table.c.category).in_(list(changes)),
+        table.c.receipt_count <= 0
+    ))
+
+def rebuild_summaries(connection: Connection, user_ids: Optional[List[int]] = None) -> int:
+    """Recompute the summary rows of ``user_ids`` (default: everyone) from the receipts. Returns rows written."""
+    table = ReceiptSummary.__table__
+    receipts = Receipt.__table__
+    clear = delete(table)
+    source = select(
+        receipts.c.user_id,
+        extract('year', receipts.c.date),
+        extract('month', receipts.c.date),
+        func.coalesce(receipts.c.category, UNCATEGORIZED),
+        func.count(),
+        func.sum(receipts.c.amount),
+        literal(datetime.utcnow())
+    )
+    if user_ids is not None:
+        clear = clear.where(table.c.user_id.in_(user_ids))
+        source = source.where(receipts.c.user_id.in_(user_ids))
+    source = source.group_by(
+        receipts.c.user_id,
+        extract('year', receipts.c.date),
+        extract('month', receipts.c.date),
+        func.coalesce(receipts.c.category, UNCATEGORIZED)
+    )
+    connection.execute(clear)
+    result = connection.execute(table.insert().from_select(
+        ['user_id', 'year', 'month', 'category', 'receipt_count', 'total_amount', 'updated_at'], source
+    ))
+    return result.rowcount
+
+@event.listens_for(db.session, 'after_flush')
+def _update_summaries(session, flush_context):
+    changes, rebuild = _changes(session)
+    for key in list(changes):
+        if key[0] in rebuild:
+            del changes[key]
+    connection = session.connection()
+    apply_changes(connection, changes)
+    if rebuild:
+        rebuild_summaries(connection, sorted(rebuild))
+
+def summary_period(year: Optional[str], through_month: Optional[str], today: Optional[date] = None) -> Tuple[int, int]:
+    """(year, through_month) from ?year and ?through_month: this year to date unless given."""
+    today = today or datetime.utcnow().date()
+    try:
+        year = int(year) if year else today.year
+        if through_month:
+            through_month = int(through_month)
+        else:
+            through_month = today.month if year == today.year else 12
+    except ValueError:
+        raise ListArgsError('year and through_month must be numbers')
+    if not 1 <= through_month <= 12:
+        raise ListArgsError('through_month must be between 1 and 12')
+    return year, through_month
+
+def spending_summary(user_id: int, year: int, through_month: int = 12) -> Dict:
+    """Receipt totals of one year up to and including ``through_month``, by category and by month."""
+    rows = ReceiptSummary.query.filter(
+        ReceiptSummary.user_id == user_id,
+        ReceiptSummary.year == year,
+        ReceiptSummary.month <= through_month
+    ).order_by(ReceiptSummary.month, ReceiptSummary.category).all()
+
+    by_category = {}
+    months = {}
+    total = Decimal('0.00')
+    count = 0
+    for row in rows:
+        amount = row.total_amount or Decimal('0.00')
+        total += amount
+        count += row.receipt_count
+        category = by_category.setdefault(row.category, {'count': 0, 'amount': Decimal('0.00')})
+        category['count'] += row.receipt_count
+        category['amount'] += amount
+        month = months.setdefault(row.month, {'month': row.month, 'count': 0, 'amount': Decimal('0.00'), 'by_category': {}})
+        month['count'] += row.receipt_count
+        month['amount'] += amount
+        month['by_category'][row.category] = {'count': row.receipt_count, 'amount': float(amount)}
+
+    for summary in list(by_category.values()) + list(months.values()):
+        summary['amount'] = float(summary['amount'])
+    return {
+        'year': year,
+        'through_month': through_month,
+        'count': count,
+        'amount': float(total),
+        'by_category': by_category,
+        'by_month': list(months.values())
+    }
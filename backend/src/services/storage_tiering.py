@@ -0,0 +1,139 @@
+import os
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import and_, exists, func, or_
+from src.models.user import Blob, Receipt, TaxDocument, db
+from src.services.compression import default_codec
+from src.services.document_store import document_store
+
+TIERING_CHUNK_SIZE = 200
+
+# Thawed (decompressed) copies of cold blobs unused this long are deleted
+THAWED_TTL_HOURS = int(os.getenv('COLD_STORAGE_THAWED_TTL_HOURS', '24'))
+
+# Returns filed by this date still see corrections and CPA review, so the
+# season that started in January is current until then
+FILING_DEADLINE = (4, 15)
+
+def filing_season_start(today: Optional[date] = None) -> datetime:
+    """Start of the current filing season.
+
+    A season opens on January 1 for the previous tax year. Until the April
+    deadline the previous season's documents are still in use, so the
+    cutoff only moves to this January 1 after it.
+    """
+    today = today or datetime.utcnow().date()
+    year = today.year if (today.month, today.day) > FILING_DEADLINE else today.year - 1
+    return datetime(year, 1, 1)
+
+def _recently_used(before: datetime):
+    """Blobs referenced by a document or receipt uploaded on or after ``before``."""
+    return or_(
+        exists().where(and_(TaxDocument.content_hash == Blob.sha256, TaxDocument.uploaded_at >= before)),
+        exists().where(and_(Receipt.content_hash == Blob.sha256, Receipt.uploaded_at >= before))
+    )
+
+def _chunk(criteria, after: str, chunk_size: int) -> List[Blob]:
+    return Blob.query.filter(Blob.sha256 > after, *criteria).order_by(Blob.sha256).limit(chunk_size).all()
+
+def tier_storage(before: Optional[datetime] = None, codec: Optional[str] = None,
+                 chunk_size: int = TIERING_CHUNK_SIZE, dry_run: bool = False,
+                 progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """Move blobs only used by records older than ``before`` to the cold tier, and back.
+
+    ``before`` defaults to the start of the current filing season. A blob
+    goes cold when every document and receipt using it was uploaded
+    before then; a cold blob that a newer upload shares again is restored.
+    Each chunk of blobs is written to its new tier first, then the rows
+    are updated and committed, and only then are the old copies deleted,
+    so every record can be read at every point of a run.
+    """
+    before = before or filing_season_start()
+    codec = default_codec(codec)
+    stats = {'frozen': 0, 'thawed': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0, 'thawed_trimmed': 0}
+
+    # Hot -> cold
+    after = ''
+    while True:
+        blobs = _chunk([Blob.tier == 'hot', Blob.refcount > 0, ~_recently_used(before)], after, chunk_size)
+        if not blobs:
+            break
+        after = blobs[-1].sha256
+
+        frozen = []
+        for blob in blobs:
+            if dry_run:
+                stats['frozen'] += 1
+                stats['bytes_before'] += blob.size
+                continue
+            try:
+                blob.codec, blob.stored_size = document_store.freeze(blob.sha256, codec)
+            except OSError as e:
+                print(f"Error moving blob {blob.sha256} to cold storage: {e}")
+                stats['failed'] += 1
+                continue
+            blob.tier = 'cold'
+            blob.tiered_at = datetime.utcnow()
+            frozen.append(blob.sha256)
+            stats['frozen'] += 1
+            stats['bytes_before'] += blob.size
+            stats['bytes_after'] += blob.stored_size
+
+        db.session.commit()
+        for sha256 in frozen:
+            document_store.drop_hot(sha256)
+        if progress:
+            progress(f"Cold storage through {after[:12]}: {stats}")
+
+    # Cold -> hot, for blobs a recent upload uses again
+    after = ''
+    while True:
+        blobs = _chunk([Blob.tier == 'cold', _recently_used(before)], after, chunk_size)
+        if not blobs:
+            break
+        after = blobs[-1].sha256
+
+        thawed = []
+        for blob in blobs:
+            if dry_run:
+                stats['thawed'] += 1
+                continue
+            try:
+                document_store.unfreeze(blob.sha256)
+            except OSError as e:
+                print(f"Error restoring blob {blob.sha256} from cold storage: {e}")
+                stats['failed'] += 1
+                continue
+            blob.tier = 'hot'
+            blob.codec = None
+            blob.stored_size = None
+            blob.tiered_at = datetime.utcnow()
+            thawed.append(blob.sha256)
+            stats['thawed'] += 1
+
+        db.session.commit()
+        for sha256 in thawed:
+            document_store.drop_cold(sha256)
+
+    if not dry_run:
+        stats['thawed_trimmed'] = document_store.trim_thawed(THAWED_TTL_HOURS * 3600)
+    return stats
+
+def storage_stats() -> Dict:
+    """Blob counts and bytes per tier, bytes saved by compression, and this process's cold read latency."""
+    tiers = {}
+    rows = db.session.query(
+        Blob.tier,
+        func.count(Blob.sha256),
+        func.coalesce(func.sum(Blob.size), 0),
+        func.coalesce(func.sum(func.coalesce(Blob.stored_size, Blob.size)), 0)
+    ).group_by(Blob.tier)
+    for tier, count, size, stored_size in rows:
+        tiers[tier] = {'blobs': count, 'bytes': int(size), 'stored_bytes': int(stored_size)}
+
+    cold = tiers.get('cold', {'bytes': 0, 'stored_bytes': 0})
+    return {
+        'tiers': tiers,
+        'bytes_saved': cold['bytes'] - cold['stored_bytes'],
+        'reads': document_store.stats()
+    }
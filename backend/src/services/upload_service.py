@@ -0,0 +1,293 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Optional
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.utils import secure_filename
+from src.models.user import Receipt, TaxDocument, UploadSession, db
+from src.services.document_store import document_store
+from src.services.ocr_queue import ocr_queue
+from src.services.payment_service import active_subscription
+from src.services.preview_service import preview_service
+
+try:
+    import fcntl
+except ImportError:  # Windows: no gunicorn there either, so one process and the thread lock is enough
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Largest single upload per subscription plan; users without an active
+# subscription get the 'free' limit
+UPLOAD_SIZE_LIMITS = {
+    'free': int(os.getenv('UPLOAD_LIMIT_FREE_MB', '25')) * MB,
+    'basic': int(os.getenv('UPLOAD_LIMIT_BASIC_MB', '50')) * MB,
+    'premium': int(os.getenv('UPLOAD_LIMIT_PREMIUM_MB', '200')) * MB,
+    'professional': int(os.getenv('UPLOAD_LIMIT_PROFESSIONAL_MB', '500')) * MB
+}
+
+# Bytes read from the request stream per write
+UPLOAD_READ_SIZE = 1 * MB
+
+# Unfinished sessions older than this are removed by purge_expired
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv('UPLOAD_SESSION_TTL_HOURS', '24'))
+
+class UploadService:
+    """Service for chunked, resumable uploads written straight to disk.
+
+    A session reserves a file in the document store's staging area at
+    initiate. Each chunk is streamed from the request into that file at the
+    session's current offset, and finalize renames it into the store under
+    its hash, so no upload is ever held in memory or copied. The SHA-256 is
+    updated as
+    bytes are written; the running hash lives in this process and is
+    rebuilt from the file if a chunk lands on another process or after a
+    restart.
+
+    Chunk writes, finalize and abort of a session hold an exclusive
+    ``flock`` on its staging file, so two requests for the same offset
+    are serialized even when they reach different worker processes; the
+    second then sees the first's offset and gets a 409.
+    """
+
+    def __init__(self):
+        self._hashers = {}  # session id -> (offset hashed so far, sha256 object, monotonic time last used)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def size_limit(self, user_id: int, plan: Optional[str] = None) -> int:
+        """Largest upload allowed for a plan; without one, for the user's active subscription."""
+        if plan is None:
+            subscription = active_subscription(user_id)
+            plan = subscription.plan_type if subscription else 'free'
+        return UPLOAD_SIZE_LIMITS.get(plan, UPLOAD_SIZE_LIMITS['free'])
+
+    def initiate(self, user_id: int, kind: str, filename: str, total_size: Optional[int] = None,
+                 options: Optional[Dict] = None, plan: Optional[str] = None) -> Dict:
+        """Open an upload session and reserve its file."""
+        limit = self.size_limit(user_id, plan)
+        if total_size is not None and total_size > limit:
+            return {'success': False, 'error': f'File exceeds the {limit // MB} MB limit of your plan', 'code': 413}
+
+        session_id = uuid.uuid4().hex
+        file_path = document_store.staging_path(f'upload-{session_id}')
+        open(file_path, 'xb').close()
+
+        session = UploadSession(
+            id=session_id,
+            user_id=user_id,
+            kind=kind,
+            filename=filename,
+            file_path=file_path,
+            options=options or {},
+            total_size=total_size,
+            received=0,
+            status='uploading'
+        )
+        db.session.add(session)
+        db.session.commit()
+        self._prune()
+        self._hashers[session.id] = (0, hashlib.sha256(), time.monotonic())
+        return {'success': True, 'session': session}
+
+    def append_chunk(self, session: UploadSession, offset: int, stream: BinaryIO,
+                     content_length: Optional[int] = None, plan: Optional[str] = None) -> Dict:
+        """Write a chunk read from ``stream`` at ``offset``, which must be the session's current offset.
+
+        Whatever arrives before a dropped connection is kept, and the
+        session's offset tells the client where to resume.
+        """
+        with self._locked(session):
+            db.session.refresh(session)
+            if session.status != 'uploading':
+                return {'success': False, 'error': f'Upload is {session.status}', 'code': 409}
+            if offset != session.received:
+                return {'success': False, 'error': 'Chunk offset does not match the upload',
+                        'offset': session.received, 'code': 409}
+
+            limit = self.size_limit(session.user_id, plan)
+            if session.total_size is not None:
+                limit = min(limit, session.total_size)
+            if content_length is not None and offset + content_length > limit:
+                return {'success': False, 'error': 'Chunk would exceed the upload size limit', 'code': 413}
+
+            hasher = self._hasher(session)
+            written = 0
+            error = None
+            try:
+                with open(session.file_path, 'r+b') as f:
+                    f.seek(offset)
+                    f.truncate()
+                    while True:
+                        data = stream.read(UPLOAD_READ_SIZE)
+                        if not data:
+                            break
+                        if offset + written + len(data) > limit:
+                            error = {'success': False, 'error': 'Chunk would exceed the upload size limit', 'code': 413}
+                            break
+                        f.write(data)
+                        hasher.update(data)
+                        written += len(data)
+            except (OSError, ClientDisconnected) as e:
+                # Keep what was written so the client can resume from there
+                logger.warning('Upload %s interrupted at offset %d: %s', session.id, offset + written, e)
+                error = {'success': False, 'error': 'Upload interrupted', 'code': 400}
+
+            session.received = offset + written
+            self._hashers[session.id] = (session.received, hasher, time.monotonic())
+            db.session.commit()
+
+        if error:
+            error['offset'] = session.received
+            return error
+        return {'success': True, 'session': session}
+
+    def finalize(self, session: UploadSession, sha256: Optional[str] = None) -> Dict:
+        """Check the finished file and create its TaxDocument or Receipt record.
+
+        Documents get an OCR job, submitted after the commit, which also
+        leaves their preview; receipt previews are queued directly.
+        """
+        with self._locked(session):
+            db.session.refresh(session)
+            if session.status != 'uploading':
+                # Finished or aborted through another process
+                self._forget(session.id)
+                return {'success': False, 'error': f'Upload is {session.status}', 'code': 409}
+            if session.received == 0:
+                return {'success': False, 'error': 'No data uploaded', 'code': 400}
+            if session.total_size is not None and session.received != session.total_size:
+                return {'success': False, 'error': 'Upload is incomplete', 'offset': session.received, 'code': 400}
+
+            digest = self._hasher(session).hexdigest()
+            if sha256 and sha256.lower() != digest:
+                return {'success': False, 'error': 'SHA-256 does not match the uploaded data', 'code': 422}
+
+            # Rename into the content store; a duplicate of an existing blob is dropped
+            document_store.save_file(session.file_path, digest, session.received)
+            session.file_path = document_store.path(digest)
+
+            options = session.options or {}
+            job = None
+            if session.kind == 'document':
+                record = TaxDocument(
+                    user_id=session.user_id,
+                    file_path=session.file_path,
+                    filename=secure_filename(session.filename),
+                    content_hash=digest,
+                    document_type=options.get('document_type', 'other'),
+                    extracted_data={}
+                )
+                db.session.add(record)
+                job = ocr_queue.enqueue(record, session.file_path)
+            else:
+                record = Receipt(
+                    user_id=session.user_id,
+                    file_path=session.file_path,
+                    filename=secure_filename(session.filename),
+                    content_hash=digest,
+                    category=options.get('category', 'general'),
+                    amount=options.get('amount', 0),
+                    date=datetime.strptime(options['date'], '%Y-%m-%d').date() if options.get('date') else datetime.utcnow().date()
+                )
+                db.session.add(record)
+
+            session.sha256 = digest
+            session.status = 'completed'
+            db.session.commit()
+            self._forget(session.id)
+
+        if job is not None:
+            ocr_queue.submit(job.id)
+        else:
+            preview_service.submit(record.content_hash, record.file_path)
+        return {'success': True, 'session': session, 'record': record, 'job': job}
+
+    def abort(self, session: UploadSession):
+        """Cancel an unfinished upload and delete its partial file."""
+        with self._locked(session):
+            db.session.refresh(session)
+            if session.status == 'uploading':
+                if os.path.exists(session.file_path):
+                    os.remove(session.file_path)
+                session.status = 'aborted'
+                db.session.commit()
+            self._forget(session.id)
+
+    def purge_expired(self, max_age_hours: int = UPLOAD_SESSION_TTL_HOURS) -> int:
+        """Abort unfinished uploads not touched for ``max_age_hours``."""
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        sessions = UploadSession.query.filter(
+            UploadSession.status == 'uploading',
+            UploadSession.updated_at < cutoff
+        ).all()
+        for session in sessions:
+            self.abort(session)
+        self._prune(max_age_hours)
+        return len(sessions)
+
+    def _hasher(self, session: UploadSession):
+        offset, hasher, _ = self._hashers.get(session.id, (None, None, None))
+        if offset == session.received:
+            return hasher
+
+        # Not hashed in this process; rebuild from the bytes already on disk
+        hasher = hashlib.sha256()
+        remaining = session.received
+        with open(session.file_path, 'rb') as f:
+            while remaining > 0:
+                data = f.read(min(UPLOAD_READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+        self._hashers[session.id] = (session.received, hasher, time.monotonic())
+        return hasher
+
+    def _prune(self, max_age_hours: int = UPLOAD_SESSION_TTL_HOURS):
+        """Forget sessions this process has not touched for ``max_age_hours``.
+
+        purge_expired usually runs in another process (``flask purge-uploads``),
+        and an upload can be finished or aborted through another worker, so
+        neither reaches this process's ``_forget``. A session that resumes
+        after all has its hash rebuilt from disk by ``_hasher``.
+        """
+        cutoff = time.monotonic() - max_age_hours * 3600
+        for session_id, (_, _, used) in list(self._hashers.items()):
+            if used < cutoff:
+                self._forget(session_id)
+
+    def _forget(self, session_id: str):
+        self._hashers.pop(session_id, None)
+        with self._lock:
+            self._locks.pop(session_id, None)
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    @contextmanager
+    def _locked(self, session: UploadSession):
+        """Hold the session's lock in this process and the flock on its staging file across processes."""
+        with self._session_lock(session.id):
+            if fcntl is None:
+                yield
+                return
+            try:
+                f = open(session.file_path, 'rb')
+            except FileNotFoundError:
+                # Finalized or aborted by another process; the refreshed status says so
+                yield
+                return
+            with f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+upload_service = UploadService()
@@ -0,0 +1,35 @@
+"""Shared fixtures: the app on a throwaway SQLite database and file store.
+
+The environment is set before ``src.main`` is imported, because the
+database URL and storage roots are read at import time.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+WORK_DIR = tempfile.mkdtemp(prefix='tax-portal-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'app.db')
+os.environ['DOCUMENT_STORE_ROOT'] = os.path.join(WORK_DIR, 'storage')
+os.environ['OCR_CACHE_PATH'] = os.path.join(WORK_DIR, 'ocr_cache.db')
+# Tests migrate themselves and never start OCR workers
+os.environ['BACKGROUND_WORK'] = '0'
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app
+    from src.migrations import migrate
+    from src.models.user import db
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        migrate(db.engine)
+    yield app
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
@@ -0,0 +1,50 @@
+"""Migrations build the schema the models declare, and running them again changes nothing."""
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from src.migrations import migrate, migration_status
+from src.models.user import db
+
+def schema(engine):
+    """Columns, keys and indexes of every table, in comparable form."""
+    inspector = inspect(engine)
+    tables = {}
+    for table in inspector.get_table_names():
+        # Search indexes and the version table exist only in migrated databases
+        if '_fts' in table or table == 'schema_migrations':
+            continue
+        tables[table] = {
+            'columns': sorted((column['name'], str(column['type']), column['nullable'])
+                              for column in inspector.get_columns(table)),
+            'primary_key': sorted(inspector.get_pk_constraint(table)['constrained_columns']),
+            'foreign_keys': sorted((tuple(fk['constrained_columns']), fk['referred_table'],
+                                    tuple(fk['referred_columns'])) for fk in inspector.get_foreign_keys(table)),
+            'indexes': sorted((index['name'], tuple(index['column_names']), bool(index['unique']))
+                              for index in inspector.get_indexes(table)),
+            'unique': sorted(tuple(constraint['column_names'])
+                             for constraint in inspector.get_unique_constraints(table)),
+        }
+    return tables
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    yield engine
+    engine.dispose()
+
+def test_fresh_migrate_matches_the_models(app, engine, tmp_path):
+    migrate(engine)
+
+    models = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    db.metadata.create_all(models)
+    try:
+        assert schema(engine) == schema(models)
+    finally:
+        models.dispose()
+
+def test_migrate_twice_applies_nothing(app, engine):
+    assert migrate(engine)
+    before = schema(engine)
+    assert migrate(engine) == []
+    assert schema(engine) == before
+    assert all(status['applied_at'] for status in migration_status(engine))
@@ -0,0 +1,253 @@
+"""Every /api route, called through the test client, must not scan a whole table.
+
+Each call records the SQL it runs; every statement is then planned with
+EXPLAIN QUERY PLAN and its own parameters. ``check-query-plans`` covers a
+hand-written copy of the route queries; this covers the queries the
+routes actually send.
+"""
+import io
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import pytest
+from PIL import Image
+from sqlalchemy import event
+
+from src.migrations.query_plans import check_query_plans, table_scans
+from src.models.user import Payment, Subscription, db
+
+# (method, rule) -> why it is not called here
+EXEMPT = {
+    ('POST', '/api/users'): 'scaffold that sets a username the User model does not have',
+    ('PUT', '/api/users/<int:user_id>'): 'scaffold that sets a username the User model does not have',
+    ('POST', '/api/payment/intent'): 'calls Stripe',
+    ('POST', '/api/payment/confirm'): 'calls Stripe',
+    ('POST', '/api/payment/service'): 'calls Stripe',
+    ('POST', '/api/subscription'): 'calls Stripe',
+    ('GET', '/api/ocr/engine/health'): 'no SQL; starts the OCR engine pool',
+    ('GET', '/api/ocr/cache/stats'): 'no SQL; reads the OCR cache file',
+}
+
+# (method, rule) -> why reading a whole table is intended
+ALLOWED_SCANS = {
+    ('GET', '/api/storage/stats'): 'totals over every blob, for admins',
+}
+
+# Statements that cannot scan, or that are not queries
+UNPLANNED = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+@dataclass
+class Call:
+    method: str
+    rule: str
+    who: str
+    url: str
+    status: int = 200
+    # Request keyword arguments (json=, data=, ...), built from the seeded ids
+    kwargs: Optional[Callable[[Dict], Dict]] = None
+    statements: List = field(default_factory=list)
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def png_file(name: str):
+    return (io.BytesIO(png_bytes()), name)
+
+CALLS = [
+    Call('POST', '/api/auth/register', None, '/api/auth/register', 201,
+         kwargs=lambda ids: {'json': {'email': 'new@example.com', 'password': 'pw', 'user_type': 'business'}}),
+    Call('POST', '/api/auth/login', None, '/api/auth/login',
+         kwargs=lambda ids: {'json': {'email': 'owner@example.com', 'password': 'pw'}}),
+    Call('GET', '/api/auth/me', 'owner', '/api/auth/me'),
+    Call('PUT', '/api/auth/me', 'owner', '/api/auth/me',
+         kwargs=lambda ids: {'json': {'profile': {'first_name': 'Ann'}}}),
+    Call('GET', '/api/users', None, '/api/users?user_type=individual'),
+    Call('GET', '/api/users/<int:user_id>', None, '/api/users/{owner}'),
+    Call('GET', '/api/dashboard', 'owner', '/api/dashboard'),
+
+    Call('GET', '/api/documents', 'owner', '/api/documents?document_type=w2&date_from=2020-01-01'),
+    Call('POST', '/api/documents', 'owner', '/api/documents', 202,
+         kwargs=lambda ids: {'data': {'file': png_file('w2.png'), 'document_type': 'w2'}}),
+    Call('POST', '/api/documents/batch', 'owner', '/api/documents/batch', 202,
+         kwargs=lambda ids: {'data': {'files': [png_file('a.png'), png_file('b.png')], 'kind': 'document'}}),
+    Call('GET', '/api/documents/<int:document_id>', 'owner', '/api/documents/{document}'),
+    Call('GET', '/api/documents/<int:document_id>/file', 'owner', '/api/documents/{document}/file'),
+    Call('GET', '/api/documents/<int:document_id>/preview', 'owner', '/api/documents/{document}/preview'),
+    Call('GET', '/api/documents/<int:document_id>/ocr', 'owner', '/api/documents/{document}/ocr'),
+    Call('GET', '/api/ocr/jobs/<int:job_id>', 'owner', '/api/ocr/jobs/{job}'),
+    Call('GET', '/api/documents/search', 'owner', '/api/documents/search?q=w2'),
+    Call('GET', '/api/storage/stats', 'admin', '/api/storage/stats'),
+
+    Call('GET', '/api/receipts', 'owner', '/api/receipts?category=meals'),
+    Call('POST', '/api/receipts', 'owner', '/api/receipts', 201,
+         kwargs=lambda ids: {'data': {'file': png_file('lunch.png'), 'category': 'meals',
+                                      'amount': '12.50', 'date': '2024-03-01'}}),
+    Call('GET', '/api/receipts/<int:receipt_id>/file', 'owner', '/api/receipts/{receipt}/file'),
+    Call('GET', '/api/receipts/<int:receipt_id>/preview', 'owner', '/api/receipts/{receipt}/preview'),
+    Call('GET', '/api/receipts/summary', 'owner', '/api/receipts/summary?year=2024'),
+
+    Call('POST', '/api/returns', 'owner', '/api/returns', 201, kwargs=lambda ids: {'json': {'year': 2023}}),
+    Call('GET', '/api/returns', 'owner', '/api/returns?status=draft'),
+    Call('GET', '/api/returns/<int:return_id>', 'owner', '/api/returns/{tax_return}'),
+    Call('PUT', '/api/returns/<int:return_id>', 'owner', '/api/returns/{tax_return}',
+         kwargs=lambda ids: {'json': {'return_data': {'wages': 1}}}),
+
+    Call('POST', '/api/cpa/clients', 'cpa', '/api/cpa/clients', 201,
+         kwargs=lambda ids: {'json': {'email': 'other@example.com'}}),
+    Call('GET', '/api/cpa/clients', 'cpa', '/api/cpa/clients?q=owner'),
+    Call('GET', '/api/cpa/clients/<int:client_id>/documents', 'cpa', '/api/cpa/clients/{owner}/documents'),
+    Call('GET', '/api/cpa/clients/<int:client_id>/receipts', 'cpa', '/api/cpa/clients/{owner}/receipts'),
+    Call('GET', '/api/cpa/clients/<int:client_id>/receipts/summary', 'cpa',
+         '/api/cpa/clients/{owner}/receipts/summary?year=2024'),
+    Call('GET', '/api/cpa/clients/<int:client_id>/returns', 'cpa', '/api/cpa/clients/{owner}/returns'),
+    Call('GET', '/api/cpa/documents/search', 'cpa', '/api/cpa/documents/search?q=w2'),
+    Call('PUT', '/api/cpa/returns/<int:return_id>/assign', 'cpa', '/api/cpa/returns/{tax_return}/assign'),
+    Call('PUT', '/api/cpa/returns/<int:return_id>/file', 'cpa', '/api/cpa/returns/{tax_return}/file'),
+
+    Call('GET', '/api/payment/plans', None, '/api/payment/plans'),
+    Call('GET', '/api/payment/services', None, '/api/payment/services'),
+    Call('GET', '/api/payments/history', 'owner', '/api/payments/history'),
+    Call('GET', '/api/subscription', 'owner', '/api/subscription'),
+    Call('GET', '/api/subscription/history', 'owner', '/api/subscription/history'),
+
+    Call('POST', '/api/uploads', 'owner', '/api/uploads', 201,
+         kwargs=lambda ids: {'json': {'filename': 'big.png', 'kind': 'document', 'size': len(png_bytes())}}),
+    Call('GET', '/api/uploads/<session_id>', 'owner', '/api/uploads/{upload}'),
+    Call('PUT', '/api/uploads/<session_id>', 'owner', '/api/uploads/{upload}?offset=0',
+         kwargs=lambda ids: {'data': png_bytes()}),
+    Call('POST', '/api/uploads/<session_id>/complete', 'owner', '/api/uploads/{upload}/complete', 202),
+
+    Call('DELETE', '/api/uploads/<session_id>', 'owner', '/api/uploads/{spare_upload}'),
+    Call('DELETE', '/api/subscription', 'owner', '/api/subscription'),
+    Call('DELETE', '/api/receipts/<int:receipt_id>', 'owner', '/api/receipts/{spare_receipt}'),
+    Call('DELETE', '/api/documents/<int:document_id>', 'owner', '/api/documents/{spare_document}'),
+    Call('DELETE', '/api/cpa/clients/<int:client_id>', 'cpa', '/api/cpa/clients/{other}'),
+    Call('DELETE', '/api/users/<int:user_id>', None, '/api/users/{loner}', 204),
+]
+
+def register(client, email, user_type):
+    response = client.post('/api/auth/register', json={'email': email, 'password': 'pw', 'user_type': user_type})
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    return body['user']['id'], {'Authorization': f"Bearer {body['token']}"}
+
+@pytest.fixture(scope='module')
+def seeded(app, client):
+    """Users, a CPA with a client, and a document, receipt, return and upload to act on."""
+    ids, headers = {}, {}
+    ids['owner'], headers['owner'] = register(client, 'owner@example.com', 'individual')
+    ids['cpa'], headers['cpa'] = register(client, 'cpa@example.com', 'cpa')
+    ids['other'], _ = register(client, 'other@example.com', 'business')
+    ids['loner'], _ = register(client, 'loner@example.com', 'individual')
+
+    register(client, 'admin@example.com', 'individual')
+    result = app.test_cli_runner().invoke(args=['grant-admin', 'admin@example.com'])
+    assert result.exit_code == 0, result.output
+    token = client.post('/api/auth/login', json={'email': 'admin@example.com', 'password': 'pw'}).get_json()['token']
+    headers['admin'] = {'Authorization': f'Bearer {token}'}
+
+    assert client.post('/api/cpa/clients', json={'email': 'owner@example.com'},
+                       headers=headers['cpa']).status_code == 201
+
+    def upload_document(name):
+        response = client.post('/api/documents', data={'file': png_file(name), 'document_type': 'w2'},
+                               headers=headers['owner'])
+        assert response.status_code == 202, response.get_json()
+        return response.get_json()
+
+    body = upload_document('seed.png')
+    ids['document'], ids['job'] = body['document']['id'], body['ocr_job']['id']
+    ids['spare_document'] = upload_document('spare.png')['document']['id']
+
+    def upload_receipt(name):
+        response = client.post('/api/receipts', data={'file': png_file(name), 'amount': '5', 'date': '2024-02-01'},
+                               headers=headers['owner'])
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['receipt']['id']
+
+    ids['receipt'] = upload_receipt('seed-receipt.png')
+    ids['spare_receipt'] = upload_receipt('spare-receipt.png')
+
+    response = client.post('/api/returns', json={'year': 2024}, headers=headers['owner'])
+    ids['tax_return'] = response.get_json()['id']
+
+    # Subscriptions and payments are created through Stripe
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.add(Subscription(user_id=ids['owner'], plan_type='basic', start_date=now,
+                                    end_date=now + timedelta(days=30), status='active'))
+        db.session.add(Payment(user_id=ids['owner'], amount=10, currency='usd', payment_method='card',
+                               transaction_id='pi_seed', status='completed'))
+        db.session.commit()
+
+    def start_upload():
+        response = client.post('/api/uploads', json={'filename': 'chunked.png', 'kind': 'document'},
+                               headers=headers['owner'])
+        return response.get_json()['id']
+
+    ids['upload'] = start_upload()
+    ids['spare_upload'] = start_upload()
+    return ids, headers
+
+@pytest.fixture(scope='module')
+def recorded(app, client, seeded):
+    """Call every route once, in order, recording the SQL each sends."""
+    ids, headers = seeded
+    current = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        current.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for call in CALLS:
+            kwargs = call.kwargs(ids) if call.kwargs else {}
+            current.clear()
+            response = client.open(call.url.format(**ids), method=call.method,
+                                   headers=headers.get(call.who, {}), **kwargs)
+            assert response.status_code == call.status, (call.method, call.url, response.get_data(as_text=True))
+            call.statements = list(current)
+            if call.rule == '/api/uploads' and call.method == 'POST':
+                # The chunked upload calls after it continue this one
+                ids['upload'] = response.get_json()['id']
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    return CALLS
+
+def plan(statement, parameters) -> List[str]:
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in rows]
+
+def test_every_route_is_called_or_exempt(app):
+    rules = {(method, rule.rule) for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+             for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    called = {(call.method, call.rule) for call in CALLS}
+    assert called.isdisjoint(EXEMPT)
+    assert rules == called | set(EXEMPT)
+
+@pytest.mark.parametrize('call', CALLS, ids=lambda call: f'{call.method} {call.rule}')
+def test_route_queries_use_indexes(app, recorded, call):
+    if (call.method, call.rule) in ALLOWED_SCANS:
+        pytest.skip(ALLOWED_SCANS[call.method, call.rule])
+    scans = {}
+    with app.app_context():
+        for statement, parameters in call.statements:
+            if statement.lstrip().upper().startswith(UNPLANNED):
+                continue
+            steps = table_scans(plan(statement, parameters))
+            if steps:
+                scans[statement] = steps
+    assert not scans
+
+def test_hot_queries_use_indexes(app, seeded):
+    with app.app_context():
+        failures = {result['name']: result['plan'] for result in check_query_plans() if result['scans']}
+    assert not failures
@@ -4,6 +4,7 @@ import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Badge } from '@/components/ui/badge';
+import { Input } from '@/components/ui/input';
 import { 
   FileText, 
   Upload, 
@@ -15,6 +16,17 @@ import {
   Eye
 } from 'lucide-react';
 import axios from 'axios';
+import PreviewThumbnail from './PreviewThumbnail';
+
+// Search snippets mark matches with <mark>...</mark>; render them as elements,
+// never as HTML, since the text comes from OCR
+const Snippet = ({ text }) => (
+  <>
+    {text.split(/<mark>(.*?)<\/mark>/g).map((part, index) => (
+      index % 2 === 1 ? <mark key={index}>{part}</mark> : <React.Fragment key={index}>{part}</React.Fragment>
+    ))}
+  </>
+);
 
 const Dashboard = () => {
   const { user, logout } = useAuth();
@@ -22,28 +34,40 @@ const Dashboard = () => {
   const [receipts, setReceipts] = useState([]);
   const [taxReturns, setTaxReturns] = useState([]);
   const [clients, setClients] = useState([]);
+  const [clientSearch, setClientSearch] = useState('');
+  const [documentSearch, setDocumentSearch] = useState('');
+  const [documentResults, setDocumentResults] = useState([]);
+  const [newClientEmail, setNewClientEmail] = useState('');
+  const [totals, setTotals] = useState({ documents: 0, receipts: 0, returns: 0 });
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchData();
   }, []);
 
-  const fetchData = async () => {
+  // Everything the dashboard shows comes from one request; after a change,
+  // only the affected sections are fetched again
+  const fetchData = async (sections) => {
     try {
-      const [docsRes, receiptsRes, returnsRes] = await Promise.all([
-        axios.get('/api/documents'),
-        axios.get('/api/receipts'),
-        axios.get('/api/returns')
-      ]);
-
-      setDocuments(docsRes.data);
-      setReceipts(receiptsRes.data);
-      setTaxReturns(returnsRes.data);
+      const { data } = await axios.get('/api/dashboard', {
+        params: sections ? { sections: sections.join(',') } : {}
+      });
 
-      // If user is CPA, fetch clients
-      if (user.user_type === 'cpa') {
-        const clientsRes = await axios.get('/api/cpa/clients');
-        setClients(clientsRes.data);
+      if (data.documents) {
+        setDocuments(data.documents.recent);
+        setTotals((previous) => ({ ...previous, documents: data.documents.total }));
+      }
+      if (data.receipts) {
+        setReceipts(data.receipts.recent);
+        setTotals((previous) => ({ ...previous, receipts: data.receipts.total }));
+      }
+      if (data.returns) {
+        setTaxReturns(data.returns.recent);
+        setTotals((previous) => ({ ...previous, returns: data.returns.total }));
+      }
+      // Only CPAs get a clients section
+      if (data.clients) {
+        setClients(data.clients.recent);
       }
     } catch (error) {
       console.error('Error fetching data:', error);
@@ -53,14 +77,16 @@ const Dashboard = () => {
   };
 
   const handleFileUpload = async (event, type) => {
-    const file = event.target.files[0];
-    if (!file) return;
+    const files = Array.from(event.target.files || []);
+    if (files.length === 0) return;
 
     // Show loading state
     setLoading(true);
 
+    // Every selected file goes up in one batch request
     const formData = new FormData();
-    formData.append('file', file);
+    files.forEach((file) => formData.append('files', file));
+    formData.append('kind', type);
     
     if (type === 'document') {
       formData.append('document_type', 'other');
@@ -71,12 +97,16 @@ const Dashboard = () => {
     }
 
     try {
-      const response = await axios.post(`/api/${type === 'document' ? 'documents' : 'receipts'}`, formData, {
+      const response = await axios.post('/api/documents/batch', formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
       
       console.log('Upload successful:', response.data);
-      await fetchData(); // Refresh data
+      const rejected = response.data.results.filter((result) => result.status === 'rejected');
+      if (rejected.length > 0) {
+        alert(`Some files were not uploaded: ${rejected.map((result) => result.filename).join(', ')}`);
+      }
+      await fetchData([type === 'document' ? 'documents' : 'receipts']); // Refresh data
       
       // Clear the file input
       event.target.value = '';
@@ -92,12 +122,56 @@ const Dashboard = () => {
   const createTaxReturn = async () => {
     try {
       await axios.post('/api/returns', { year: new Date().getFullYear() });
-      fetchData(); // Refresh data
+      fetchData(['returns']); // Refresh data
     } catch (error) {
       console.error('Error creating tax return:', error);
     }
   };
 
+  // Full-text search over the user's documents, best matches first
+  const searchDocuments = async (query) => {
+    setDocumentSearch(query);
+    if (!query.trim()) {
+      setDocumentResults([]);
+      return;
+    }
+    try {
+      const response = await axios.get('/api/documents/search', { params: { q: query, limit: 20 } });
+      setDocumentResults(response.data);
+    } catch (error) {
+      console.error('Error searching documents:', error);
+    }
+  };
+
+  // Search the CPA's roster by email, phone or name; an empty search shows the dashboard list
+  const searchClients = async (query) => {
+    setClientSearch(query);
+    if (!query.trim()) {
+      fetchData(['clients']);
+      return;
+    }
+    try {
+      const response = await axios.get('/api/cpa/clients', {
+        params: { q: query, limit: 20, fields: 'id,email,user_type,profile' }
+      });
+      setClients(response.data);
+    } catch (error) {
+      console.error('Error searching clients:', error);
+    }
+  };
+
+  const addClient = async (event) => {
+    event.preventDefault();
+    try {
+      await axios.post('/api/cpa/clients', { email: newClientEmail });
+      setNewClientEmail('');
+      setClientSearch('');
+      fetchData(['clients']); // Refresh data
+    } catch (error) {
+      alert(`Could not add client: ${error.response?.data?.error || error.message}`);
+    }
+  };
+
   const getStatusBadge = (status) => {
     const variants = {
       draft: 'secondary',
@@ -159,7 +233,7 @@ const Dashboard = () => {
                   <FileText className="h-4 w-4 text-muted-foreground" />
                 </CardHeader>
                 <CardContent>
-                  <div className="text-2xl font-bold">{documents.length}</div>
+                  <div className="text-2xl font-bold">{totals.documents}</div>
                   <p className="text-xs text-muted-foreground">
                     Tax documents uploaded
                   </p>
@@ -172,7 +246,7 @@ const Dashboard = () => {
                   <Receipt className="h-4 w-4 text-muted-foreground" />
                 </CardHeader>
                 <CardContent>
-                  <div className="text-2xl font-bold">{receipts.length}</div>
+                  <div className="text-2xl font-bold">{totals.receipts}</div>
                   <p className="text-xs text-muted-foreground">
                     Expense receipts
                   </p>
@@ -185,7 +259,7 @@ const Dashboard = () => {
                   <Calculator className="h-4 w-4 text-muted-foreground" />
                 </CardHeader>
                 <CardContent>
-                  <div className="text-2xl font-bold">{taxReturns.length}</div>
+                  <div className="text-2xl font-bold">{totals.returns}</div>
                   <p className="text-xs text-muted-foreground">
                     Returns in progress
                   </p>
@@ -204,6 +278,7 @@ const Dashboard = () => {
                 <input
                   type="file"
                   accept=".pdf,.jpg,.jpeg,.png"
+                  multiple
                   onChange={(e) => handleFileUpload(e, 'document')}
                   className="hidden"
                   id="quick-document-upload"
@@ -217,6 +292,7 @@ const Dashboard = () => {
                 <input
                   type="file"
                   accept=".pdf,.jpg,.jpeg,.png"
+                  multiple
                   onChange={(e) => handleFileUpload(e, 'receipt')}
                   className="hidden"
                   id="quick-receipt-upload"
@@ -248,6 +324,7 @@ const Dashboard = () => {
                     <input
                       type="file"
                       accept=".pdf,.jpg,.jpeg,.png"
+                      multiple
                       onChange={(e) => handleFileUpload(e, 'document')}
                       className="hidden"
                       id="document-upload"
@@ -259,18 +336,48 @@ const Dashboard = () => {
                       </label>
                     </Button>
                   </div>
-                  
-                  {documents.length === 0 ? (
+
+                  <Input
+                    placeholder="Search document text, e.g. 1099 acme"
+                    value={documentSearch}
+                    onChange={(e) => searchDocuments(e.target.value)}
+                  />
+
+                  {documentSearch.trim() ? (
+                    documentResults.length === 0 ? (
+                      <p className="text-muted-foreground">No matching documents.</p>
+                    ) : (
+                      <div className="space-y-2">
+                        {documentResults.map((result) => (
+                          <div key={result.id} className="p-4 border rounded-lg">
+                            <p className="font-medium">{result.document_type} • {result.filename}</p>
+                            {result.snippet && (
+                              <p className="text-sm text-muted-foreground">
+                                <Snippet text={result.snippet} />
+                              </p>
+                            )}
+                          </div>
+                        ))}
+                      </div>
+                    )
+                  ) : documents.length === 0 ? (
                     <p className="text-muted-foreground">No documents uploaded yet.</p>
                   ) : (
                     <div className="space-y-2">
                       {documents.map((doc) => (
                         <div key={doc.id} className="flex items-center justify-between p-4 border rounded-lg">
-                          <div>
-                            <p className="font-medium">{doc.document_type}</p>
-                            <p className="text-sm text-muted-foreground">
-                              Uploaded {new Date(doc.uploaded_at).toLocaleDateString()}
-                            </p>
+                          <div className="flex items-center gap-4">
+                            <PreviewThumbnail
+                              url={`/api/documents/${doc.id}/preview?size=small`}
+                              alt={doc.filename || doc.document_type}
+                              fallback={FileText}
+                            />
+                            <div>
+                              <p className="font-medium">{doc.document_type}</p>
+                              <p className="text-sm text-muted-foreground">
+                                Uploaded {new Date(doc.uploaded_at).toLocaleDateString()}
+                              </p>
+                            </div>
                           </div>
                           <Button variant="outline" size="sm">
                             <Eye className="mr-2 h-4 w-4" />
@@ -298,6 +405,7 @@ const Dashboard = () => {
                     <input
                       type="file"
                       accept=".pdf,.jpg,.jpeg,.png"
+                      multiple
                       onChange={(e) => handleFileUpload(e, 'receipt')}
                       className="hidden"
                       id="receipt-upload"
@@ -316,11 +424,18 @@ const Dashboard = () => {
                     <div className="space-y-2">
                       {receipts.map((receipt) => (
                         <div key={receipt.id} className="flex items-center justify-between p-4 border rounded-lg">
-                          <div>
-                            <p className="font-medium">${receipt.amount}</p>
-                            <p className="text-sm text-muted-foreground">
-                              {receipt.category} • {new Date(receipt.date).toLocaleDateString()}
-                            </p>
+                          <div className="flex items-center gap-4">
+                            <PreviewThumbnail
+                              url={`/api/receipts/${receipt.id}/preview?size=small`}
+                              alt={receipt.filename || receipt.category}
+                              fallback={Receipt}
+                            />
+                            <div>
+                              <p className="font-medium">${receipt.amount}</p>
+                              <p className="text-sm text-muted-foreground">
+                                {receipt.category} • {new Date(receipt.date).toLocaleDateString()}
+                              </p>
+                            </div>
                           </div>
                           <Button variant="outline" size="sm">
                             <Eye className="mr-2 h-4 w-4" />
@@ -385,7 +500,27 @@ const Dashboard = () => {
                   <CardTitle>Client Management</CardTitle>
                   <CardDescription>Manage your client accounts</CardDescription>
                 </CardHeader>
-                <CardContent>
+                <CardContent className="space-y-4">
+                  <div className="flex flex-col gap-2 md:flex-row">
+                    <Input
+                      placeholder="Search by name, email or phone"
+                      value={clientSearch}
+                      onChange={(e) => searchClients(e.target.value)}
+                    />
+                    <form onSubmit={addClient} className="flex gap-2">
+                      <Input
+                        type="email"
+                        placeholder="Client email"
+                        value={newClientEmail}
+                        onChange={(e) => setNewClientEmail(e.target.value)}
+                        required
+                      />
+                      <Button type="submit">
+                        <Plus className="mr-2 h-4 w-4" />
+                        Add
+                      </Button>
+                    </form>
+                  </div>
                   {clients.length === 0 ? (
                     <p className="text-muted-foreground">No clients found.</p>
                   ) : (
@@ -394,7 +529,7 @@ const Dashboard = () => {
                         <div key={client.id} className="flex items-center justify-between p-4 border rounded-lg">
                           <div>
                             <p className="font-medium">
-                              {client.profile?.firstName} {client.profile?.lastName}
+                              {client.profile?.first_name} {client.profile?.last_name}
                             </p>
                             <p className="text-sm text-muted-foreground">
                               {client.email} • {client.user_type}
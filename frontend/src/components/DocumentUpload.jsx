@@ -17,6 +17,7 @@ import {
   X
 } from 'lucide-react';
 import axios from 'axios';
+import { chunkedUpload, CHUNKED_UPLOAD_THRESHOLD } from '@/lib/chunkedUpload';
 
 const DocumentUpload = ({ onUploadComplete }) => {
   const [file, setFile] = useState(null);
@@ -61,6 +62,18 @@ const DocumentUpload = ({ onUploadComplete }) => {
     }
   };
 
+  // OCR runs in the background; poll the job until it settles, then reload the document
+  const waitForOcr = async (document) => {
+    let job = document.ocr_job;
+    while (job.status === 'pending' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const jobRes = await axios.get(`/api/ocr/jobs/${job.id}`);
+      job = jobRes.data;
+    }
+    const docRes = await axios.get(`/api/documents/${document.id}`);
+    return docRes.data;
+  };
+
   const handleUpload = async () => {
     if (!file || !documentType) {
       setError('Please select a file and document type');
@@ -70,23 +83,36 @@ const DocumentUpload = ({ onUploadComplete }) => {
     setUploading(true);
     setError('');
 
-    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('document_type', documentType);
-
     try {
-      const response = await axios.post('/api/documents', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
-      });
+      let uploaded;
+      if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        // Large scans go up in resumable chunks
+        const result = await chunkedUpload(file, { kind: 'document', document_type: documentType });
+        uploaded = { ...result.document, ocr_job: result.ocr_job };
+      } else {
+        const formData = new FormData();
+        formData.append('file', file);
+        formData.append('document_type', documentType);
+
+        const response = await axios.post('/api/documents', formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data'
+          }
+        });
+        uploaded = { ...response.data.document, ocr_job: response.data.ocr_job };
+      }
+
+      let document = uploaded;
+      if (document.ocr_job) {
+        document = await waitForOcr(document);
+      }
 
-      setUploadResult(response.data);
+      setUploadResult(document);
       setFile(null);
       setDocumentType('');
       
       if (onUploadComplete) {
-        onUploadComplete(response.data);
+        onUploadComplete(uploaded);
       }
     } catch (error) {
       setError(error.response?.data?.error || 'Upload failed');
@@ -127,7 +153,9 @@ const DocumentUpload = ({ onUploadComplete }) => {
                 Uploaded {new Date(uploadResult.uploaded_at).toLocaleString()}
               </p>
             </div>
-            <Badge variant="success">Processed</Badge>
+            <Badge variant={uploadResult.ocr_status === 'failed' ? 'destructive' : 'success'}>
+              {uploadResult.ocr_status === 'failed' ? 'OCR Failed' : 'Processed'}
+            </Badge>
           </div>
 
           {uploadResult.extracted_data?.extracted_data && 
@@ -145,11 +173,11 @@ const DocumentUpload = ({ onUploadComplete }) => {
             </div>
           )}
 
-          {uploadResult.extracted_data?.raw_text && (
+          {uploadResult.raw_text && (
             <div className="space-y-2">
               <Label>Raw Text (OCR)</Label>
               <Textarea
-                value={uploadResult.extracted_data.raw_text}
+                value={uploadResult.raw_text}
                 readOnly
                 className="h-32 text-sm"
               />
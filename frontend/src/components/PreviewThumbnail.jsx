@@ -0,0 +1,38 @@
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
+
+// First-page thumbnail of a document or receipt. Fetched through axios so the
+// Authorization header is sent; the browser still caches it by ETag.
+const PreviewThumbnail = ({ url, alt, fallback: Fallback }) => {
+  const [src, setSrc] = useState(null);
+
+  useEffect(() => {
+    let objectUrl = null;
+    let cancelled = false;
+
+    axios.get(url, { responseType: 'blob' })
+      .then((response) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(response.data);
+        setSrc(objectUrl);
+      })
+      .catch(() => setSrc(null));
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [url]);
+
+  if (!src) {
+    return (
+      <div className="flex h-16 w-12 items-center justify-center rounded border bg-muted">
+        {Fallback && <Fallback className="h-5 w-5 text-muted-foreground" />}
+      </div>
+    );
+  }
+
+  return <img src={src} alt={alt} loading="lazy" className="h-16 w-12 rounded border object-cover" />;
+};
+
+export default PreviewThumbnail;
@@ -25,6 +25,21 @@ export const AuthProvider = ({ children }) => {
     }
   }, [token]);
 
+  // The API sends a replacement token when the role or plan claims in ours
+  // go stale, e.g. after subscribing
+  useEffect(() => {
+    const interceptor = axios.interceptors.response.use((response) => {
+      const newToken = response.headers['x-access-token'];
+      if (newToken) {
+        axios.defaults.headers.common['Authorization'] = `Bearer ${newToken}`;
+        localStorage.setItem('token', newToken);
+        setToken(newToken);
+      }
+      return response;
+    });
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   // Check if user is logged in on app start
   useEffect(() => {
     const checkAuth = async () => {
@@ -0,0 +1,45 @@
+import axios from 'axios';
+
+// Files above this size go through the resumable /api/uploads protocol
+export const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const MAX_RETRIES = 3;
+
+// Upload a file in chunks, resuming from the server's offset after a failed chunk.
+// `fields` carries kind/document_type (or receipt category/amount/date).
+export async function chunkedUpload(file, fields = {}, onProgress) {
+  const { data: session } = await axios.post('/api/uploads', {
+    filename: file.name,
+    size: file.size,
+    ...fields
+  });
+
+  let offset = session.offset;
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const { data } = await axios.put(
+        `/api/uploads/${session.id}?offset=${offset}`,
+        file.slice(offset, offset + CHUNK_SIZE),
+        { headers: { 'Content-Type': 'application/octet-stream' } }
+      );
+      offset = data.offset;
+      failures = 0;
+    } catch (error) {
+      failures += 1;
+      if (failures > MAX_RETRIES || error.response?.status === 413) {
+        throw error;
+      }
+      // Part of the chunk may have landed; ask where to pick up
+      const { data } = await axios.get(`/api/uploads/${session.id}`);
+      offset = data.offset;
+    }
+    if (onProgress) {
+      onProgress(offset / file.size);
+    }
+  }
+
+  const { data } = await axios.post(`/api/uploads/${session.id}/complete`, {});
+  return data;
+}